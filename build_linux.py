@@ -1,8 +1,21 @@
+import argparse
+import ast
+import importlib.util
+import json
+import math
 import os
+import py_compile
 import shutil
+import statistics
 import subprocess
 import sys
+import tempfile
 import time
+import wave
+
+APP_NAME = "WhisperTranscription"
+# Zeitpunkte, die die App mit WHISPER_STARTUP_PROBE schreibt
+STARTUP_MARKS = ("interpreter_start", "window_shown", "first_transcription")
 
 def remove_readonly(func, path, excinfo):
     """Error handler for shutil.rmtree that attempts to handle read-only files"""
@@ -16,23 +29,8 @@ def remove_readonly(func, path, excinfo):
         except PermissionError as e:
             print(f"Warning: Could not remove {path}: {e}")
 
-def copy_cached_models(dist_folder):
-    """Copy cached models to distribution folder"""
-    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
-    if os.path.exists(models_dir):
-        dist_models_dir = os.path.join(dist_folder, "models")
-        os.makedirs(dist_models_dir, exist_ok=True)
-
-        # Copy all cached models
-        for model_file in os.listdir(models_dir):
-            if model_file.endswith('.pt'):
-                src = os.path.join(models_dir, model_file)
-                dst = os.path.join(dist_models_dir, model_file)
-                print(f"Copying cached model: {model_file}")
-                shutil.copy2(src, dst)
-
 def prepare_models_directory(dist_folder):
-    """Prepare models directory in distribution"""
+    """Prepare models directory in distribution, with every cached model copied once"""
     models_dir = os.path.join(dist_folder, "models")
     os.makedirs(models_dir, exist_ok=True)
 
@@ -40,74 +38,196 @@ def prepare_models_directory(dist_folder):
     with open(os.path.join(models_dir, ".keep"), "w") as f:
         f.write("This directory is used for caching Whisper models.")
 
-    # Copy any existing cached models
     source_models = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
-    if os.path.exists(source_models):
-        for model_file in os.listdir(source_models):
-            if model_file.endswith('.pt'):
-                src = os.path.join(source_models, model_file)
-                dst = os.path.join(models_dir, model_file)
-                print(f"Copying cached model: {model_file}")
-                shutil.copy2(src, dst)
-
-def build_executable():
-    print("Starting build process for Linux...")
+    if not os.path.exists(source_models):
+        return
+    if os.path.exists(os.path.join(source_models, "manifest.json")):
+        # Model store: checksums are verified, identical files are copied only once
+        subprocess.check_call([
+            sys.executable, "whisper_transcription.py", "models", "export",
+            "--model-dir", source_models, "--dest", models_dir
+        ])
+        return
 
-    # Create build and dist directories if they don't exist
-    for dir_name in ['build', 'dist']:
-        if os.path.exists(dir_name):
-            print(f"Cleaning {dir_name} directory...")
-            try:
-                shutil.rmtree(dir_name, onerror=remove_readonly)
-            except Exception as e:
-                print(f"Warning: Could not fully clean {dir_name}: {e}")
-                print("Continuing with build process...")
+    # Copy any existing cached models
+    for model_file in os.listdir(source_models):
+        if model_file.endswith('.pt'):
+            src = os.path.join(source_models, model_file)
+            dst = os.path.join(models_dir, model_file)
+            print(f"Copying cached model: {model_file}")
+            shutil.copy2(src, dst)
 
+def clean_directory(dir_name):
+    """Remove a build directory, continuing if some files cannot be removed"""
+    if os.path.exists(dir_name):
+        print(f"Cleaning {dir_name} directory...")
         try:
-            os.makedirs(dir_name, exist_ok=True)
+            shutil.rmtree(dir_name, onerror=remove_readonly)
         except Exception as e:
-            print(f"Error creating directory {dir_name}: {e}")
-            return
+            print(f"Warning: Could not fully clean {dir_name}: {e}")
+            print("Continuing with build process...")
 
-    try:
-        # Build the executable
-        print("Building executable...")
-        subprocess.check_call([
-            "pyinstaller",
-            "--clean",
-            "--onefile",
-            "whisper_app.spec"
-        ])
+def read_excludes(spec_path="whisper_app.spec"):
+    """Return the EXCLUDES list of the spec without running it"""
+    with open(spec_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), spec_path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "EXCLUDES" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{spec_path} defines no EXCLUDES list")
+
+def write_check_audio(path, seconds=8, rate=16000):
+    """Synthetic clip with a pause in the middle, so VAD and chunking have something to do"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        frames = bytearray()
+        for i in range(seconds * rate):
+            value = 0 if seconds / 3 < i / rate < seconds / 2 else int(8000 * math.sin(2 * math.pi * 220 * i / rate))
+            frames += value.to_bytes(2, "little", signed=True)
+        f.writeframes(bytes(frames))
+
+def imported_modules(command, env):
+    """Run one command from source and return every module it (and its workers) imported"""
+    result = subprocess.run(command, env=dict(env, PYTHONPROFILEIMPORTTIME="1"),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    modules = set()
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if line.startswith("import time:") and line.count("|") == 2:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    if result.returncode != 0:
+        tail = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))[-2000:]
+        raise subprocess.CalledProcessError(result.returncode, command, output=tail)
+    return modules
+
+def check_excludes(model, precisions, spec_path="whisper_app.spec"):
+    """Run every command once from source and fail if one of them imports an excluded module"""
+    excludes = read_excludes(spec_path)
+    app = [sys.executable, os.path.abspath("whisper_transcription.py")]
+    with tempfile.TemporaryDirectory() as work:
+        clip = os.path.join(work, "check.wav")
+        write_check_audio(clip)
+        vocabulary = os.path.join(work, "vocabulary.json")
+        with open(vocabulary, "w", encoding="utf-8") as f:
+            json.dump({"Check": {"boost": ["Echokardiographie", "EKG"], "suppress": ["ähm"]}}, f)
+        env = dict(os.environ, WHISPER_VOCABULARY=vocabulary)
+        commands = {}
+        for precision in precisions:
+            commands[f"bench ({precision})"] = app + ["bench", "--models", model, "--lengths", "5",
+                                                      "--repeat", "1", "--precision", precision]
+            commands[f"batch ({precision})"] = app + [
+                "batch", clip, "--model", model, "--precision", precision, "--output-dir", os.path.join(work, precision),
+                "--formats", "txt,json,srt,vtt,jsonl", "--word-timestamps", "--vad", "--vocabulary", "Check",
+                "--no-cache", "--workers", "1"]
+        commands["compare"] = app + ["compare", clip, "--model", model, "--precisions", ",".join(precisions)]
+        commands["vocabulary bench"] = app + ["vocabulary", "bench", "Check", "--model", model, "--repeat", "1"]
+        if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+            # Die GUI beendet sich mit WHISPER_STARTUP_PROBE nach der ersten Transkription selbst
+            commands["gui"] = app
+            env["WHISPER_STARTUP_PROBE"] = os.path.join(work, "probe.json")
+        else:
+            print("No display available, the GUI is not part of the exclude check")
 
-        # Create distribution folder
-        dist_folder = "WhisperTranscription_dist"
-        if os.path.exists(dist_folder):
-            print(f"Cleaning {dist_folder} directory...")
+        found = {}
+        for label, command in commands.items():
+            print(f"Checking imports: {label}...")
+            for module in imported_modules(command, env):
+                for exclude in excludes:
+                    if module == exclude or module.startswith(exclude + "."):
+                        found.setdefault(exclude, set()).add(label)
+    if found:
+        for exclude, labels in sorted(found.items()):
+            print(f"  {exclude} is excluded in {spec_path} but imported by: {', '.join(sorted(labels))}")
+        raise SystemExit("Excluded modules are in use, fix EXCLUDES before building")
+    print(f"Exclude check passed: none of {len(excludes)} excluded packages imported by {len(commands)} commands")
+
+def run_pyinstaller(mode):
+    """Build one layout and return the path of its executable"""
+    print(f"Building executable ({mode})...")
+    subprocess.check_call([
+        "pyinstaller",
+        "--clean",
+        "--noconfirm",
+        "--distpath", os.path.join("dist", mode),
+        "--workpath", os.path.join("build", mode),
+        "whisper_app.spec"
+    ], env=dict(os.environ, WHISPER_BUILD_MODE=mode))
+    if mode == "onedir":
+        return os.path.join("dist", mode, APP_NAME, APP_NAME)
+    return os.path.join("dist", mode, APP_NAME)
+
+def precompile_sources(mode, app_dir):
+    """Compile modules that are bundled only as source into __pycache__, return how many
+
+    PyInstaller keeps almost every module compiled in its PYZ archive. Modules collected
+    as plain .py files (the 'py' collection mode some hooks use, e.g. parts of triton)
+    are otherwise compiled again on every launch when the folder is not writable.
+    Everything missing from PYZ-00.toc is compiled here. The hash-based .pyc files stay
+    valid even after copying changes the file times.
+    """
+    internal = os.path.join(app_dir, "_internal")
+    version = f"libpython{sys.version_info.major}.{sys.version_info.minor}"
+    if not any(name.startswith(version) for name in os.listdir(internal)):
+        print(f"Not precompiling: the build does not bundle {version}, the .pyc files would not match")
+        return 0
+    with open(os.path.join("build", mode, "whisper_app", "PYZ-00.toc"), encoding="utf-8") as f:
+        archived = {entry[0] for entry in ast.literal_eval(f.read())[1]}
+    compiled = 0
+    for root, _, names in os.walk(internal):
+        for name in names:
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(root, name)
+            module = os.path.relpath(path, internal)[:-3].replace(os.sep, ".")
+            if module.endswith(".__init__"):
+                module = module[:-len(".__init__")]
+            if module in archived:
+                continue
             try:
-                shutil.rmtree(dist_folder, onerror=remove_readonly)
-            except Exception as e:
-                print(f"Warning: Could not fully clean {dist_folder}: {e}")
+                py_compile.compile(path, cfile=importlib.util.cache_from_source(path), doraise=True,
+                                   invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                compiled += 1
+            except py_compile.PyCompileError as e:
+                print(f"Warning: could not precompile {path}: {e.msg}")
+    print(f"Precompiled {compiled} source-only modules ({len(archived)} modules are in the PYZ archive)")
+    return compiled
 
-        os.makedirs(dist_folder, exist_ok=True)
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    # PyInstaller verlinkt gemeinsame Bibliotheken (CUDA, OpenBLAS) nur, sie zählen einmal
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names if not os.path.islink(os.path.join(root, name)))
+
+def package_executable(mode, executable, dist_folder):
+    """Create the distribution folder and return the executable inside it"""
+    clean_directory(dist_folder)
 
-        # Copy executable and dependencies
-        print("Creating distribution package...")
-        shutil.copy("dist/whisper_app", dist_folder)
+    # Copy executable and dependencies
+    print(f"Creating distribution package in {dist_folder}...")
+    if mode == "onedir":
+        # Der ganze Ordner gehört dazu: Bibliotheken und Assets liegen neben dem Executable
+        shutil.copytree(os.path.dirname(executable), dist_folder, symlinks=True)
+    else:
+        os.makedirs(dist_folder, exist_ok=True)
+        shutil.copy2(executable, dist_folder)
 
-        # Copy cached models
-        print("Copying cached models...")
-        copy_cached_models(dist_folder)
+    # Prepare models directory with the cached models
+    print("Preparing models directory...")
+    prepare_models_directory(dist_folder)
 
-        # Prepare models directory
-        print("Preparing models directory...")
-        prepare_models_directory(dist_folder)
+    # Vocabulary profiles are read from next to the executable
+    if os.path.exists("vocabulary.json"):
+        shutil.copy2("vocabulary.json", dist_folder)
 
-        # Create README file
-        with open(os.path.join(dist_folder, "README.txt"), "w", encoding='utf-8') as f:
-            f.write("""Whisper Transcription Tool
+    # Create README file
+    with open(os.path.join(dist_folder, "README.txt"), "w", encoding='utf-8') as f:
+        f.write(f"""Whisper Transcription Tool
 
 First Time Setup:
-1. Run the application `whisper_app`.
+1. Run the application `{APP_NAME}`.
 2. Models will be cached in the 'models' directory next to the executable.
 3. First run for each model will require downloading (internet connection needed).
 
@@ -117,17 +237,156 @@ Cache Information:
 - The application needs write permission in its directory.
 
 Pre-cached models (if included):
-- base.pt
-- small.pt
-- tiny.pt (if downloaded).
+- listed in models/manifest.json with size and checksum
+- check them with `{APP_NAME} models verify --model-dir models`.
+
+Vocabulary profiles:
+- put them in 'vocabulary.json' next to the executable and pick one next to the language selection.
 
 Troubleshooting:
 - Ensure the application has write permissions in its directory.
 - If caching fails, models will be stored in ~/.whisper_cache.
 - Check the application output for detailed cache location information.
+- Keep the '_internal' folder next to the executable (folder build), the application does not start without it.
 """)
+    return os.path.join(dist_folder, os.path.basename(executable))
+
+def measure_startup(executable, runs, timeout):
+    """Launch the packaged app until its first transcription is done, median seconds from launch"""
+    results_dir = os.path.join(os.path.dirname(executable), "results")
+    samples = []
+    for run in range(runs):
+        # Ohne Ergebniscache, sonst käme die erste Transkription ab dem zweiten Lauf aus dem Cache
+        clean_directory(results_dir)
+        fd, probe_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(probe_path)
+        launched = time.time()
+        process = subprocess.Popen([os.path.abspath(executable)], cwd=os.path.dirname(executable),
+                                   env=dict(os.environ, WHISPER_STARTUP_PROBE=probe_path),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            print(f"  run {run + 1}: no first transcription within {timeout:.0f} s")
+            continue
+        try:
+            with open(probe_path, encoding="utf-8") as f:
+                probe = json.load(f)
+            os.remove(probe_path)
+        except (OSError, ValueError):
+            print(f"  run {run + 1}: the application wrote no startup probe (exit code {process.returncode})")
+            continue
+        if "error" in probe:
+            print(f"  run {run + 1}: {probe['error']}")
+            continue
+        sample = {mark: probe[mark] - launched for mark in STARTUP_MARKS}
+        print(f"  run {run + 1}: " + "  ".join(f"{mark} {seconds:.2f} s" for mark, seconds in sample.items()))
+        samples.append(sample)
+    if not samples:
+        return None
+    return {mark: statistics.median(sample[mark] for sample in samples) for mark in STARTUP_MARKS}
+
+def measure_launch(executable, runs, timeout, model):
+    """Without a display: median seconds from launch to the end of two headless runs
+
+    help: unpacking, interpreter and imports up to argparse. first_transcription: a
+    `batch` run over a synthetic clip with model, i.e. the same model stack import,
+    model load and transcription the GUI does for its first recording, minus the window.
+    """
+    results_dir = os.path.join(os.path.dirname(executable), "results")
+    samples = []
+    with tempfile.TemporaryDirectory() as work:
+        clip = os.path.join(work, "clip.wav")
+        write_check_audio(clip)
+        commands = {
+            "help": [os.path.abspath(executable), "--help"],
+            "first_transcription": [os.path.abspath(executable), "batch", clip, "--model", model, "--no-cache",
+                                    "--workers", "1", "--formats", "txt", "--output-dir", os.path.join(work, "out")],
+        }
+        for run in range(runs):
+            sample = {}
+            for mark, command in commands.items():
+                # Ohne Ergebnisse und Fortschritt früherer Läufe, sonst würde nichts mehr transkribiert
+                clean_directory(results_dir)
+                clean_directory(os.path.join(work, "out"))
+                launched = time.perf_counter()
+                try:
+                    subprocess.run(command, cwd=os.path.dirname(executable), stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=timeout, check=True)
+                except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
+                    print(f"  run {run + 1}: {e}")
+                    break
+                sample[mark] = time.perf_counter() - launched
+            else:
+                print(f"  run {run + 1}: " + "  ".join(f"{mark} {seconds:.2f} s" for mark, seconds in sample.items()))
+                samples.append(sample)
+    if not samples:
+        return None
+    return {mark: statistics.median(sample[mark] for sample in samples) for mark in commands}
+
+def report_startup(report, path):
+    """Print launch -> window -> first transcription per layout, onedir relative to onefile"""
+    # Ohne Display gibt es nur die help-Messung, die Spalten richten sich nach dem, was gemessen wurde
+    marks = next((list(entry["startup"]) for entry in report.values() if entry["startup"]), list(STARTUP_MARKS))
+    print("\nStartup (median seconds from launch):")
+    print(f"  {'layout':<8} {'size MB':>8} " + " ".join(f"{mark:>20}" for mark in marks))
+    for mode, entry in report.items():
+        times = entry["startup"] or {}
+        print(f"  {mode:<8} {entry['size'] / 1024 / 1024:8.0f} "
+              + " ".join(f"{times[mark]:20.2f}" if mark in times else f"{'-':>20}" for mark in marks))
+    onefile = (report.get("onefile") or {}).get("startup")
+    onedir = (report.get("onedir") or {}).get("startup")
+    if onefile and onedir and list(onefile) == list(onedir):
+        for mark in marks:
+            print(f"  {mark}: onedir {onefile[mark] - onedir[mark]:+.2f} s faster "
+                  f"({onefile[mark] / onedir[mark]:.1f}x)")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Startup report written to {path}")
+
+def build_executable(modes=("onedir",), check=False, check_model="base", check_precisions=("fp32", "int8", "bf16"),
+                     measure=False, runs=3, timeout=600):
+    print("Starting build process for Linux...")
+
+    # Create build and dist directories if they don't exist
+    for dir_name in ['build', 'dist']:
+        clean_directory(dir_name)
 
-        print("Build complete! Distribution package created in:", dist_folder)
+        try:
+            os.makedirs(dir_name, exist_ok=True)
+        except Exception as e:
+            print(f"Error creating directory {dir_name}: {e}")
+            return
+
+    try:
+        if check:
+            check_excludes(check_model, check_precisions)
+
+        report = {}
+        for mode in modes:
+            executable = run_pyinstaller(mode)
+            if mode == "onedir":
+                precompile_sources(mode, os.path.dirname(executable))
+
+            # Create distribution folder
+            dist_folder = "WhisperTranscription_dist" if len(modes) == 1 else f"WhisperTranscription_{mode}_dist"
+            executable = package_executable(mode, executable, dist_folder)
+            print(f"Build complete! Distribution package ({mode}) created in:", dist_folder)
+            report[mode] = {"size": directory_size(os.path.join("dist", mode)), "startup": None}
+
+            if measure:
+                if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+                    print(f"No display available, timing `--help` and a headless first transcription instead of "
+                          f"the window ({mode}, {runs} runs)...")
+                    report[mode]["startup"] = measure_launch(executable, runs, timeout, check_model)
+                    continue
+                print(f"Measuring startup ({mode}, {runs} runs)...")
+                report[mode]["startup"] = measure_startup(executable, runs, timeout)
+
+        if measure:
+            report_startup(report, os.path.join("build", "startup_report.json"))
 
     except subprocess.CalledProcessError as e:
         print(f"Error during build process: {e}")
@@ -136,9 +395,34 @@ Troubleshooting:
     except Exception as e:
         print(f"Unexpected error during build process: {e}")
 
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Build the Whisper Transcription executable")
+    parser.add_argument("--mode", default="onedir", choices=["onedir", "onefile", "both"],
+                        help="onedir starts fastest; onefile is the single-file build (default: onedir)")
+    parser.add_argument("--check-excludes", action="store_true",
+                        help="Run every command from source first and stop if one imports a module the spec excludes")
+    parser.add_argument("--check-model", default="base",
+                        help="Model for the exclude check and the headless startup measurement (default: base)")
+    parser.add_argument("--check-precisions", default="fp32,int8,bf16",
+                        help="Comma separated precisions to check (default: fp32,int8,bf16)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Launch each build and report launch-to-window and launch-to-first-transcription")
+    parser.add_argument("--runs", type=int, default=3, help="Launches per build for --measure (default: 3)")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for one launch (default: 600)")
+    return parser
+
 if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
     try:
-        build_executable()
+        build_executable(
+            modes=("onefile", "onedir") if args.mode == "both" else (args.mode,),
+            check=args.check_excludes,
+            check_model=args.check_model,
+            check_precisions=[p.strip() for p in args.check_precisions.split(",") if p.strip()],
+            measure=args.measure,
+            runs=args.runs,
+            timeout=args.timeout,
+        )
     except KeyboardInterrupt:
         print("\nBuild process interrupted by user")
     except Exception as e:
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Die Anwendung ist ein einzelnes Skript im Projektordner
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def tiny_model():
+    """Small whisper model with the real vocabulary that ends every window after one timestamp
+
+    The weights are random except that the decoder always prefers the end-of-text token,
+    so decoding is short and deterministic even with sampling.
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    torch.manual_seed(0)
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+                           n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1)
+    model = Whisper(dims).eval()
+    with torch.no_grad():
+        # whisper legt die Positionen des Decoders uninitialisiert an, sie kommen sonst aus dem Checkpoint
+        model.decoder.positional_embedding.normal_(std=0.02)
+        # Logits = ln(x) @ embedding.T: mit konstantem ln-Ausgang gewinnt die einzige Zeile ungleich null
+        model.decoder.ln.weight.zero_()
+        model.decoder.ln.bias.fill_(1.0)
+        model.decoder.token_embedding.weight.zero_()
+        model.decoder.token_embedding.weight[50257] = 1.0  # <|endoftext|>
+    return model
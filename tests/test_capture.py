@@ -0,0 +1,77 @@
+import numpy as np
+
+import whisper_core
+
+
+def ramp(start, count):
+    return np.arange(start, start + count, dtype=np.int16).reshape(-1, 1)
+
+
+def small_buffer(max_seconds=3, **kwargs):
+    # 10 Frames pro Block, standardmäßig höchstens 3 Blöcke im Ring
+    return whisper_core.CaptureBuffer(10, block_seconds=1, max_seconds=max_seconds, **kwargs)
+
+
+def test_writes_across_blocks_read_back_in_order():
+    buffer = small_buffer(max_seconds=5)
+    for start in range(0, 25, 7):
+        buffer.write(ramp(start, min(7, 25 - start)))
+    assert buffer.written == 25
+    assert buffer.read().ravel().tolist() == list(range(25))
+    assert buffer.read(8, 13).ravel().tolist() == list(range(8, 13))
+    assert buffer.seconds() == 2.5
+
+
+def test_read_within_one_block_is_a_view():
+    buffer = small_buffer()
+    buffer.write(ramp(0, 15))
+    view = buffer.read(2, 6)
+    assert np.shares_memory(view, buffer.blocks[0])
+    copy = buffer.read(8, 12)
+    assert not np.shares_memory(copy, buffer.blocks[0])
+    assert copy.ravel().tolist() == [8, 9, 10, 11]
+
+
+def test_ring_wraps_and_keeps_only_the_newest_blocks():
+    buffer = small_buffer()
+    for start in range(0, 45, 5):
+        buffer.reserve()
+        buffer.write(ramp(start, 5))
+    assert len(buffer.blocks) == 3
+    assert buffer.emergency_allocations == 0
+    # Der Block, in den gerade geschrieben wird, und die zwei davor
+    assert buffer.oldest() == 25
+    assert buffer.read().ravel().tolist() == list(range(25, 45))
+    assert buffer.read(0, 30).ravel().tolist() == list(range(25, 30))
+    assert buffer.stats()["overwritten_frames"] == 25
+
+
+def test_latest_frames():
+    buffer = small_buffer()
+    buffer.write(ramp(0, 23))
+    assert buffer.latest(4).ravel().tolist() == [19, 20, 21, 22]
+    # Bei 3 Blöcken im Ring sind die ersten 3 Frames schon überschrieben
+    assert buffer.latest(100).ravel().tolist() == list(range(3, 23))
+
+
+def test_empty_read():
+    buffer = small_buffer()
+    assert buffer.read().shape == (0, 1)
+
+
+def test_allocates_in_the_callback_only_when_reserve_falls_behind():
+    buffer = small_buffer(spare_blocks=1)
+    buffer.write(ramp(0, 10))
+    buffer.write(ramp(10, 10))
+    assert buffer.emergency_allocations == 1
+    buffer.reserve()
+    buffer.write(ramp(20, 10))
+    assert buffer.emergency_allocations == 1
+
+
+def test_callback_counts_xruns():
+    buffer = small_buffer()
+    buffer.callback(ramp(0, 3), 3, None, None)
+    buffer.callback(ramp(3, 3), 3, None, "input overflow")
+    assert buffer.xruns == 1
+    assert buffer.written == 6
@@ -0,0 +1,95 @@
+import numpy as np
+
+import whisper_common
+import whisper_core
+
+RATE = whisper_common.WHISPER_SAMPLE_RATE
+
+
+def speech_with_pauses(seconds, pauses, seed=0):
+    """Loud noise with digital silence at the given (start, end) seconds"""
+    audio = 0.3 * np.random.default_rng(seed).standard_normal(int(seconds * RATE)).astype(np.float32)
+    for start, end in pauses:
+        audio[int(start * RATE):int(end * RATE)] = 0.0
+    return audio
+
+
+def test_short_audio_is_one_chunk():
+    audio = np.zeros(int(170 * RATE), dtype=np.float32)
+    assert whisper_common.split_audio(audio, chunk_seconds=120.0) == [
+        {"start": 0, "end": len(audio), "own_start": 0, "own_end": len(audio)}]
+
+
+def test_chunks_own_the_audio_without_gaps_and_overlap_by_one_second():
+    audio = speech_with_pauses(400, [])
+    chunks = whisper_common.split_audio(audio, chunk_seconds=120.0, overlap_seconds=1.0)
+    assert len(chunks) == 3
+    assert chunks[0]["own_start"] == 0 and chunks[-1]["own_end"] == len(audio)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous["own_end"] == chunk["own_start"]
+        assert chunk["start"] == chunk["own_start"] - RATE
+        assert previous["end"] == previous["own_end"] + RATE
+    assert chunks[0]["start"] == 0 and chunks[-1]["end"] == len(audio)
+
+
+def test_cuts_land_in_pauses_near_the_target():
+    audio = speech_with_pauses(300, [(112.0, 113.0), (231.0, 232.0)])
+    chunks = whisper_common.split_audio(audio, chunk_seconds=120.0, search_seconds=10.0)
+    cuts = [chunk["own_start"] / RATE for chunk in chunks[1:]]
+    assert len(cuts) == 2
+    assert 112.0 <= cuts[0] <= 113.0
+    assert 231.0 <= cuts[1] <= 232.0
+
+
+def segment(start, end, text, words=None):
+    seg = {"start": start, "end": end, "text": text}
+    if words is not None:
+        seg["words"] = words
+    return seg
+
+
+def stitch(chunks, results):
+    stitcher = whisper_core.ChunkStitcher()
+    return [seg for chunk, result in zip(chunks, results) for seg in stitcher.add(chunk, result)]
+
+
+def test_stitch_keeps_overlap_segments_once_by_midpoint():
+    chunks = [{"start": 0, "end": 11 * RATE, "own_start": 0, "own_end": 10 * RATE},
+              {"start": 9 * RATE, "end": 20 * RATE, "own_start": 10 * RATE, "own_end": 20 * RATE}]
+    results = [
+        {"segments": [segment(0.0, 4.0, " Eins."), segment(8.0, 9.5, " Zwei."), segment(9.8, 11.0, " Drei.")]},
+        {"segments": [segment(0.0, 0.5, " Zwei."), segment(0.8, 2.0, " Drei."), segment(3.0, 5.0, " Vier.")]},
+    ]
+    segments = stitch(chunks, results)
+    assert [seg["text"] for seg in segments] == [" Eins.", " Zwei.", " Drei.", " Vier."]
+    assert [seg["id"] for seg in segments] == [0, 1, 2, 3]
+    assert segments[2]["start"] == 9.8
+    assert segments[3]["start"] == 12.0
+
+
+def test_stitch_drops_repeated_text_at_the_boundary_and_keeps_time_monotonic():
+    chunks = [{"start": 0, "end": 11 * RATE, "own_start": 0, "own_end": 10 * RATE},
+              {"start": 9 * RATE, "end": 20 * RATE, "own_start": 10 * RATE, "own_end": 20 * RATE}]
+    results = [
+        {"segments": [segment(8.0, 10.4, " Guten Tag")]},
+        {"segments": [segment(1.0, 1.6, " guten Tag!"), segment(1.5, 3.0, " Weiter",
+                                                                [{"word": " Weiter", "start": 1.5, "end": 3.0}])]},
+    ]
+    segments = stitch(chunks, results)
+    assert [seg["text"] for seg in segments] == [" Guten Tag", " Weiter"]
+    weiter = segments[1]
+    assert weiter["start"] == 10.5 and weiter["end"] == 12.0
+    assert weiter["words"][0]["start"] == 10.5
+
+
+def test_last_chunk_keeps_segments_past_its_end():
+    chunks = [{"start": 0, "end": 11 * RATE, "own_start": 0, "own_end": 10 * RATE},
+              {"start": 9 * RATE, "end": 20 * RATE, "own_start": 10 * RATE, "own_end": 20 * RATE}]
+    results = [{"segments": []}, {"segments": [segment(10.5, 11.5, " Ende")]}]
+    assert [seg["start"] for seg in stitch(chunks, results)] == [19.5]
+
+
+def test_whole_file_passes_segments_through():
+    segments = stitch([None, None], [{"segments": [segment(0.0, 1.0, " A")]},
+                                     {"segments": [segment(2.0, 3.0, " B")]}])
+    assert [(seg["id"], seg["start"], seg["text"]) for seg in segments] == [(0, 0.0, " A"), (1, 2.0, " B")]
@@ -0,0 +1,35 @@
+import pytest
+import torch
+
+import whisper_bench
+
+
+@pytest.mark.parametrize("reference, hypothesis, expected", [
+    ("das ist ein Test", "das ist ein Test", 0.0),
+    ("Das ist ein Test.", "das ist, ein test", 0.0),   # Groß-/Kleinschreibung und Satzzeichen zählen nicht
+    ("das ist ein Test", "das ist Test", 0.25),        # Auslassung
+    ("das ist ein Test", "das ist ein kleiner Test", 0.25),  # Einfügung
+    ("das ist ein Test", "dies ist ein Test", 0.25),   # Ersetzung
+    ("eins zwei", "drei vier fünf sechs", 2.0),        # mehr Fehler als Referenzwörter
+    ("eins zwei drei", "", 1.0),
+    ("", "", 0.0),
+    ("", "etwas", 1.0),
+])
+def test_word_error_rate(reference, hypothesis, expected):
+    assert whisper_bench.word_error_rate(reference, hypothesis) == pytest.approx(expected)
+
+
+def test_stage_timer_times_forward_calls_and_leaves_the_module_alone():
+    module = torch.nn.Linear(4, 4)
+    forward = module.forward
+    timer = whisper_bench.StageTimer()
+    timer.wrap(module, "linear")
+    module(torch.zeros(1, 4))
+    module(torch.zeros(1, 4))
+    assert timer.times["linear"] > 0
+    measured = dict(timer.times)
+    timer.remove()
+    assert module.forward == forward
+    assert not module._forward_pre_hooks and not module._forward_hooks
+    module(torch.zeros(1, 4))
+    assert timer.times == measured
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import torch
+
+import whisper_common
+import whisper_core
+
+
+def test_sampled_fallback_decodes_several_windows(tiny_model):
+    engine = whisper_core.InferenceEngine("tiny")
+    try:
+        with torch.no_grad():
+            features = tiny_model.encoder(torch.zeros(2, tiny_model.dims.n_mels, 3000))
+        # Temperatur > 0: whisper dekodiert mit best_of mehrere Stichproben je Fenster
+        results = engine.decode_with_fallback(tiny_model, features, "de", "transcribe", None, (0.5,))
+    finally:
+        engine.close()
+    assert len(results) == 2
+    assert all(result.temperature == 0.5 for result in results)
+
+
+def request(seconds, **options):
+    audio = np.zeros(int(seconds * whisper_common.WHISPER_SAMPLE_RATE), dtype=np.float32)
+    return whisper_core.TranscriptionRequest(audio, options)
+
+
+@pytest.mark.parametrize("options, fp16, expected", [
+    ({"language": "de", "initial_prompt": "Befund", "temperature": 0.0}, False, True),
+    ({"fp16": False}, False, True),
+    ({"fp16": True}, False, False),
+    ({"fp16": True}, True, True),
+    ({"verbose": True}, False, False),
+    ({"word_timestamps": True}, False, False),
+    ({"condition_on_previous_text": True}, False, True),
+    ({"condition_on_previous_text": False}, False, True),
+])
+def test_batching_only_for_options_the_batched_path_honours(options, fp16, expected):
+    assert request(5, **options).batchable(fp16=fp16) is expected
+
+
+def test_several_windows_are_batched_only_without_previous_text_conditioning():
+    seconds = whisper_core.ENGINE_WINDOW_SECONDS + 5
+    assert not request(seconds, language="de").batchable()
+    assert not request(seconds, condition_on_previous_text=True).batchable()
+    assert request(seconds, condition_on_previous_text=False).batchable()
+    assert not request(whisper_core.ENGINE_BATCH_MAX_SECONDS + 1, condition_on_previous_text=False).batchable()
+
+
+def test_decoding_model_transcribes_without_touching_the_pooled_model(tiny_model):
+    view = whisper_core.DecodingModel(tiny_model)
+    result = view.transcribe(np.zeros(whisper_common.WHISPER_SAMPLE_RATE, dtype=np.float32), language="de", fp16=False,
+                             temperature=0.0, word_timestamps=True)
+    assert result["language"] == "de"
+    assert "decode" not in tiny_model.__dict__
+    assert view.dims is tiny_model.dims
+
+
+def test_encoder_cache_lives_in_the_view_not_on_the_pooled_model(tiny_model):
+    cache = whisper_core.FeatureCache()
+    view = whisper_core.DecodingModel(tiny_model, features=cache)
+    mel = torch.randn(2, tiny_model.dims.n_mels, 3000)
+    with torch.no_grad():
+        first = view.embed_audio(mel)
+        second = view.embed_audio(mel)
+        direct = tiny_model.encoder(mel)
+    assert (cache.misses, cache.hits) == (2, 2)
+    assert torch.allclose(first, second) and torch.allclose(first, direct)
+    assert "forward" not in tiny_model.encoder.__dict__
+    # Ohne View läuft der Encoder am Cache vorbei
+    assert (cache.misses, cache.hits) == (2, 2)
+
+
+def test_windows_fit_the_encoder():
+    engine = whisper_core.InferenceEngine("tiny")
+    try:
+        for seconds in (29.0, 30.0, 45.0, 61.0, 119.0):
+            audio = np.random.default_rng(0).normal(0, 0.1, int(seconds * whisper_common.WHISPER_SAMPLE_RATE))
+            windows = engine.split_windows(audio.astype(np.float32))
+            assert windows[-1]["end"] == len(audio)
+            assert max(w["end"] - w["start"] for w in windows) <= 30 * whisper_common.WHISPER_SAMPLE_RATE
+    finally:
+        engine.close()
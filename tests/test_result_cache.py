@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+import whisper_core
+
+
+def audio(seed=0):
+    return np.random.default_rng(seed).standard_normal(16000).astype(np.float32)
+
+
+def result(text, padding=0):
+    return {"text": text, "segments": [], "language": "de", "padding": "x" * padding}
+
+
+def test_key_depends_on_audio_model_and_options_but_not_verbose():
+    key = whisper_core.ResultCache.make_key(audio(), "base", {"language": "de", "verbose": True})
+    assert key == whisper_core.ResultCache.make_key(audio(), "base", {"language": "de", "verbose": False})
+    assert key == whisper_core.ResultCache.make_key(audio().astype(np.float64), "base", {"language": "de"})
+    assert key != whisper_core.ResultCache.make_key(audio(1), "base", {"language": "de"})
+    assert key != whisper_core.ResultCache.make_key(audio(), "small", {"language": "de"})
+    assert key != whisper_core.ResultCache.make_key(audio(), "base", {"language": "en"})
+
+
+def test_put_and_get_round_trip_with_numpy_values(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path))
+    cache.put("a", {"text": "hallo", "tokens": np.array([1, 2]), "avg": np.float32(0.5)}, elapsed=2.0)
+    assert cache.get("a") == {"text": "hallo", "tokens": [1, 2], "avg": 0.5}
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"], stats["entries"]) == (1, 1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["time_saved"] == 2.0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_evicts_least_recently_used_over_budget(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path), max_bytes=2500)
+    cache.put("a", result("a", 1000), 1.0)
+    cache.put("b", result("b", 1000), 1.0)
+    assert cache.get("a") is not None  # a ist jetzt neuer als b
+    cache.put("c", result("c", 1000), 1.0)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.stats()["bytes"] <= 2500
+
+
+def test_replacing_an_entry_does_not_count_twice(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path))
+    cache.put("a", result("a", 100), 1.0)
+    cache.put("a", result("a", 200), 1.0)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == os.path.getsize(cache.path("a"))
+
+
+def test_keeps_the_newest_entry_even_if_it_alone_exceeds_the_budget(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path), max_bytes=10)
+    cache.put("a", result("a", 100), 1.0)
+    assert cache.get("a") is not None
+
+
+def test_reopened_cache_evicts_by_modification_time(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path))
+    for index, key in enumerate(["old", "new"]):
+        cache.put(key, result(key, 1000), 1.0)
+        os.utime(cache.path(key), (1000 + index, 1000 + index))
+    reopened = whisper_core.ResultCache(str(tmp_path), max_bytes=2500)
+    assert list(reopened.entries) == ["old", "new"]
+    reopened.put("third", result("third", 1000), 1.0)
+    assert reopened.get("old") is None
+    assert reopened.get("new") is not None
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = whisper_core.ResultCache(str(tmp_path))
+    with open(cache.path("broken"), "w") as f:
+        f.write("{not json")
+    assert cache.get("broken") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import whisper_core
+
+SEGMENTS = [
+    {"id": 0, "start": 0.0, "end": 2.5, "text": " Guten Morgen.", "avg_logprob": -0.2, "no_speech_prob": 0.01,
+     "compression_ratio": 1.1, "temperature": 0.0,
+     "words": [{"word": " Guten", "start": 0.0, "end": 1.0, "probability": 0.9},
+               {"word": " Morgen.", "start": 1.0, "end": 2.5, "probability": 0.8}]},
+    {"id": 1, "start": 3661.25, "end": 3662.0, "text": " Wie geht's?"},
+]
+
+
+def write_all(writer_class, path, summary=None):
+    writer = writer_class(str(path))
+    for segment in SEGMENTS:
+        writer.write(segment)
+    writer.close(summary)
+    return path.read_text(encoding="utf-8")
+
+
+def test_txt(tmp_path):
+    assert write_all(whisper_core.TxtSegmentWriter, tmp_path / "a.txt") == "Guten Morgen.\nWie geht's?\n"
+
+
+def test_srt(tmp_path):
+    assert write_all(whisper_core.SrtSegmentWriter, tmp_path / "a.srt") == (
+        "1\n00:00:00,000 --> 00:00:02,500\nGuten Morgen.\n\n"
+        "2\n01:01:01,250 --> 01:01:02,000\nWie geht's?\n\n")
+
+
+def test_vtt(tmp_path):
+    assert write_all(whisper_core.VttSegmentWriter, tmp_path / "a.vtt") == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:02.500\nGuten Morgen.\n\n"
+        "01:01:01.250 --> 01:01:02.000\nWie geht's?\n\n")
+
+
+def test_jsonl_has_segment_records_and_an_end_record(tmp_path):
+    lines = write_all(whisper_core.JsonlSegmentWriter, tmp_path / "a.jsonl", {"language": "de"}).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["type"] for record in records] == ["segment", "segment", "end"]
+    first = records[0]
+    assert first["text"] == "Guten Morgen." and first["avg_logprob"] == -0.2
+    assert first["words"][1] == {"word": " Morgen.", "start": 1.0, "end": 2.5, "probability": 0.8}
+    assert "words" not in records[1]
+    assert records[2] == {"type": "end", "segments": 2, "language": "de"}
+
+
+def test_jsonl_without_summary_has_no_end_record(tmp_path):
+    lines = write_all(whisper_core.JsonlSegmentWriter, tmp_path / "a.jsonl").splitlines()
+    assert len(lines) == 2
+
+
+@pytest.mark.parametrize("fmt", sorted(whisper_core.SEGMENT_WRITERS))
+def test_every_segment_is_flushed_right_away(tmp_path, fmt):
+    writer = whisper_core.SEGMENT_WRITERS[fmt](str(tmp_path / f"a.{fmt}"))
+    writer.write(SEGMENTS[0])
+    assert "Guten Morgen." in (tmp_path / f"a.{fmt}").read_text(encoding="utf-8")
+    writer.close()
+
+
+def test_stream_writes_streaming_and_whole_formats(tmp_path):
+    stream = whisper_core.TranscriptStream("talk", str(tmp_path), ["txt", "jsonl", "json"])
+    stream.add({"language": "de", "segments": [dict(SEGMENTS[0])]})
+    assert (tmp_path / "talk.txt").read_text(encoding="utf-8") == "Guten Morgen.\n"
+    stream.add({"language": "en", "segments": [dict(SEGMENTS[1])]})
+    paths = stream.close(audio_seconds=3662.0)
+    assert sorted(os.path.basename(path) for path in paths) == ["talk.json", "talk.jsonl", "talk.txt"]
+    whole = json.loads((tmp_path / "talk.json").read_text(encoding="utf-8"))
+    assert whole["language"] == "de"
+    assert [segment["text"] for segment in whole["segments"]] == [" Guten Morgen.", " Wie geht's?"]
+    end = json.loads((tmp_path / "talk.jsonl").read_text(encoding="utf-8").splitlines()[-1])
+    assert end == {"type": "end", "segments": 2, "audio_seconds": 3662.0, "language": "de"}
+
+
+def test_discard_removes_partial_files(tmp_path):
+    stream = whisper_core.TranscriptStream("talk", str(tmp_path), ["txt", "srt"])
+    stream.add({"language": "de", "segments": [dict(SEGMENTS[0])]})
+    stream.discard()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import whisper_common
+import whisper_core
+
+RATE = whisper_common.WHISPER_SAMPLE_RATE
+
+
+def tone(seconds, amplitude=0.3, freq=1000.0):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def noise(seconds, amplitude=0.001, seed=0):
+    return (amplitude * np.random.default_rng(seed).standard_normal(int(seconds * RATE))).astype(np.float32)
+
+
+def test_detects_speech_between_silences():
+    audio = np.concatenate([noise(1.0), tone(1.0) + noise(1.0, seed=1), noise(2.0, seed=2)])
+    regions = whisper_common.detect_speech_regions(audio)
+    assert len(regions) == 1
+    start, end = regions[0]
+    frame = RATE * whisper_common.VAD_FRAME_MS // 1000
+    padding = RATE * whisper_common.VAD_PADDING_MS // 1000
+    hangover = RATE * whisper_common.VAD_HANGOVER_MS // 1000
+    assert abs(start - (RATE - padding)) <= frame
+    assert abs(end - (2 * RATE + hangover + padding)) <= 2 * frame
+
+
+def test_silence_and_short_input_have_no_regions():
+    assert whisper_common.detect_speech_regions(np.zeros(3 * RATE, dtype=np.float32)) == []
+    assert whisper_common.detect_speech_regions(np.zeros(10, dtype=np.float32)) == []
+
+
+def test_compact_speech_keeps_regions_in_order_with_gaps():
+    audio = np.arange(10 * RATE, dtype=np.float32)
+    regions = [(RATE, 2 * RATE), (5 * RATE, 7 * RATE)]
+    compact, timeline = whisper_common.compact_speech(audio, regions, gap_seconds=0.5)
+    gap = RATE // 2
+    assert len(compact) == 3 * RATE + 2 * gap
+    assert np.array_equal(compact[:RATE], audio[RATE:2 * RATE])
+    assert np.all(compact[RATE:RATE + gap] == 0)
+    assert np.array_equal(compact[RATE + gap:3 * RATE + gap], audio[5 * RATE:7 * RATE])
+    assert timeline.tolist() == [[0.0, 1.0, 1.0], [1.5, 5.0, 2.0]]
+
+
+def test_compact_speech_without_regions():
+    compact, timeline = whisper_common.compact_speech(np.ones(RATE, dtype=np.float32), [])
+    assert len(compact) == 0
+    assert len(timeline) == 0
+
+
+@pytest.mark.parametrize("compact_time, original_time", [
+    (0.0, 1.0),    # Anfang des ersten Bereichs
+    (0.25, 1.25),
+    (1.2, 2.0),    # in der Lücke: Ende des vorherigen Bereichs
+    (1.5, 5.0),    # Anfang des zweiten Bereichs
+    (3.0, 6.5),
+    (9.0, 7.0),    # hinter dem Ende: Ende des letzten Bereichs
+])
+def test_remap_timestamp(compact_time, original_time):
+    timeline = np.array([[0.0, 1.0, 1.0], [1.5, 5.0, 2.0]])
+    assert whisper_common.remap_timestamp(compact_time, timeline) == pytest.approx(original_time)
+
+
+def test_remap_timestamp_without_timeline():
+    assert whisper_common.remap_timestamp(3.5, np.zeros((0, 3))) == 3.5
+
+
+class RecordingModel:
+    """Returns fixed segments on the compacted timeline and remembers what it was given"""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.audio = None
+
+    def transcribe(self, audio, **options):
+        self.audio = audio
+        return {"text": "".join(s["text"] for s in self.segments), "language": "de",
+                "segments": [dict(s, words=[dict(w) for w in s.get("words", [])]) for s in self.segments]}
+
+
+def test_transcribe_with_vad_maps_segments_and_words_back():
+    audio = np.concatenate([noise(2.0), tone(1.0), noise(3.0, seed=1), tone(1.0), noise(2.0, seed=2)])
+    model = RecordingModel([
+        {"start": 0.1, "end": 0.9, "text": " eins", "words": [{"start": 0.1, "end": 0.5, "word": " eins"}]},
+    ])
+    result = whisper_core.transcribe_with_vad(model, audio, language="de")
+    assert len(model.audio) < len(audio)
+    regions = whisper_common.detect_speech_regions(audio)
+    first = regions[0][0] / RATE
+    segment = result["segments"][0]
+    assert segment["start"] == pytest.approx(first + 0.1)
+    assert segment["end"] == pytest.approx(first + 0.9)
+    assert segment["words"][0]["end"] == pytest.approx(first + 0.5)
+    assert result["vad"]["regions"] == 2
+    assert 0 < result["vad"]["skipped_fraction"] < 1
+
+
+def test_transcribe_with_vad_skips_silent_audio():
+    model = RecordingModel([])
+    result = whisper_core.transcribe_with_vad(model, np.zeros(3 * RATE, dtype=np.float32), language="de")
+    assert model.audio is None
+    assert result["segments"] == []
+    assert result["vad"]["skipped_fraction"] == 1.0
@@ -0,0 +1,133 @@
+import pickle
+
+import numpy as np
+import pytest
+import torch
+import whisper
+
+import whisper_common
+import whisper_core
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    return whisper.tokenizer.get_tokenizer(True, num_languages=99, language="de", task="transcribe")
+
+
+def profile(**kwargs):
+    kwargs.setdefault("boost", ["Echokardiographie", "EKG"])
+    return whisper_core.VocabularyProfile("Kardiologie", **kwargs)
+
+
+def test_profile_defaults_the_prompt_to_its_terms_and_names_its_content():
+    first = profile()
+    assert first.prompt == "Echokardiographie, EKG."
+    assert profile(prompt="Befund:").prompt == "Befund:"
+    assert str(first) == str(profile())
+    assert str(first) != str(profile(boost_value=3.0))
+    assert str(first).startswith("vocabulary:Kardiologie:")
+
+
+def test_tokens_are_prepared_once_per_tokenizer_and_not_pickled(tokenizer):
+    vocabulary = profile()
+    tokens = vocabulary.tokens(tokenizer)
+    assert vocabulary.tokens(tokenizer) is tokens
+    assert pickle.loads(pickle.dumps(vocabulary)).prepared == {}
+
+
+def test_boost_table_holds_every_prefix_of_a_term(tokenizer):
+    ids = tokenizer.encode(" Echokardiographie")
+    assert len(ids) > 2
+    tokens = profile(boost=["Echokardiographie"], boost_value=2.5).tokens(tokenizer)
+    for depth in range(1, len(ids)):
+        assert tokens.weights[tuple(ids[:depth])] == ([ids[depth]], [2.5])
+    # Der Anfang eines Begriffs gilt bei jedem Schritt und bekommt nur einen kleinen Teil
+    assert tokens.weights[()] == ([ids[0]], [pytest.approx(2.5 * whisper_core.VOCABULARY_START_FACTOR)])
+    assert tokens.depth == len(ids) - 1
+    assert tokens.prompt == tokenizer.encode(" Echokardiographie.")
+
+
+def test_suppressed_terms(tokenizer):
+    single = tokenizer.encode(" und")
+    several = tokenizer.encode(" ähm")
+    assert len(single) == 1 and len(several) > 1
+    tokens = profile(boost=[], suppress=["und", "ähm"]).tokens(tokenizer)
+    assert tokens.suppress == single
+    assert tokens.blocked[tuple(several[:-1])] == ([several[-1]], [float("-inf")])
+
+
+def test_options_put_the_profile_prompt_in_front_and_keep_the_newest_context(tokenizer):
+    tokens = profile().tokens(tokenizer)
+    options = whisper.DecodingOptions(prompt=list(range(1000)), suppress_tokens="-1")
+    changed = tokens.options(options, n_text_ctx=448)
+    room = 448 // 2 - 1 - len(tokens.prompt)
+    assert changed.prompt == tokens.prompt + list(range(1000))[-room:]
+    assert changed.suppress_tokens == options.suppress_tokens
+    assert options.prompt == list(range(1000))
+
+
+def test_options_merge_suppressed_tokens_once(tokenizer):
+    tokens = profile(prompt="", boost=[], suppress=["und"]).tokens(tokenizer)
+    options = whisper.DecodingOptions(suppress_tokens="-1,5")
+    changed = tokens.options(options, n_text_ctx=448)
+    assert changed.suppress_tokens == [-1, 5] + tokens.suppress
+    assert tokens.options(options, n_text_ctx=448).suppress_tokens is changed.suppress_tokens
+
+
+def test_options_without_anything_to_change_are_returned_as_is(tokenizer):
+    tokens = whisper_core.VocabularyProfile("leer").tokens(tokenizer)
+    options = whisper.DecodingOptions()
+    assert tokens.options(options, n_text_ctx=448) is options
+
+
+def test_boost_filter_boosts_the_continuation_of_the_longest_prefix(tokenizer):
+    ids = tokenizer.encode(" Echokardiographie")
+    tokens = profile(boost=["Echokardiographie"], boost_value=2.0).tokens(tokenizer)
+    boost = whisper_core.BoostTokens(tokens, sample_begin=3, device="cpu")
+    history = torch.tensor([[1, 2, 3, ids[0]], [1, 2, 3, 7]])
+    logits = torch.zeros(2, tokenizer.encoding.n_vocab)
+    boost.apply(logits, history)
+    assert logits[0, ids[1]] == 2.0
+    assert logits[1, ids[1]] == 0.0
+    # Im Begriff nur die Fortsetzung, außerhalb nur der schwache Anfangsbonus
+    assert logits[0, ids[0]] == 0.0
+    assert logits[1, ids[0]] == pytest.approx(2.0 * whisper_core.VOCABULARY_START_FACTOR)
+
+
+def test_boost_filter_blocks_suppressed_terms(tokenizer):
+    several = tokenizer.encode(" ähm")
+    tokens = profile(boost=[], suppress=["ähm"]).tokens(tokenizer)
+    boost = whisper_core.BoostTokens(tokens, sample_begin=1, device="cpu")
+    history = torch.tensor([[1] + several[:-1]])
+    logits = torch.zeros(1, tokenizer.encoding.n_vocab)
+    boost.apply(logits, history)
+    assert logits[0, several[-1]] == float("-inf")
+
+
+def test_profiles_load_from_json(tmp_path):
+    path = tmp_path / "vocabulary.json"
+    path.write_text('{"Kardiologie": {"boost": ["EKG"], "suppress": ["ähm"], "boost_value": 3}}', encoding="utf-8")
+    profiles = whisper_core.load_vocabulary_profiles(str(path))
+    assert list(profiles) == ["Kardiologie"]
+    assert profiles["Kardiologie"].boost_value == 3.0
+    assert whisper_core.load_vocabulary_profiles(str(tmp_path / "missing.json")) == {}
+    path.write_text("{kaputt", encoding="utf-8")
+    assert whisper_core.load_vocabulary_profiles(str(path)) == {}
+
+
+def test_decoding_model_decodes_with_the_profile_and_leaves_the_model_alone(tiny_model, monkeypatch):
+    calls = []
+    monkeypatch.setattr(whisper_core, "decode_with_vocabulary",
+                        lambda model, mel, options, vocabulary: calls.append((model, vocabulary.name)) or "decoded")
+    view = whisper_core.DecodingModel(tiny_model, profile())
+    assert view.decode(torch.zeros(80, 3000)) == "decoded"
+    assert calls == [(view, "Kardiologie")]
+    assert "decode" not in tiny_model.__dict__
+
+
+def test_transcribe_with_a_profile(tiny_model):
+    audio = np.zeros(whisper_common.WHISPER_SAMPLE_RATE, dtype=np.float32)
+    result = whisper_core.transcribe_detecting_language(tiny_model, audio, language="de", fp16=False, temperature=0.0,
+                                                        vocabulary=profile())
+    assert result["language"] == "de"
+    assert "decode" not in tiny_model.__dict__
@@ -0,0 +1,149 @@
+import asyncio
+import urllib.parse
+
+import pytest
+
+import whisper_common
+import whisper_core
+import whisper_server
+
+
+def read_message(data, writer=None, max_size=None):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await whisper_server.read_websocket_message(reader, writer, max_size)
+    return asyncio.run(run())
+
+
+class Writer:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+
+def test_accept_key_from_rfc_6455():
+    assert whisper_server.websocket_accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+
+@pytest.mark.parametrize("length, header_length", [(5, 2), (125, 2), (126, 4), (300, 4), (65535, 4), (70000, 10)])
+def test_server_frame_lengths(length, header_length):
+    frame = whisper_server.websocket_frame(0x2, bytes(length))
+    assert frame[0] == 0x82
+    assert len(frame) == header_length + length
+    assert not frame[1] & 0x80
+
+
+@pytest.mark.parametrize("length", [0, 5, 300, 70000])
+@pytest.mark.parametrize("mask", [False, True])
+def test_frames_round_trip(length, mask):
+    payload = bytes(i % 251 for i in range(length))
+    frame = whisper_server.websocket_frame(0x2, payload, mask=mask)
+    assert bool(frame[1] & 0x80) == mask
+    assert read_message(frame) == (0x2, payload)
+
+
+def test_masked_payload_differs_on_the_wire():
+    frame = whisper_server.websocket_frame(0x1, "hallo welt", mask=True)
+    assert b"hallo welt" not in frame
+    assert read_message(frame) == (0x1, "hallo welt".encode())
+
+
+def test_fragmented_message_is_joined_and_keeps_the_first_opcode():
+    first = bytes([0x01, 5]) + b"hallo"  # Text ohne FIN
+    data = first + whisper_server.websocket_frame(0x0, " welt", mask=True)
+    assert read_message(data) == (0x1, b"hallo welt")
+
+
+def test_ping_is_answered_and_skipped():
+    writer = Writer()
+    data = whisper_server.websocket_frame(0x9, b"ping", mask=True) + whisper_server.websocket_frame(0x1, "text", mask=True)
+    assert read_message(data, writer) == (0x1, b"text")
+    assert bytes(writer.data) == whisper_server.websocket_frame(0xA, b"ping")
+
+
+def test_close_frame_is_returned():
+    assert read_message(whisper_server.websocket_frame(0x8, b"\x03\xe8", mask=True)) == (0x8, b"\x03\xe8")
+
+
+def test_oversized_message_is_rejected_before_its_payload_is_read():
+    # Nur der Kopf eines 2^62-Byte-Frames, die Nutzdaten kommen nie
+    header = bytes([0x82, 0xFF]) + (1 << 62).to_bytes(8, "big") + b"mask"
+    with pytest.raises(whisper_server.MessageTooBig):
+        read_message(header, max_size=1024)
+    # Die Grenze gilt für die zusammengesetzte Nachricht, nicht je Fragment
+    fragments = bytes([0x02, 4]) + b"abcd" + whisper_server.websocket_frame(0x0, b"efgh", mask=True)
+    assert read_message(fragments, max_size=8) == (0x2, b"abcdefgh")
+    with pytest.raises(whisper_server.MessageTooBig):
+        read_message(fragments, max_size=7)
+
+
+def request(server, head, body=b"\0" * 4):
+    async def run():
+        server.semaphore = asyncio.Semaphore(1)
+        reader = asyncio.StreamReader()
+        reader.feed_data(head.encode("latin-1") + body)
+        reader.feed_eof()
+        writer = Writer()
+        writer.drain = lambda: asyncio.sleep(0)
+        writer.close = lambda: None
+        await server.handle_connection(reader, writer)
+        return bytes(writer.data)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("model", ["large", "../models/other.pt", "/tmp/weights.pt"])
+@pytest.mark.parametrize("head", [
+    "POST /transcribe?model={} HTTP/1.1\r\nContent-Length: 4\r\n\r\n",
+    "GET /stream?model={} HTTP/1.1\r\nUpgrade: websocket\r\nSec-WebSocket-Key: a2V5\r\n\r\n",
+])
+def test_server_rejects_models_that_were_not_preloaded(model, head):
+    server = whisper_server.TranscriptionServer("base", "models", models=["small"])
+    engines = dict(whisper_core.ENGINES)
+    response = request(server, head.format(urllib.parse.quote(model)))
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"unknown model" in response
+    assert whisper_core.ENGINES == engines
+
+
+class WindowEngine:
+    """Engine double that answers every window with one segment covering it"""
+
+    def __init__(self):
+        self.windows = []
+
+    def transcribe(self, audio, **options):
+        self.windows.append(len(audio))
+        end = len(audio) / whisper_common.WHISPER_SAMPLE_RATE
+        return {"text": " x", "segments": [{"start": 0.0, "end": end, "text": " x"}]}
+
+
+def test_stream_finishes_window_by_window_from_the_committed_point(monkeypatch):
+    engine = WindowEngine()
+    monkeypatch.setitem(whisper_core.ENGINES, whisper_core.MODEL_POOL.make_key("base", None, "fp32"), engine)
+    second = whisper_server.websocket_frame(0x2, bytes(2 * whisper_common.WHISPER_SAMPLE_RATE), mask=True)
+    body = second * 70 + whisper_server.websocket_frame(0x1, '{"type": "end"}', mask=True)
+    head = "GET /stream?live=0 HTTP/1.1\r\nUpgrade: websocket\r\nSec-WebSocket-Key: a2V5\r\n\r\n"
+    response = request(whisper_server.TranscriptionServer("base", "models"), head, body)
+    window = whisper_core.LIVE_WINDOW_SECONDS * whisper_common.WHISPER_SAMPLE_RATE
+    assert engine.windows == [window, window, 10 * whisper_common.WHISPER_SAMPLE_RATE]
+    assert b'"text": "x x x"' in response
+
+
+def test_stream_closes_with_1009_on_an_oversized_message():
+    server = whisper_server.TranscriptionServer("base", "models", max_message_mb=1)
+    body = bytes([0x82, 0xFF]) + (2 * 1024 * 1024).to_bytes(8, "big") + b"mask"
+    head = "GET /stream?live=0 HTTP/1.1\r\nUpgrade: websocket\r\nSec-WebSocket-Key: a2V5\r\n\r\n"
+    response = request(server, head, body)
+    assert response.endswith(whisper_server.websocket_frame(0x8, (1009).to_bytes(2, "big") +
+                                                            f"message larger than {1024 * 1024} bytes".encode()))
+
+
+@pytest.mark.parametrize("length, status", [("-1", b"400"), ("abc", b"400"), (str(300 * 1024 * 1024), b"413")])
+def test_upload_length_is_checked_before_reading(length, status):
+    server = whisper_server.TranscriptionServer("base", "models")
+    response = request(server, f"POST /transcribe HTTP/1.1\r\nContent-Length: {length}\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 " + status)
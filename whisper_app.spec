@@ -8,29 +8,52 @@ block_cipher = None
 # Get the absolute path to the project directory
 project_dir = os.path.abspath(os.path.dirname('whisper_transcription.py'))
 
-# Collect whisper model files
-whisper_models = collect_data_files('whisper', include_py_files=True)
+# onedir: Ordner mit entpackten Bibliotheken, startet ohne Entpacken; onefile: das bisherige Einzel-Executable
+build_mode = os.environ.get("WHISPER_BUILD_MODE", "onedir")
+if build_mode not in ("onedir", "onefile"):
+    raise SystemExit(f"WHISPER_BUILD_MODE must be onedir or onefile, not {build_mode!r}")
 
-# Collect model files if they exist
-models_dir = os.path.join(project_dir, "models")
-model_files = []
-if os.path.exists(models_dir):
-    for model_file in os.listdir(models_dir):
-        if model_file.endswith('.pt'):
-            model_files.append((
-                os.path.join(models_dir, model_file),
-                os.path.join('models', model_file)
-            ))
+# Ausschlüsse: torch, numba und scipy ziehen diese Pakete nur über optionale Integrationen
+# (Notebooks, Trainings-Logging) nach. build_linux.py --check-excludes liest diese Liste und prüft
+# sie gegen Läufe der Kommandozeilenbefehle; die GUI nur, wenn ein Display vorhanden ist.
+# Untermodule von torch und scipy (torch._inductor, torch._dynamo, ...) bleiben bewusst drin:
+# zusammen unter 1 % des Ordners, und torch importiert sie erst bei Bedarf nach.
+EXCLUDES = [
+    "IPython", "jedi", "parso", "prompt_toolkit", "traitlets",  # interaktive Shells
+    "tensorboard", "torch.utils.tensorboard",  # Trainings-Logging
+    "matplotlib",  # Plots
+]
+
+if build_mode == "onefile":
+    # Collect whisper model files
+    whisper_models = collect_data_files('whisper', include_py_files=True)
+
+    # Collect model files if they exist
+    models_dir = os.path.join(project_dir, "models")
+    model_files = []
+    if os.path.exists(models_dir):
+        for model_file in os.listdir(models_dir):
+            if model_file.endswith('.pt'):
+                model_files.append((
+                    os.path.join(models_dir, model_file),
+                    os.path.join('models', model_file)
+                ))
+else:
+    # Nur die Assets (Mel-Filter, Tokenizer); der Code liegt ohnehin kompiliert im Archiv.
+    # Modelle kommen nicht ins Paket, sie werden aus models/ neben dem Executable geladen.
+    whisper_models = collect_data_files('whisper')
+    model_files = []
+
+# Add FFmpeg path for Windows (nur wenn vorhanden; sonst wird es zur Laufzeit gesucht)
+ffmpeg_dir = 'C:\\Users\\lukas\\AppData\\Local\\Microsoft\\WinGet\\Packages\\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\\ffmpeg-7.1-full_build\\bin'
+ffmpeg_files = [(os.path.join(ffmpeg_dir, name), '.') for name in ('ffmpeg.exe', 'ffprobe.exe')
+                if os.path.exists(os.path.join(ffmpeg_dir, name))]
 
 a = Analysis(
     ['whisper_transcription.py'],
     pathex=[],
     binaries=[],
-    datas=[
-        # Add FFmpeg path for Windows
-        ('C:\\Users\\lukas\\AppData\\Local\\Microsoft\\WinGet\\Packages\\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\\ffmpeg-7.1-full_build\\bin\\ffmpeg.exe', '.'),
-        ('C:\\Users\\lukas\\AppData\\Local\\Microsoft\\WinGet\\Packages\\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\\ffmpeg-7.1-full_build\\bin\\ffprobe.exe', '.')
-    ] + whisper_models + model_files,
+    datas=ffmpeg_files + whisper_models + model_files,
     hiddenimports=[
         'tiktoken',
         'scipy',
@@ -44,7 +67,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -53,24 +76,54 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='WhisperTranscription',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='app_icon.ico'  # Optional: Add this line if you have an icon
-) 
\ No newline at end of file
+if build_mode == "onefile":
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        name='WhisperTranscription',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='app_icon.ico'  # Optional: Add this line if you have an icon
+    )
+else:
+    # Bibliotheken liegen neben dem Executable; ohne UPX müssen sie beim Laden nicht entpackt werden
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='WhisperTranscription',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='app_icon.ico'
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='WhisperTranscription',
+    )
@@ -0,0 +1,377 @@
+"""Headless batch transcription of files, globs and directories with a worker pool"""
+
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from whisper_common import (
+    AUDIO_EXTENSIONS, default_cache_dir, default_result_cache_dir, file_sha256, load_audio_file,
+    stream_chunks, torch, WHISPER_SAMPLE_RATE,
+)
+from whisper_store import ModelStore
+from whisper_core import (
+    DecodingModel, FeatureCache, MODEL_POOL, ResultCache, SEGMENT_WRITERS, transcribe_detecting_language,
+    transcribe_with_vad, TranscriptStream, vocabulary_profile,
+)
+
+
+# Batch-Transkription ohne GUI
+_batch_model = None
+_batch_model_args = None
+_batch_options = {}
+_batch_cache = None
+_batch_features = None
+_batch_paths = None
+_batch_results = None
+
+
+def collect_input_files(inputs):
+    """Expand files, glob patterns and directories into a sorted list of audio files"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1].lower() in AUDIO_EXTENSIONS:
+                        files.append(os.path.join(dirpath, filename))
+        elif glob.has_magic(item):
+            files.extend(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            print(f"Warning: input not found: {item}")
+    # Doppelte Angaben nur einmal transkribieren
+    return sorted(set(os.path.abspath(path) for path in files))
+
+
+def cpu_slice(index, threads):
+    """CPU ids for the worker with the given index, or None if affinity is not supported"""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cpus = sorted(os.sched_getaffinity(0))
+    start = (index * threads) % len(cpus)
+    return set(cpus[start:start + threads]) or None
+
+
+def _batch_worker_init(model_name, precision, download_root, threads, counter, options, cache_dir, paths, results):
+    """Pool initializer: pin the worker to its CPU slice; the model loads on the first cache miss
+
+    paths and results are the queues of whole-file mode (see _batch_worker_loop).
+    """
+    global _batch_model_args, _batch_options, _batch_cache, _batch_features, _batch_paths, _batch_results
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    
+    torch.set_num_threads(threads)
+    cpus = cpu_slice(index, threads)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    
+    _batch_model_args = (model_name, precision, download_root)
+    _batch_options = options
+    _batch_cache = ResultCache(cache_dir) if cache_dir else None
+    # Klein gehalten: dient nur dazu, das Fenster der Spracherkennung nicht doppelt zu kodieren
+    _batch_features = FeatureCache(64 * 1024 * 1024)
+    _batch_paths = paths
+    _batch_results = results
+    print(f"Worker {index} (pid {os.getpid()}): {threads} threads, CPUs {sorted(cpus) if cpus else 'any'}")
+
+
+def _batch_transcribe_task(task):
+    """Transcribe one file or one chunk of a file inside a worker process"""
+    global _batch_model
+    path, index, audio = task
+    options = dict(_batch_options)
+    use_vad = options.pop("vad", False)
+    start = time.perf_counter()
+    try:
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        if _batch_cache is not None:
+            cache_key = ResultCache.make_key(audio, _batch_model_args[0],
+                                             dict(_batch_options, precision=_batch_model_args[1]))
+            result = _batch_cache.get(cache_key)
+            if result is not None:
+                return path, index, result, duration, time.perf_counter() - start, None, True
+        
+        if _batch_model is None:
+            model, _ = MODEL_POOL.get(_batch_model_args[0], precision=_batch_model_args[1],
+                                      download_root=_batch_model_args[2])
+            _batch_model = DecodingModel(model, features=_batch_features)
+        inference_start = time.perf_counter()
+        if use_vad:
+            result = transcribe_with_vad(_batch_model, audio, **options)
+        else:
+            result = transcribe_detecting_language(_batch_model, audio, **options)
+        if _batch_cache is not None:
+            _batch_cache.put(cache_key, result, time.perf_counter() - inference_start)
+    except Exception as e:
+        return path, index, None, 0.0, time.perf_counter() - start, f"{type(e).__name__}: {e}", False
+    return path, index, result, duration, time.perf_counter() - start, None, False
+
+
+def _decode_next_file():
+    """Next path from the shared queue with its decoded audio: (path, audio, error), None at the end"""
+    path = _batch_paths.get()
+    if path is None:
+        return None
+    start = time.perf_counter()
+    try:
+        return path, load_audio_file(path), None
+    except Exception as e:
+        return path, None, (f"{type(e).__name__}: {e}", time.perf_counter() - start)
+
+
+def _batch_worker_loop():
+    """Whole-file mode: transcribe files from the shared queue until its end marker
+
+    A thread decodes the next file with FFmpeg while the current one is transcribed,
+    so decoding never waits for inference and vice versa. At most two decoded files
+    are held per worker.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode") as decoder:
+        upcoming = decoder.submit(_decode_next_file)
+        while True:
+            item = upcoming.result()
+            if item is None:
+                return
+            upcoming = decoder.submit(_decode_next_file)
+            path, audio, error = item
+            if error is not None:
+                _batch_results.put((path, 0, None, 0.0, error[1], error[0], False))
+            else:
+                _batch_results.put(_batch_transcribe_task((path, 0, audio)))
+
+
+def _submit_batch_tasks(pool, paths, chunk_seconds, results, slots, chunk_plans, chunk_lists, path_queue, workers):
+    """Feed files (or chunks of long files) to the pool with a bounded number in flight
+
+    Whole files go through path_queue to one _batch_worker_loop per worker, which
+    decodes its own files one ahead, so decoded audio is never pickled across
+    processes. Only with chunk_seconds does the main process run FFmpeg, handing out
+    chunks while FFmpeg still reads the rest.
+    chunk_lists[path] grows with every submitted chunk, so its results can be written
+    while later chunks are still decoded; chunk_plans[path] is set once all of a file's
+    tasks are submitted, for chunked files announced by a (path, None, ...) marker in
+    results.
+    """
+    def submit(task):
+        slots.acquire()
+        pool.apply_async(_batch_transcribe_task, (task,),
+                         callback=lambda result: (results.put(result), slots.release()),
+                         error_callback=lambda e, task=task: failed(task[0], task[1], e))
+    
+    def failed(path, index, error):
+        results.put((path, index, None, 0.0, 0.0, f"{type(error).__name__}: {error}", False))
+        slots.release()
+    
+    if chunk_seconds:
+        for path in paths:
+            # Stücke schon an die Worker geben, während FFmpeg den Rest der Datei dekodiert
+            plan = chunk_lists[path] = []
+            try:
+                for chunk, audio in stream_chunks(path, chunk_seconds):
+                    plan.append(chunk)
+                    submit((path, len(plan) - 1, audio))
+            except Exception as e:
+                plan.append(None)
+                slots.acquire()
+                failed(path, len(plan) - 1, e)
+            chunk_plans[path] = plan
+            results.put((path, None, None, 0.0, 0.0, None, False))
+        return
+    
+    for path in paths:
+        chunk_lists[path] = chunk_plans[path] = [None]
+        path_queue.put(path)
+    # Jeder Worker nimmt einen Lauf und hält ihn bis zu seinem Ende-Zeichen, die Dateien verteilt die Warteschlange
+    for _ in range(workers):
+        path_queue.put(None)
+    for _ in range(workers):
+        pool.apply_async(_batch_worker_loop, error_callback=lambda e: print(f"Batch worker failed: {e}"))
+
+
+def load_batch_progress(progress_path):
+    """Read the progress log of earlier runs: content hash -> entry"""
+    done = {}
+    if os.path.exists(progress_path):
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Abgebrochene letzte Zeile
+                done[entry["sha256"]] = entry
+    return done
+
+
+def output_stem(path, digest, stems):
+    """Output file name without extension, unique within one output directory"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stems.get(stem, digest) != digest:
+        stem = f"{stem}-{digest[:8]}"
+    stems[stem] = digest
+    return stem
+
+
+def run_batch(args):
+    """Transcribe many files with a pool of worker processes"""
+    files = collect_input_files(args.inputs)
+    if not files:
+        print("No audio files found.")
+        return 1
+    
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in SEGMENT_WRITERS and fmt not in ("json", "tsv")]
+    if unknown:
+        print(f"Unknown output format: {', '.join(unknown)}")
+        return 1
+    vocabulary = vocabulary_profile(args.vocabulary) if args.vocabulary else None
+    if args.vocabulary and vocabulary is None:
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    progress_path = os.path.join(args.output_dir, "batch_progress.jsonl")
+    done = load_batch_progress(progress_path)
+    
+    # Bereits erledigte Dateien (gleicher Inhalt, Ausgaben vorhanden) überspringen
+    pending = []
+    digests = {}
+    stems = {}
+    # Namen früherer Läufe reservieren, damit keine fremden Ausgaben überschrieben werden
+    used_stems = {os.path.splitext(os.path.basename(entry["outputs"][0]))[0]: digest
+                  for digest, entry in done.items() if entry["outputs"]}
+    skipped = 0
+    for path in files:
+        digest = file_sha256(path)
+        entry = done.get(digest)
+        if entry and all(os.path.exists(output) for output in entry["outputs"]):
+            skipped += 1
+            continue
+        digests[path] = digest
+        stems[path] = output_stem(path, digest, used_stems)
+        pending.append(path)
+    print(f"{len(files)} files, {skipped} already done, {len(pending)} to transcribe")
+    if not pending:
+        return 0
+    
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = max(1, min(args.workers or 1, len(pending)))
+    threads = args.threads or max(1, cpu_count // workers)
+    options = {"language": args.language, "fp16": False, "vad": args.vad}
+    if args.word_timestamps:
+        options["word_timestamps"] = True
+    if vocabulary is not None:
+        options["vocabulary"] = vocabulary
+    download_root = args.model_dir or default_cache_dir()
+    cache_dir = None if args.no_cache else default_result_cache_dir()
+    # Einmal hier in den Modell-Speicher übernehmen, die Worker mappen dann dieselbe Datei
+    try:
+        if not os.path.isfile(args.model):
+            ModelStore(download_root).prepare(args.model, args.precision, download_root)
+    except Exception as e:
+        print(f"Could not prepare {args.model} in the model store: {e}")
+    
+    audio_seconds = 0.0
+    failed = 0
+    cached = 0
+    languages = Counter()
+    number = 0
+    start = time.perf_counter()
+    counter = multiprocessing.Value("i", 0)
+    # Ergebnisse kommen aus den Callbacks des Pools (Stücke) oder direkt aus den Worker-Läufen (ganze Dateien)
+    results = multiprocessing.Queue()
+    path_queue = multiprocessing.Queue()
+    slots = threading.BoundedSemaphore(workers * 2)
+    chunk_plans = {}
+    chunk_lists = {}
+    files_state = {}
+    with multiprocessing.Pool(workers, initializer=_batch_worker_init,
+                              initargs=(args.model, args.precision, download_root, threads, counter, options,
+                                        cache_dir, path_queue, results)) as pool, \
+            open(progress_path, "a", encoding="utf-8") as progress:
+        feeder = threading.Thread(target=_submit_batch_tasks, daemon=True,
+                                  args=(pool, pending, args.chunk_seconds, results, slots, chunk_plans,
+                                        chunk_lists, path_queue, workers))
+        feeder.start()
+        
+        while number < len(pending):
+            path, index, result, duration, elapsed, error, hit = results.get()
+            state = files_state.setdefault(path, {"parts": {}, "next": 0, "received": 0, "stream": None,
+                                                  "duration": 0.0, "elapsed": 0.0, "hits": 0, "error": None})
+            if index is not None:
+                state["received"] += 1
+                state["elapsed"] += elapsed
+                if error:
+                    state["error"] = state["error"] or error
+                elif state["error"] is None:
+                    state["parts"][index] = (result, duration, hit)
+            # Fertige Stücke in Reihenfolge sofort schreiben und freigeben, statt bis zum Dateiende zu sammeln
+            while state["error"] is None and state["next"] in state["parts"]:
+                result, duration, hit = state["parts"].pop(state["next"])
+                chunk = chunk_lists[path][state["next"]]
+                if state["stream"] is None:
+                    language = result.get("language") or "unknown"
+                    output_dir = os.path.join(args.output_dir, language) if args.group_by_language \
+                        else args.output_dir
+                    state["stream"] = TranscriptStream(stems[path], output_dir, formats)
+                    state["language_detection"] = result.get("language_detection")
+                state["stream"].add(result, chunk)
+                state["duration"] += duration if chunk is None else \
+                    (chunk["own_end"] - chunk["own_start"]) / WHISPER_SAMPLE_RATE
+                state["hits"] += hit
+                state["next"] += 1
+            plan = chunk_plans.get(path)
+            if plan is None or state["received"] < len(plan):
+                continue
+            del files_state[path]
+            del chunk_lists[path]
+            number += 1
+            
+            stream = state["stream"]
+            if stream is None and not state["error"]:
+                state["error"] = "no audio"
+            if state["error"]:
+                failed += 1
+                if stream is not None:
+                    stream.discard()
+                print(f"[{number}/{len(pending)}] FAILED {path}: {state['error']}")
+                continue
+            duration = state["duration"]
+            elapsed = state["elapsed"]
+            language = stream.language or "unknown"
+            languages[language] += 1
+            outputs = stream.close(file=path, duration=round(duration, 3),
+                                   language_detection=state["language_detection"])
+            audio_seconds += duration
+            progress.write(json.dumps({
+                "sha256": digests[path],
+                "file": path,
+                "outputs": outputs,
+                "duration": duration,
+                "language": stream.language,
+                "language_detection": state["language_detection"],
+            }) + "\n")
+            progress.flush()
+            chunk_info = f", {len(plan)} chunks" if len(plan) > 1 else ""
+            if state["hits"] == len(plan):
+                cached += 1
+                chunk_info += ", from cache"
+            if state["language_detection"]:
+                chunk_info += f", {language} {state['language_detection']['probabilities'][language]:.0%}"
+            print(f"[{number}/{len(pending)}] {path}: {duration:.1f} s audio in {elapsed:.1f} s "
+                  f"worker time (RTF {elapsed / duration if duration else 0:.2f}{chunk_info})")
+    
+    wall = time.perf_counter() - start
+    print(f"\nDone: {len(pending) - failed} transcribed ({cached} from result cache), "
+          f"{skipped} skipped, {failed} failed")
+    if languages:
+        print("Languages: " + ", ".join(f"{language} {count}" for language, count in languages.most_common()))
+    print(f"Audio: {audio_seconds:.1f} s in {wall:.1f} s wall time, "
+          f"throughput {audio_seconds / wall if wall else 0:.2f} audio-s/wall-s "
+          f"({workers} workers x {threads} threads)")
+    return 1 if failed else 0
@@ -0,0 +1,357 @@
+"""Benchmarks: precision comparison and per-stage timings of the recording -> transcription pipeline"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from math import gcd
+import numpy as np
+import tkinter as tk
+from tkinter import scrolledtext
+import pyperclip
+
+from whisper_common import (
+    CAPTURE_SAMPLE_RATE, default_cache_dir, load_audio_file, load_client_audio, OUTPUT_FILENAME, scipy_signal,
+    synthetic_audio, to_whisper_audio, torch, wav, whisper, WHISPER_SAMPLE_RATE,
+)
+from whisper_core import (
+    FeatureCache, InferenceEngine, MODEL_POOL, transcribe_detecting_language, transcribe_with_vad,
+)
+from whisper_ui import UiDispatcher
+
+
+# Vergleich der Genauigkeitsstufen (Geschwindigkeit und Wortfehlerrate)
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the number of reference words"""
+    from whisper.normalizers import BasicTextNormalizer
+    
+    normalizer = BasicTextNormalizer()
+    reference = normalizer(reference).split()
+    hypothesis = normalizer(hypothesis).split()
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, other in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other))
+        previous = current
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return previous[-1] / len(reference)
+
+
+def run_compare(args):
+    """Transcribe one clip with every precision and report load time, RTF, memory and WER"""
+    path = args.file or OUTPUT_FILENAME
+    if not os.path.exists(path):
+        print(f"Reference clip not found: {path}")
+        return 1
+    audio = load_client_audio(path)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    download_root = args.model_dir or default_cache_dir()
+    reference = None
+    if args.reference_text:
+        with open(args.reference_text, encoding="utf-8") as f:
+            reference = f.read()
+    
+    print(f"{path}: {duration:.1f} s, model {args.model}")
+    rows = []
+    for precision in [p.strip() for p in args.precisions.split(",") if p.strip()]:
+        try:
+            model, info = MODEL_POOL.get(args.model, precision=precision, download_root=download_root)
+            start = time.perf_counter()
+            result = transcribe_detecting_language(model, audio, language=args.language, fp16=precision == "fp16")
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"{precision}: failed: {type(e).__name__}: {e}")
+            continue
+        if reference is None:
+            # Ohne Referenztext zählt die erste Genauigkeitsstufe als richtig
+            reference = result["text"]
+        rows.append({
+            "precision": precision,
+            "load_time": info["load_time"],
+            "transcribe_time": elapsed,
+            "rtf": elapsed / duration if duration else 0.0,
+            "resident_mb": info["resident_bytes"] / 1024 / 1024,
+            "wer": word_error_rate(reference, result["text"]),
+            "text": result["text"],
+        })
+        MODEL_POOL.evict_all()
+    
+    print(f"\n{'precision':<10} {'load s':>8} {'run s':>8} {'RTF':>6} {'MB':>7} {'WER':>7}")
+    for row in rows:
+        print(f"{row['precision']:<10} {row['load_time']:>8.2f} {row['transcribe_time']:>8.2f} "
+              f"{row['rtf']:>6.2f} {row['resident_mb']:>7.0f} {row['wer']:>7.1%}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"file": path, "duration": duration, "model": args.model, "results": rows}, f, indent=2)
+    return 0 if rows else 1
+
+
+# Benchmark der Verarbeitungskette Aufnahme -> Transkription
+BENCH_STAGES = ["wav_write", "ffmpeg_decode", "resample", "vad", "model_load", "mel", "encoder", "decoder",
+                "transcribe", "clipboard", "ui"]
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage; can time every call of a module's forward"""
+
+    def __init__(self):
+        self.times = {}
+        self.started = {}
+        self.handles = []
+
+    def add(self, stage, seconds):
+        self.times[stage] = self.times.get(stage, 0.0) + seconds
+
+    def measure(self, stage, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def wrap(self, module, stage):
+        """Time every forward call of module via hooks; remove() takes them off again"""
+        def start(*_):
+            self.started[stage] = time.perf_counter()
+
+        def stop(*_):
+            self.add(stage, time.perf_counter() - self.started.pop(stage))
+
+        self.handles.append(module.register_forward_pre_hook(start))
+        self.handles.append(module.register_forward_hook(stop))
+
+    def remove(self):
+        for handle in self.handles:
+            handle.remove()
+        self.handles = []
+
+
+class ResourceSampler:
+    """Peak RSS and CPU utilisation of this process while the block runs"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.stop = threading.Event()
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            import resource
+            # ru_maxrss: Kilobyte unter Linux, Byte unter macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def sample(self):
+        while not self.stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+    def __enter__(self):
+        self.peak_rss = self.rss()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = sum(os.times()[:2])
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak_rss = max(self.peak_rss, self.rss())
+        self.wall = time.perf_counter() - self.start_wall
+        self.cpu = sum(os.times()[:2]) - self.start_cpu
+
+    def report(self):
+        cores = self.cpu / self.wall if self.wall else 0.0
+        return {"peak_rss_mb": self.peak_rss / 1024 / 1024, "cores_used": cores,
+                "cpu_percent": 100 * cores / (os.cpu_count() or 1)}
+
+
+def bench_ui(text, unavailable):
+    """Time clipboard copy and one UI frame showing the text; None where not available
+
+    Stages that failed once are added to unavailable and skipped afterwards.
+    """
+    timings = {"clipboard": None, "ui": None}
+    if "clipboard" not in unavailable:
+        start = time.perf_counter()
+        try:
+            pyperclip.copy(text)
+            timings["clipboard"] = time.perf_counter() - start
+        except Exception as e:
+            unavailable.add("clipboard")
+            print(f"  clipboard stage skipped: {str(e).splitlines()[0]}")
+    if "ui" in unavailable:
+        return timings
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        unavailable.add("ui")
+        print(f"  UI stage skipped: {e}")
+        return timings
+    try:
+        root.withdraw()
+        text_area = scrolledtext.ScrolledText(root)
+        dispatcher = UiDispatcher(root, text_area)
+        start = time.perf_counter()
+        for line in text.splitlines() or [""]:
+            dispatcher.append(line + "\n")
+        dispatcher.drain()
+        root.update_idletasks()
+        timings["ui"] = time.perf_counter() - start
+    finally:
+        root.destroy()
+    return timings
+
+
+def bench_pipeline(model_name, precision, capture, language, download_root, use_vad, timer, unavailable):
+    """One pass through the GUI's stop_recording/transcribe_audio path, timed per stage"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "bench.wav")
+        timer.measure("wav_write", wav.write, path, CAPTURE_SAMPLE_RATE, capture)
+        try:
+            timer.measure("ffmpeg_decode", load_audio_file, path)
+        except Exception as e:
+            print(f"  FFmpeg decode failed: {e}")
+    audio = timer.measure("resample", to_whisper_audio, capture, CAPTURE_SAMPLE_RATE)
+    
+    model, _ = MODEL_POOL.get(model_name, precision=precision, download_root=download_root)
+    timer.measure("mel", whisper.log_mel_spectrogram, audio, model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+    
+    # Eigene Engine ohne Feature-Cache, damit Wiederholungen wirklich neu rechnen
+    engine = InferenceEngine(model_name, precision=precision, download_root=download_root)
+    engine.feature_cache = FeatureCache(0)
+    try:
+        options = dict(language=language, fp16=False)
+        start = time.perf_counter()
+        if use_vad:
+            result = transcribe_with_vad(engine, audio, **options)
+            timer.add("vad", result["vad"]["vad_time"])
+        else:
+            result = engine.transcribe(audio, **options)
+        timer.add("transcribe", time.perf_counter() - start)
+    finally:
+        engine.close()
+    for stage, seconds in bench_ui(result["text"], unavailable).items():
+        if seconds is not None:
+            timer.add(stage, seconds)
+    return audio, result
+
+
+def run_bench(args):
+    """Benchmark the recording -> transcription pipeline and compare against a baseline"""
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    lengths = [float(seconds) for seconds in args.lengths.split(",") if seconds.strip()]
+    clips = [(f"synthetic-{seconds:g}s", synthetic_audio(seconds)) for seconds in lengths]
+    for path in args.files:
+        # Referenzdateien wie eine Aufnahme behandeln: int16 mit der Aufnahme-Samplerate
+        factor = gcd(CAPTURE_SAMPLE_RATE, WHISPER_SAMPLE_RATE)
+        audio = scipy_signal.resample_poly(load_client_audio(path), CAPTURE_SAMPLE_RATE // factor,
+                                           WHISPER_SAMPLE_RATE // factor)
+        clips.append((os.path.basename(path), (np.clip(audio, -1, 1) * 32767).astype(np.int16)))
+    download_root = args.model_dir or default_cache_dir()
+    # Einmalige Importkosten (scipy, FFmpeg-Start) nicht der ersten Messung anlasten
+    to_whisper_audio(synthetic_audio(1.0), CAPTURE_SAMPLE_RATE)
+    
+    results = []
+    unavailable = set()
+    for model_name in models:
+        # Kalt laden, damit model_load vergleichbar bleibt
+        MODEL_POOL.evict_all()
+        with ResourceSampler() as resources:
+            start = time.perf_counter()
+            model, _ = MODEL_POOL.get(model_name, precision=args.precision, download_root=download_root)
+            load_time = time.perf_counter() - start
+            # Encoder und Decoder einzeln messen, über alle Aufrufe während der Transkription
+            timer = StageTimer()
+            timer.wrap(model.encoder, "encoder")
+            timer.wrap(model.decoder, "decoder")
+            try:
+                for clip_name, capture in clips:
+                    runs = []
+                    for _ in range(args.repeat):
+                        timer.times = {}
+                        with ResourceSampler() as run_resources:
+                            audio, result = bench_pipeline(model_name, args.precision, capture, args.language,
+                                                           download_root, not args.no_vad, timer, unavailable)
+                        runs.append((dict(timer.times), run_resources.report(), result))
+                
+                    # Median über die Wiederholungen je Stufe
+                    stages = {"model_load": load_time}
+                    for stage in BENCH_STAGES:
+                        values = sorted(run[0][stage] for run in runs if stage in run[0])
+                        if values:
+                            stages[stage] = values[len(values) // 2]
+                    duration = len(audio) / WHISPER_SAMPLE_RATE
+                    entry = {
+                        "model": model_name,
+                        "precision": args.precision,
+                        "audio": clip_name,
+                        "seconds": duration,
+                        "stages": stages,
+                        "rtf": stages["transcribe"] / duration if duration else 0.0,
+                        **runs[len(runs) // 2][1],
+                        "text_chars": len(runs[-1][2]["text"]),
+                    }
+                    results.append(entry)
+                    print(f"{model_name:<8} {clip_name:<18} RTF {entry['rtf']:.3f}  "
+                          f"peak {entry['peak_rss_mb']:.0f} MB  CPU {entry['cpu_percent']:.0f}%  " +
+                          "  ".join(f"{stage} {stages[stage] * 1000:.0f}ms" for stage in BENCH_STAGES if stage in stages))
+            finally:
+                # Das Modell bleibt im Pool, die Hooks dürfen andere Nutzer nicht mitmessen
+                timer.remove()
+        print(f"{model_name}: process peak {resources.peak_rss / 1024 / 1024:.0f} MB")
+    
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "torch": torch.__version__,
+            "platform": sys.platform,
+            "cpu_count": os.cpu_count(),
+            "vad": not args.no_vad,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+    if args.baseline:
+        return compare_bench(report, args.baseline, args.max_regression, args.min_delta)
+    return 0
+
+
+def compare_bench(report, baseline_path, max_regression, min_delta):
+    """Print changes against a stored report; non-zero exit if a stage got slower than allowed"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["model"], r["precision"], r["audio"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["model"], result["precision"], result["audio"]))
+        if old is None:
+            continue
+        metrics = [(stage, old["stages"][stage], seconds, min_delta)
+                   for stage, seconds in result["stages"].items() if stage in old["stages"]]
+        metrics.append(("rtf", old["rtf"], result["rtf"], 0.0))
+        metrics.append(("peak_rss_mb", old["peak_rss_mb"], result["peak_rss_mb"], 0.0))
+        for metric, before, after, delta in metrics:
+            # Kleine absolute Unterschiede sind Messrauschen, auch wenn sie relativ groß wirken
+            if after > before * (1 + max_regression) and after - before > delta:
+                regressions.append((result["model"], result["audio"], metric, before, after))
+    
+    for model_name, clip_name, metric, before, after in regressions:
+        print(f"REGRESSION {model_name} {clip_name} {metric}: {before:.3f} -> {after:.3f} "
+              f"(+{(after / before - 1) if before else 1:.0%})")
+    print(f"{len(regressions)} regressions against {baseline_path} "
+          f"(threshold +{max_regression:.0%}, min {min_delta * 1000:.0f} ms)")
+    return 1 if regressions else 0
@@ -0,0 +1,401 @@
+"""Helpers shared by all parts: lazy heavy imports, paths, FFmpeg decoding and audio utilities"""
+
+import glob
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from math import gcd
+import numpy as np
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _import(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._import(), attr)
+
+
+# Schwere Abhängigkeiten erst bei Bedarf laden, damit das Fenster sofort erscheint
+whisper = LazyModule("whisper")
+torch = LazyModule("torch")
+sd = LazyModule("sounddevice")
+wav = LazyModule("scipy.io.wavfile")
+scipy_signal = LazyModule("scipy.signal")
+
+# Letzte Aufnahme neben dem Skript; compare nimmt sie als Standard-Clip
+OUTPUT_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_audio.wav")
+
+# Modelle, die Oberfläche und Benchmark anbieten
+WHISPER_MODELS = ["tiny", "base", "small", "medium", "turbo"]
+
+# Dateiendungen, die die Batch-Transkription in Verzeichnissen aufsammelt
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".mkv", ".aac", ".wma"}
+
+# Whisper erwartet 16 kHz Mono float32, aufgenommen wird mit 44,1 kHz
+WHISPER_SAMPLE_RATE = 16000
+CAPTURE_SAMPLE_RATE = 44100
+
+# Sprachaktivitätserkennung (VAD): Rahmenlänge, Schwelle über dem Grundrauschen, Polsterung/Nachlauf
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = 12.0
+VAD_PADDING_MS = 200
+VAD_HANGOVER_MS = 300
+
+# FFmpeg: Fundort-Cache neben den Modellen, Blockgröße beim Lesen aus FFmpeg (s)
+FFMPEG_CACHE_FILE = "ffmpeg.json"
+FFMPEG_BLOCK_SECONDS = 5.0
+
+
+def default_cache_dir():
+    """Models directory next to the executable or the script"""
+    if getattr(sys, 'frozen', False):
+        # Running as executable
+        return os.path.join(os.path.dirname(sys.executable), "models")
+    # Running as script
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+def default_result_cache_dir():
+    """Transcription result cache next to the models directory"""
+    return os.path.join(os.path.dirname(default_cache_dir()), "results")
+
+
+# FFmpeg für Datei-Eingaben: einmal beim Start suchen, das Ergebnis liegt neben den Modellen
+def ffmpeg_candidates():
+    """Places to look for ffmpeg, most specific first"""
+    name = "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg"
+    candidates = []
+    if os.environ.get("FFMPEG_BINARY"):
+        candidates.append(os.environ["FFMPEG_BINARY"])
+    # Mitgeliefert: im PyInstaller-Archiv, neben der exe oder neben dem Skript
+    bundled = [getattr(sys, "_MEIPASS", None), os.path.dirname(os.path.abspath(__file__))]
+    if getattr(sys, "frozen", False):
+        bundled.insert(1, os.path.dirname(sys.executable))
+    for base in filter(None, bundled):
+        candidates += [os.path.join(base, name), os.path.join(base, "ffmpeg", "bin", name)]
+    found = shutil.which("ffmpeg")
+    if found:
+        candidates.append(found)
+    if sys.platform == "win32":
+        packages = os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "WinGet", "Packages")
+        candidates += sorted(glob.glob(os.path.join(packages, "Gyan.FFmpeg*", "*", "bin", name)), reverse=True)
+        candidates += [os.path.join(os.environ.get("ProgramFiles", r"C:\Program Files"), "ffmpeg", "bin", name),
+                       r"C:\ffmpeg\bin\ffmpeg.exe"]
+    elif sys.platform == "darwin":
+        candidates += ["/opt/homebrew/bin/ffmpeg", "/usr/local/bin/ffmpeg"]
+    else:
+        candidates += ["/usr/bin/ffmpeg", "/usr/local/bin/ffmpeg", "/snap/bin/ffmpeg"]
+    return candidates
+
+
+def find_ffmpeg(cache_path=None):
+    """Locate ffmpeg and its version, reusing the cached result while the binary is unchanged
+
+    Returns {"path", "version"}; path is None if FFmpeg is not installed, which only
+    matters for file inputs (recordings are resampled in memory).
+    """
+    cache_path = cache_path or os.path.join(default_cache_dir(), FFMPEG_CACHE_FILE)
+    requested = os.environ.get("FFMPEG_BINARY")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if (not requested or requested == cached["path"]) and os.path.getmtime(cached["path"]) == cached["mtime"]:
+            return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    for candidate in ffmpeg_candidates():
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            path = os.path.abspath(candidate)
+            break
+    else:
+        print("FFmpeg not found: file inputs need it (install it or set FFMPEG_BINARY)")
+        return {"path": None, "version": None}
+    try:
+        output = subprocess.run([path, "-version"], capture_output=True, text=True, timeout=10).stdout
+        version = output.splitlines()[0] if output else None
+    except (OSError, subprocess.SubprocessError):
+        version = None
+    info = {"path": path, "version": version, "mtime": os.path.getmtime(path)}
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+    except OSError:
+        pass  # Ohne Schreibrechte wird beim nächsten Start eben neu gesucht
+    return info
+
+
+ffmpeg_lookup_start = time.perf_counter()
+FFMPEG = find_ffmpeg()
+if FFMPEG["path"]:
+    # Auch für whisper.load_audio und Kindprozesse sichtbar machen
+    os.environ["FFMPEG_BINARY"] = FFMPEG["path"]
+    ffmpeg_dir = os.path.dirname(FFMPEG["path"])
+    if ffmpeg_dir not in os.environ.get("PATH", "").split(os.pathsep):
+        os.environ["PATH"] = ffmpeg_dir + os.pathsep + os.environ.get("PATH", "")
+FFMPEG_LOOKUP_SECONDS = time.perf_counter() - ffmpeg_lookup_start
+
+
+def ffmpeg_stream(path, rate=WHISPER_SAMPLE_RATE, block_seconds=FFMPEG_BLOCK_SECONDS):
+    """Yield 16 kHz float32 blocks of a file while FFmpeg is still decoding the rest"""
+    if FFMPEG["path"] is None:
+        raise RuntimeError("FFmpeg not found: install it or set FFMPEG_BINARY")
+    command = [FFMPEG["path"], "-nostdin", "-loglevel", "error", "-threads", "0", "-i", path,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(rate), "-"]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = int(block_seconds * rate) * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+        errors = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to load audio: {errors.decode(errors='replace')}")
+    finally:
+        # Abgebrochen (Fehler beim Verbraucher, Generator nicht zu Ende gelesen): FFmpeg beenden
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def load_audio_file(path):
+    """Whole file as 16 kHz float32, like whisper.load_audio but with the FFmpeg found at startup"""
+    blocks = list(ffmpeg_stream(path))
+    return np.concatenate(blocks) if blocks else np.zeros(0, np.float32)
+
+
+def load_client_audio(path):
+    """Read a file as 16 kHz float32 (client, compare and bench): WAV directly, anything else through FFmpeg"""
+    if path.lower().endswith(".wav"):
+        rate, samples = wav.read(path)
+        return to_whisper_audio(samples, rate)
+    return load_audio_file(path)
+
+
+def stream_chunks(path, chunk_seconds, overlap_seconds=1.0, search_seconds=10.0,
+                  rate=WHISPER_SAMPLE_RATE, frame_ms=VAD_FRAME_MS):
+    """Yield (chunk, audio) exactly like split_audio, each as soon as FFmpeg has decoded far enough
+
+    Only the audio after the last cut is kept, so chunks can be transcribed while the
+    rest of the file is still being decoded.
+    """
+    chunk = int(chunk_seconds * rate)
+    search = int(search_seconds * rate)
+    overlap = int(overlap_seconds * rate)
+    buffered = np.zeros(0, np.float32)
+    base = 0  # Sample-Index von buffered[0] in der Datei
+    cut = 0
+    
+    def next_cut(end):
+        target = cut + chunk
+        low = max(cut + chunk // 2, target - search)
+        return base + find_quiet_point(buffered, low - base, min(end, target + search) - base, rate, frame_ms)
+    
+    for block in ffmpeg_stream(path, rate):
+        buffered = np.concatenate([buffered, block])
+        end = base + len(buffered)
+        # Erst schneiden, wenn sicher noch mehr als 1,5 Stücke folgen (wie split_audio) und die Überlappung da ist
+        while end - cut > max(chunk * 1.5, chunk + search + overlap):
+            following = next_cut(end)
+            yield ({"start": max(0, cut - overlap), "end": following + overlap, "own_start": cut, "own_end": following},
+                   buffered[max(0, cut - overlap) - base:following + overlap - base].copy())
+            cut = following
+            buffered = buffered[cut - overlap - base:]
+            base = cut - overlap
+    
+    total = base + len(buffered)
+    while total - cut > chunk * 1.5:
+        following = next_cut(total)
+        yield ({"start": max(0, cut - overlap), "end": min(total, following + overlap),
+                "own_start": cut, "own_end": following},
+               buffered[max(0, cut - overlap) - base:min(total, following + overlap) - base].copy())
+        cut = following
+    yield ({"start": max(0, cut - overlap), "end": total, "own_start": cut, "own_end": total},
+           buffered[max(0, cut - overlap) - base:].copy())
+
+
+def to_whisper_audio(audio, source_rate=CAPTURE_SAMPLE_RATE):
+    """Convert captured int16 samples to the float32 16 kHz mono array whisper expects"""
+    audio = np.asarray(audio)
+    dtype = audio.dtype
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if np.issubdtype(dtype, np.integer):
+        audio = audio.astype(np.float32) / float(np.iinfo(dtype).max + 1)
+    else:
+        audio = audio.astype(np.float32, copy=False)
+    
+    # Polyphase-Resampling, z.B. 44100 -> 16000 Hz als 160/441
+    if source_rate != WHISPER_SAMPLE_RATE:
+        divisor = gcd(source_rate, WHISPER_SAMPLE_RATE)
+        audio = scipy_signal.resample_poly(audio, WHISPER_SAMPLE_RATE // divisor, source_rate // divisor)
+    return audio.astype(np.float32, copy=False)
+
+
+def frame_signal(audio, frame_len):
+    """View audio as a (frames, frame_len) matrix, dropping the incomplete last frame"""
+    n_frames = len(audio) // frame_len
+    return np.asarray(audio[:n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+
+
+def frame_levels(audio, rate=WHISPER_SAMPLE_RATE, frame_ms=VAD_FRAME_MS, block_frames=4096):
+    """Per-frame energy in dB and share of energy in the 300-3400 Hz speech band"""
+    frame_len = int(rate * frame_ms / 1000)
+    frames = frame_signal(audio, frame_len)
+    n_frames = len(frames)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    
+    freqs = np.fft.rfftfreq(frame_len, 1 / rate)
+    band = (freqs >= 300) & (freqs <= 3400)
+    window = np.hanning(frame_len).astype(np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    # Blockweise, damit das Spektrum langer Aufnahmen nicht komplett im Speicher liegt
+    for start in range(0, n_frames, block_frames):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + block_frames] * window, axis=1)) ** 2
+        band_ratio[start:start + block_frames] = spectrum[:, band].sum(axis=1) / (spectrum.sum(axis=1) + 1e-10)
+    return energy_db, band_ratio
+
+
+def detect_speech_regions(audio, rate=WHISPER_SAMPLE_RATE, frame_ms=VAD_FRAME_MS,
+                          threshold_db=VAD_THRESHOLD_DB, padding_ms=VAD_PADDING_MS,
+                          hangover_ms=VAD_HANGOVER_MS, min_speech_ms=100, min_level_db=-60.0):
+    """Return a list of (start, end) sample ranges that contain speech"""
+    frame_len = int(rate * frame_ms / 1000)
+    if len(audio) < frame_len:
+        return []
+    energy_db, band_ratio = frame_levels(audio, rate, frame_ms)
+    
+    # Schwelle relativ zum geschätzten Grundrauschen, aber nie über dem lautesten Teil der Aufnahme
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = min(max(noise_floor + threshold_db, min_level_db), energy_db.max() - 6.0)
+    speech = (energy_db > threshold) & (band_ratio > 0.3)
+    
+    # Nachlauf: nach Sprache noch einige Rahmen als Sprache werten (Wortenden, Pausen)
+    hangover = int(hangover_ms / frame_ms)
+    if hangover:
+        speech = np.convolve(speech, np.ones(hangover + 1), mode="full")[:len(speech)] > 0
+    
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    
+    padding = int(rate * padding_ms / 1000)
+    min_frames = max(1, int(min_speech_ms / frame_ms)) + hangover
+    regions = []
+    for start, end in zip(starts, ends):
+        if end - start < min_frames:
+            continue
+        start = max(0, int(start) * frame_len - padding)
+        end = min(len(audio), int(end) * frame_len + padding)
+        # Überlappende Bereiche zusammenfassen
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def compact_speech(audio, regions, rate=WHISPER_SAMPLE_RATE, gap_seconds=0.3):
+    """Concatenate speech regions with short silent gaps; returns (audio, timeline)"""
+    gap = np.zeros(int(rate * gap_seconds), dtype=np.float32)
+    pieces = []
+    timeline = []  # (Start in kompakter Zeit, Start im Original, Länge), alles in Sekunden
+    position = 0
+    for start, end in regions:
+        timeline.append((position / rate, start / rate, (end - start) / rate))
+        pieces.append(audio[start:end])
+        pieces.append(gap)
+        position += end - start + len(gap)
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), np.zeros((0, 3))
+    return np.concatenate(pieces).astype(np.float32, copy=False), np.array(timeline)
+
+
+def remap_timestamp(t, timeline):
+    """Map a time in the compacted audio back to the original recording"""
+    if len(timeline) == 0:
+        return t
+    index = max(0, np.searchsorted(timeline[:, 0], t, side="right") - 1)
+    compact_start, original_start, length = timeline[index]
+    return float(original_start + min(max(t - compact_start, 0.0), length))
+
+
+def find_quiet_point(audio, low, high, rate=WHISPER_SAMPLE_RATE, frame_ms=VAD_FRAME_MS):
+    """Sample index of the quietest moment between low and high"""
+    frame_len = int(rate * frame_ms / 1000)
+    low = max(0, low)
+    frames = frame_signal(audio[low:high], frame_len)
+    if len(frames) == 0:
+        return min(high, len(audio))
+    # Geglättete Energie, damit nicht in eine kurze Lücke mitten im Wort geschnitten wird
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    energy_db = np.convolve(energy_db, np.ones(10) / 10, mode="same")
+    return low + int(np.argmin(energy_db)) * frame_len
+
+
+def split_audio(audio, chunk_seconds=120.0, overlap_seconds=1.0, search_seconds=10.0,
+                rate=WHISPER_SAMPLE_RATE, frame_ms=VAD_FRAME_MS):
+    """Split long audio at quiet points into overlapping chunks
+
+    Every chunk is a dict with its sample range (start/end, including the overlap)
+    and the range it owns (own_start/own_end) when the results are stitched.
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * rate)
+    if total <= chunk * 1.5:
+        return [{"start": 0, "end": total, "own_start": 0, "own_end": total}]
+    
+    search = int(search_seconds * rate)
+    cuts = [0]
+    while total - cuts[-1] > chunk * 1.5:
+        target = cuts[-1] + chunk
+        low = max(cuts[-1] + chunk // 2, target - search)
+        cuts.append(find_quiet_point(audio, low, min(total, target + search), rate, frame_ms))
+    cuts.append(total)
+    
+    overlap = int(overlap_seconds * rate)
+    return [{"start": max(0, start - overlap), "end": min(total, end + overlap),
+             "own_start": start, "own_end": end}
+            for start, end in zip(cuts, cuts[1:])]
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Content hash of a file, used to recognize already transcribed inputs"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Synthetisches Testsignal für bench, den Vokabular-Benchmark und die Startmessung
+def synthetic_audio(seconds, rate=CAPTURE_SAMPLE_RATE, seed=0):
+    """Reproducible int16 test signal like the capture delivers: voiced bursts, pauses, noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    # Silben von etwa 200 ms, dazwischen Pausen von 1-2 s alle paar Sekunden
+    envelope = (np.sin(2 * np.pi * 2.5 * t) > 0) & (np.sin(2 * np.pi * 0.15 * t) > -0.5)
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
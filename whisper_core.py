@@ -0,0 +1,2080 @@
+"""Transcription core shared by the GUI and the commands: model pool, caches, capture buffers,
+tracing, VAD, segment writers and the batching inference engine"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import queue
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+import numpy as np
+
+from whisper_common import (
+    compact_speech, default_cache_dir, detect_speech_regions, find_quiet_point, remap_timestamp, split_audio,
+    to_whisper_audio, torch, wav, whisper, WHISPER_SAMPLE_RATE,
+)
+from whisper_store import load_int8_model, model_store_load
+
+
+# Live-Transkription: Fenstergröße und Mindestmenge neuer Audiodaten pro Durchlauf (Sekunden)
+LIVE_WINDOW_SECONDS = 30
+LIVE_STEP_SECONDS = 3
+
+# Aufnahmepuffer: Blockgröße und Obergrenze, danach wird der älteste Block wiederverwendet
+CAPTURE_BLOCK_SECONDS = 10
+CAPTURE_MAX_SECONDS = 3 * 3600
+
+# Aufnahme direkt auf die Festplatte: Größe des gemappten Abschnitts, Header-Aktualisierung,
+# Ringpuffer im RAM und Stückgröße beim Transkribieren langer Aufnahmen (Sekunden)
+MMAP_SEGMENT_SECONDS = 60
+MMAP_HEADER_INTERVAL = 1.0
+MMAP_CAPTURE_SECONDS = 60
+RECORDING_CHUNK_SECONDS = 600
+
+# Inferenz-Engine: Fenster pro Encoder-Batch, Wartezeit bis zur Batch-Bildung,
+# ab welcher Länge eine Anfrage sequentiell über model.transcribe läuft
+ENGINE_MAX_BATCH = 8
+ENGINE_MAX_WAIT_MS = 50
+ENGINE_BATCH_MAX_SECONDS = 120
+# Ziellänge der Fenster, nicht ihre Obergrenze: split_audio schneidet bis zu 5 s daneben und lässt
+# am Ende bis zum 1,5-fachen stehen, mit 20 s bleibt jedes Fenster unter den 30 s des Encoders
+ENGINE_WINDOW_SECONDS = 20.0
+# Speicher für Mel-Fenster und Encoder-Ausgaben je Engine (in MB), reicht für die letzten Aufnahmen
+ENGINE_FEATURE_CACHE_MB = int(os.environ.get("WHISPER_FEATURE_CACHE_MB", "1024"))
+
+# Speicherbudget für geladene Modelle (in MB), überschreibbar per Umgebungsvariable
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("WHISPER_MODEL_BUDGET_MB", "4096"))
+
+# CPU-Aufteilung in der GUI: Kerne nur für Aufnahme/Oberfläche, Inter-op-Threads von torch,
+# Anteil der Rechenthreads während einer Aufnahme, nice-Wert der Inferenz-Threads
+SCHEDULER_RESERVED_CPUS = 1
+SCHEDULER_INTEROP_THREADS = 1
+SCHEDULER_RECORDING_SHARE = 0.5
+SCHEDULER_INFERENCE_NICE = 5
+# Herzschlag der Oberfläche und ab wie viel Verspätung er als Hänger zählt (ms)
+GUI_HEARTBEAT_MS = 100
+GUI_STALL_MS = 50
+# Tracing: gehaltene Ereignisse und Jobs im Speicher, Reihenfolge der Stufen im Latenz-Panel
+TRACE_MAX_EVENTS = 100000
+TRACE_MAX_JOBS = 200
+TRACE_PANEL_STAGES = ["capture", "save", "model_load", "queue_wait", "detect_language", "mel", "encode", "decode",
+                      "transcribe"]
+
+# Genauigkeitsstufen, die nur auf der CPU laufen (int8 dynamisch quantisiert, bf16 per autocast)
+CPU_PRECISIONS = {"int8", "bf16"}
+
+# Vokabular-Profile (JSON neben dem Modellordner) und Standard-Bonus auf die Logits ihrer Begriffe
+VOCABULARY_FILE = "vocabulary.json"
+VOCABULARY_BOOST = 2.0
+# Anteil davon für den ersten Token eines Begriffs: der gilt bei jedem Schritt, der Rest nur im Begriff
+VOCABULARY_START_FACTOR = 0.1
+NO_VOCABULARY = "-"
+
+# Plattenbudget für zwischengespeicherte Transkriptionen (in MB), überschreibbar per Umgebungsvariable
+RESULT_CACHE_BUDGET_MB = int(os.environ.get("WHISPER_RESULT_CACHE_MB", "512"))
+# Erhöhen, wenn sich das Format der Ergebnisse ändert, damit alte Einträge nicht mehr passen
+RESULT_CACHE_VERSION = 1
+
+
+def default_device():
+    """Device whisper would pick for load_model"""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_nbytes(model):
+    """Resident size of a model's parameters and buffers in bytes"""
+    size = sum(p.numel() * p.element_size() for p in model.parameters())
+    size += sum(b.numel() * b.element_size() for b in model.buffers())
+    for module in model.modules():
+        # Dynamisch quantisierte Linear-Schichten halten ihre Gewichte nicht als Parameter
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            weight = module.weight()
+            size += weight.numel() * weight.element_size()
+    return size
+
+
+def cpu_supports_bf16():
+    """True if the CPU has native bf16 arithmetic (AVX512-BF16 or AMX)"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def available_precisions():
+    """Precision modes offered in the GUI, without importing torch"""
+    return ["fp32", "int8"] + (["bf16"] if cpu_supports_bf16() else [])
+
+
+def autocast_bf16(model):
+    """Run encoder and decoder under CPU bf16 autocast, with float32 outputs
+
+    Weights stay fp32; the matmuls run in bf16. Outputs are cast back so decode()'s
+    dtype check on the audio features (float32 unless fp16) still holds.
+    """
+    for module in (model.encoder, model.decoder):
+        forward = module.forward
+        
+        def forward_bf16(*args, forward=forward, **kwargs):
+            with torch.autocast("cpu", dtype=torch.bfloat16):
+                return forward(*args, **kwargs).float()
+        
+        module.forward = forward_bf16
+    return model
+
+
+# Modell-Pool: hält geladene Modelle prozessweit im Speicher
+class ModelPool:
+    """Process-wide LRU registry of loaded Whisper models"""
+
+    def __init__(self, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.models = OrderedDict()  # key -> {"model", "nbytes", "load_time"}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def make_key(self, name, device=None, precision="fp32"):
+        if device is None:
+            device = "cpu" if precision in CPU_PRECISIONS else default_device()
+        return (name, device, precision)
+
+    def load(self, name, device, precision, download_root=None):
+        """Load a model from disk (or download it) without touching the pool"""
+        if precision in CPU_PRECISIONS and device != "cpu":
+            raise ValueError(f"Precision {precision} is only available on the CPU")
+        if precision == "int8":
+            return load_int8_model(name, download_root)
+        model = model_store_load(name, precision, device, download_root)
+        if precision == "bf16":
+            model = autocast_bf16(model)
+        return model
+
+    def get(self, name, device=None, precision="fp32", download_root=None):
+        """Return (model, info) and load the model only if it is not resident yet"""
+        key = self.make_key(name, device, precision)
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        # Pro Schlüssel serialisieren, damit ein Modell nie doppelt geladen wird
+        with key_lock:
+            with self.lock:
+                entry = self.models.get(key)
+                if entry is not None:
+                    self.models.move_to_end(key)
+                    self.hits += 1
+                    self.time_saved += entry["load_time"]
+                    now = time.perf_counter()
+                    TRACER.record("model_load", now, now, model=name, precision=precision, cached=True)
+                    return entry["model"], {
+                        "cached": True,
+                        "load_time": 0.0,
+                        "time_saved": entry["load_time"],
+                        "resident_bytes": entry["nbytes"],
+                    }
+
+            start = time.perf_counter()
+            with TRACER.span("model_load", model=name, precision=precision, cached=False):
+                model = self.load(name, key[1], precision, download_root)
+            load_time = time.perf_counter() - start
+            nbytes = model_nbytes(model)
+
+            with self.lock:
+                self.misses += 1
+                self.models[key] = {"model": model, "nbytes": nbytes, "load_time": load_time}
+                self.evict()
+
+        print(f"Model {name} ({key[1]}, {precision}) loaded in {load_time:.2f} s, "
+              f"{nbytes / 1024 / 1024:.0f} MB resident")
+        return model, {
+            "cached": False,
+            "load_time": load_time,
+            "time_saved": 0.0,
+            "resident_bytes": nbytes,
+        }
+
+    def evict(self):
+        """Drop least recently used models until the pool fits the budget (caller holds lock)"""
+        # Das zuletzt benutzte Modell bleibt immer geladen, auch wenn es allein das Budget sprengt
+        while len(self.models) > 1 and self.resident_bytes() > self.memory_budget:
+            key, entry = self.models.popitem(last=False)
+            print(f"Evicting model {key[0]} ({key[1]}, {key[2]}) from pool, "
+                  f"freeing {entry['nbytes'] / 1024 / 1024:.0f} MB")
+
+    def resident_bytes(self):
+        return sum(entry["nbytes"] for entry in self.models.values())
+
+    def evict_all(self):
+        """Drop every model, e.g. so the next load starts from a cold pool"""
+        with self.lock:
+            self.models.clear()
+
+    def preload(self, name, device=None, precision="fp32", download_root=None):
+        """Load a model in a background thread so the next transcription finds it resident"""
+        def worker():
+            try:
+                self.get(name, device, precision, download_root)
+            except Exception as e:
+                print(f"Preloading model {name} failed: {e}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self.lock:
+            return {
+                "models": [key[0] for key in self.models],
+                "resident_bytes": self.resident_bytes(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "time_saved": self.time_saved,
+            }
+
+
+MODEL_POOL = ModelPool()
+
+
+def json_default(value):
+    """Let json.dumps write numpy scalars and arrays found in results"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    """Finished transcriptions on disk, keyed by audio content, model and decode options
+
+    Every entry is a JSON file that is replaced atomically, so several processes (batch
+    workers, the GUI) can share one directory. Once the entries grow past max_bytes the
+    least recently used ones are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=RESULT_CACHE_BUDGET_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.time_saved = 0.0
+        os.makedirs(directory, exist_ok=True)
+        
+        # Zuletzt benutzte Einträge stehen hinten (Reihenfolge nach Änderungszeit)
+        listing = []
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                info = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            listing.append((info.st_mtime, name[:-5], info.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(listing))
+        self.total_bytes = sum(self.entries.values())
+
+    @staticmethod
+    def make_key(audio, model_name, options):
+        """Hash of the 16 kHz samples plus everything that changes the result"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+        settings = {key: value for key, value in options.items() if key != "verbose"}
+        settings.update(model=model_name, version=RESULT_CACHE_VERSION)
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """Cached result or None; a hit marks the entry as recently used"""
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+            self.time_saved += entry.get("elapsed", 0.0)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry["result"]
+
+    def put(self, key, result, elapsed):
+        """Store a result atomically and evict the least recently used entries over budget"""
+        data = json.dumps({"result": result, "elapsed": elapsed, "created": time.time()},
+                          default=json_default).encode("utf-8")
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            print(f"Could not write result cache entry: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        
+        with self.lock:
+            self.writes += 1
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(self.path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "time_saved": self.time_saved,
+            }
+
+
+# Aufnahmepuffer: vorab allokierte Blöcke statt einer Liste kopierter Arrays
+class CaptureBuffer:
+    """Preallocated block arena for audio capture with a single writer
+
+    The PortAudio callback only copies into memory that was allocated beforehand by
+    reserve() and then publishes the new sample count. Readers address samples by their
+    absolute position and get views into the blocks. Once max_seconds are filled the
+    oldest block is reused, so memory stays bounded for arbitrarily long sessions.
+    """
+
+    def __init__(self, rate, channels=1, dtype=np.int16, block_seconds=CAPTURE_BLOCK_SECONDS,
+                 max_seconds=CAPTURE_MAX_SECONDS, spare_blocks=2):
+        self.rate = rate
+        self.channels = channels
+        self.dtype = dtype
+        self.block_frames = int(rate * block_seconds)
+        self.max_blocks = max(2, int(np.ceil(max_seconds / block_seconds)))
+        self.spare_blocks = spare_blocks
+        self.blocks = []
+        self.spare = deque()
+        self.written = 0  # Anzahl geschriebener Frames, wird erst nach dem Kopieren erhöht
+        self.xruns = 0
+        self.emergency_allocations = 0
+        self.reserve()
+
+    def new_block(self):
+        return np.zeros((self.block_frames, self.channels), dtype=self.dtype)
+
+    def reserve(self):
+        """Allocate spare blocks ahead of the writer; call regularly from a non-realtime thread"""
+        while len(self.spare) < self.spare_blocks and len(self.blocks) + len(self.spare) < self.max_blocks:
+            self.spare.append(self.new_block())
+
+    def write(self, data, status=None):
+        """Append captured frames (called from the audio callback)"""
+        if status:
+            self.xruns += 1
+        position = self.written
+        offset = 0
+        while offset < len(data):
+            slot = (position // self.block_frames) % self.max_blocks
+            if slot == len(self.blocks):
+                if self.spare:
+                    self.blocks.append(self.spare.popleft())
+                else:
+                    # reserve() kam nicht hinterher: im Callback allokieren und mitzählen
+                    self.emergency_allocations += 1
+                    self.blocks.append(self.new_block())
+            within = position % self.block_frames
+            count = min(len(data) - offset, self.block_frames - within)
+            self.blocks[slot][within:within + count] = data[offset:offset + count]
+            offset += count
+            position += count
+        self.written = position
+
+    def callback(self, indata, frames, time, status):
+        """sounddevice InputStream callback"""
+        self.write(indata, status)
+
+    def oldest(self):
+        """First frame that has not been overwritten by the ring yet"""
+        return max(0, self.written - (self.max_blocks - 1) * self.block_frames)
+
+    def overwritten(self):
+        return self.oldest()
+
+    def seconds(self):
+        return self.written / self.rate
+
+    def views(self, start=0, end=None):
+        """Zero-copy views covering frames [start, end)"""
+        end = self.written if end is None else min(end, self.written)
+        position = max(start, self.oldest())
+        while position < end:
+            slot = (position // self.block_frames) % self.max_blocks
+            within = position % self.block_frames
+            count = min(end - position, self.block_frames - within)
+            yield self.blocks[slot][within:within + count]
+            position += count
+
+    def read(self, start=0, end=None):
+        """Frames [start, end) as one array; a view if they lie in one block, a copy otherwise"""
+        views = list(self.views(start, end))
+        if len(views) == 1:
+            return views[0]
+        if not views:
+            return np.zeros((0, self.channels), dtype=self.dtype)
+        return np.concatenate(views, axis=0)
+
+    def latest(self, frames):
+        """Most recent frames, e.g. for a level meter"""
+        return self.read(max(0, self.written - frames))
+
+    def stats(self):
+        return {
+            "seconds": self.seconds(),
+            "xruns": self.xruns,
+            "overwritten_frames": self.overwritten(),
+            "emergency_allocations": self.emergency_allocations,
+            "allocated_mb": (len(self.blocks) + len(self.spare)) * self.block_frames * self.channels
+            * np.dtype(self.dtype).itemsize / 1024 / 1024,
+        }
+
+
+# Aufteilung der CPU zwischen Aufnahme, Oberfläche und Inferenz
+class CpuScheduler:
+    """Keeps capture and the GUI responsive while inference runs in the same process
+
+    Once enabled, inference threads are pinned to all but the reserved CPUs, run at a
+    lower priority and use fewer torch threads while a recording is in progress; the
+    capture callback is pinned to the reserved CPUs. Affinity and per-thread priority
+    are applied where the OS supports them (Linux) and skipped elsewhere.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.capture_cpus = set()
+        self.inference_cpus = set()
+        self.inference_threads = None
+        self.recordings = 0
+        self.throttled_requests = 0
+        self.xruns = 0
+        self.gui_stalls = 0
+        self.gui_stall_time = 0.0
+        self.max_gui_stall = 0.0
+
+    def enable(self, reserved_cpus=SCHEDULER_RESERVED_CPUS):
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+        if 0 < reserved_cpus < len(cpus):
+            self.capture_cpus = set(cpus[-reserved_cpus:])
+            self.inference_cpus = set(cpus[:-reserved_cpus])
+        else:
+            # Zu wenige Kerne zum Reservieren: nur Priorität und Drosselung wirken
+            self.capture_cpus = self.inference_cpus = set(cpus)
+        self.inference_threads = len(self.inference_cpus)
+        self.enabled = True
+        print(f"CPU scheduler: capture/GUI on {sorted(self.capture_cpus)}, "
+              f"inference on {len(self.inference_cpus)} CPUs")
+
+    def pin_current_thread(self, cpus, nice=0):
+        if not self.enabled or not sys.platform.startswith("linux"):
+            return
+        try:
+            os.sched_setaffinity(0, cpus)  # 0 = aufrufender Thread
+            if nice:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+        except OSError as e:
+            print(f"Could not set thread affinity/priority: {e}")
+
+    def capture_callback(self, callback):
+        """Wrap a PortAudio callback so its thread pins itself to the capture CPUs on first call"""
+        pinned = []
+        
+        def wrapped(*args):
+            if not pinned:
+                pinned.append(True)
+                self.pin_current_thread(self.capture_cpus)
+            callback(*args)
+        
+        return wrapped
+
+    def inference_thread(self):
+        """Call at the start of a thread that runs inference; torch's workers inherit the settings"""
+        if not self.enabled:
+            return
+        self.pin_current_thread(self.inference_cpus, SCHEDULER_INFERENCE_NICE)
+        try:
+            torch.set_num_interop_threads(SCHEDULER_INTEROP_THREADS)
+        except RuntimeError:
+            pass  # Nur einmal pro Prozess und vor der ersten Inter-op-Arbeit möglich
+
+    def before_inference(self):
+        """Set torch's intra-op threads for the next request, fewer while a recording is running"""
+        if not self.enabled:
+            return
+        with self.lock:
+            threads = self.inference_threads
+            if self.recordings:
+                threads = max(1, int(threads * SCHEDULER_RECORDING_SHARE))
+                self.throttled_requests += 1
+        if getattr(self.local, "threads", None) != threads:
+            torch.set_num_threads(threads)
+            self.local.threads = threads
+
+    def recording_started(self):
+        with self.lock:
+            self.recordings += 1
+
+    def recording_finished(self, xruns):
+        with self.lock:
+            self.recordings -= 1
+            self.xruns += xruns
+
+    def gui_heartbeat(self, lateness):
+        if lateness * 1000 < GUI_STALL_MS:
+            return
+        with self.lock:
+            self.gui_stalls += 1
+            self.gui_stall_time += lateness
+            self.max_gui_stall = max(self.max_gui_stall, lateness)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "xruns": self.xruns,
+                "gui_stalls": self.gui_stalls,
+                "gui_stall_time": self.gui_stall_time,
+                "max_gui_stall": self.max_gui_stall,
+                "throttled_requests": self.throttled_requests,
+                "inference_threads": self.inference_threads,
+                "recording": self.recordings > 0,
+            }
+
+
+SCHEDULER = CpuScheduler()
+
+
+# Tracing einzelner Transkriptions-Jobs, standardmäßig aus
+class NullSpan:
+    """Stand-in returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """One timed stage; time spent in nested spans is reported separately as child time"""
+
+    def __init__(self, tracer, name, job, args):
+        self.tracer = tracer
+        self.name = name
+        self.job = job
+        self.args = args
+        self.child_time = 0.0
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.tracer.stack().pop()
+        if self.parent is not None:
+            self.parent.child_time += duration
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.emit(self.name, self.start, duration, duration - self.child_time, self.job, self.args)
+        return False
+
+
+class Tracer:
+    """Collects spans (capture, save, model load, queue wait, mel, encode, decode ...) per job
+
+    Every call returns immediately while disabled; model hooks are only attached once
+    tracing is on. Events are kept in memory for the latency panel, streamed as JSON lines
+    to a file if one is given and can be exported in Chrome trace format (chrome://tracing,
+    Perfetto).
+    """
+
+    def __init__(self, max_events=TRACE_MAX_EVENTS, max_jobs=TRACE_MAX_JOBS):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)
+        self.jobs = OrderedDict()  # job -> {"kind", "start", ...}
+        self.max_jobs = max_jobs
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.next_job = 1
+        self.path = None
+        self.stream = None
+        self.hooks = {}  # id(model) -> (model, hook handles)
+
+    def enable(self, path=None):
+        """Start tracing; with path, every event is appended to it as one JSON line"""
+        if path and self.stream is None:
+            self.path = path
+            self.stream = open(path, "a", encoding="utf-8")
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        for model, handles in self.hooks.values():
+            for handle in handles:
+                handle.remove()
+        self.hooks.clear()
+
+    def close(self):
+        """Stop tracing, close the JSONL stream and write the Chrome trace next to it"""
+        self.disable()
+        if self.stream is None:
+            return
+        with self.lock:
+            self.stream.close()
+            self.stream = None
+        chrome_path = os.path.splitext(self.path)[0] + ".trace.json"
+        self.export_chrome(chrome_path)
+        print(f"Trace written to {self.path} and {chrome_path}")
+
+    def new_job(self, kind, **meta):
+        """Register a job (dictation, request, file) and return its id, None while disabled"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            job = self.next_job
+            self.next_job += 1
+            self.jobs[job] = dict(meta, kind=kind, start=time.perf_counter() - self.origin)
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        self.write({"type": "job", "job": job, **self.jobs[job]})
+        return job
+
+    def annotate(self, job, **meta):
+        """Attach facts like audio_seconds to a job"""
+        if not self.enabled or job is None:
+            return
+        with self.lock:
+            if job in self.jobs:
+                self.jobs[job].update(meta)
+        self.write({"type": "job", "job": job, **meta})
+
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current_job(self):
+        return getattr(self.local, "job", None)
+
+    def activate(self, job):
+        """Context manager: spans in this thread belong to job (or a list of jobs for a batch)"""
+        if not self.enabled or job is None:
+            return NULL_SPAN
+        return ActiveJob(self, job)
+
+    def bind(self, function, job=None):
+        """Carry job (default: the current one) over into a function that runs in another thread"""
+        job = self.current_job() if job is None else job
+        if not self.enabled or job is None:
+            return function
+        
+        def bound(*args, **kwargs):
+            with self.activate(job):
+                return function(*args, **kwargs)
+        
+        return bound
+
+    def span(self, name, job=None, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, self.current_job() if job is None else job, args)
+
+    def record(self, name, start, end, job=None, **args):
+        """Add a span that was measured elsewhere (perf_counter start/end), e.g. queue wait"""
+        if not self.enabled:
+            return
+        self.emit(name, start, end - start, end - start, self.current_job() if job is None else job, args)
+
+    def emit(self, name, start, duration, self_time, job, args):
+        thread = threading.current_thread()
+        event = {
+            "type": "span",
+            "name": name,
+            "job": job,
+            "start": start - self.origin,
+            "duration": duration,
+            "self": self_time,
+            "thread": thread.ident,
+            "thread_name": thread.name,
+            "args": args,
+        }
+        self.events.append(event)
+        self.write(event)
+
+    def write(self, record):
+        if self.stream is None:
+            return
+        line = json.dumps(record, default=json_default)
+        with self.lock:
+            if self.stream is not None:
+                self.stream.write(line + "\n")
+                self.stream.flush()
+
+    def attach(self, model):
+        """Time every encoder pass of model while tracing is enabled
+
+        decode() is not a module and the model is shared, so decode spans come from
+        decode_windows() instead of a wrapper on the model.
+        """
+        if not self.enabled or id(model) in self.hooks:
+            return
+        
+        def before_encoder(module, inputs):
+            mel = inputs[0]
+            span = self.span("encode", windows=mel.shape[0] if mel.ndim == 3 else 1)
+            if not hasattr(self.local, "encoder_spans"):
+                self.local.encoder_spans = []
+            self.local.encoder_spans.append(span.__enter__())
+        
+        def after_encoder(module, inputs, output):
+            self.local.encoder_spans.pop().__exit__(None, None, None)
+        
+        handles = [model.encoder.register_forward_pre_hook(before_encoder),
+                   model.encoder.register_forward_hook(after_encoder)]
+        self.hooks[id(model)] = (model, handles)
+
+    def job_summary(self, job):
+        """Self time, wall time and count per span name for one job, plus its metadata"""
+        stages = {}
+        for event in list(self.events):
+            owner = event["job"]
+            if owner != job and not (isinstance(owner, list) and job in owner):
+                continue
+            stage = stages.setdefault(event["name"], {"time": 0.0, "wall": 0.0, "count": 0, "args": {}})
+            stage["time"] += event["self"]
+            stage["wall"] += event["duration"]
+            stage["count"] += 1
+            stage["args"].update(event["args"])
+        with self.lock:
+            meta = dict(self.jobs.get(job, {}))
+        # Audiolänge über alle Transkriptionen des Jobs (bei langen Aufnahmen mehrere Stücke)
+        meta.setdefault("audio_seconds", sum(event["args"].get("audio_seconds", 0.0) for event in self.events
+                                             if event["job"] == job and event["name"] == "transcribe"))
+        return {"job": job, **meta, "stages": stages}
+
+    def export_chrome(self, path, events=None):
+        """Write spans in Chrome trace event format"""
+        events = list(self.events) if events is None else events
+        pid = os.getpid()
+        trace = []
+        threads = {}
+        for event in events:
+            if event.get("type", "span") != "span":
+                continue
+            threads[event["thread"]] = event["thread_name"]
+            trace.append({
+                "name": event["name"],
+                "cat": "whisper",
+                "ph": "X",
+                "ts": event["start"] * 1e6,
+                "dur": event["duration"] * 1e6,
+                "pid": pid,
+                "tid": event["thread"],
+                "args": dict(event["args"], job=event["job"]),
+            })
+        for thread, name in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread, "args": {"name": name}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=json_default)
+
+
+class ActiveJob:
+    """Sets the tracer's current job for the calling thread and restores the previous one"""
+
+    def __init__(self, tracer, job):
+        self.tracer = tracer
+        self.job = job
+
+    def __enter__(self):
+        self.previous = self.tracer.current_job()
+        self.tracer.local.job = self.job
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.local.job = self.previous
+        return False
+
+
+TRACER = Tracer()
+
+
+def format_latency(summary):
+    """One-line latency breakdown of a traced job for the GUI panel"""
+    stages = summary["stages"]
+    parts = []
+    for name in TRACE_PANEL_STAGES:
+        stage = stages.get(name)
+        if stage is None:
+            continue
+        if name == "model_load" and stage["time"] == 0:
+            parts.append("model cached")
+            continue
+        # Gesamtdauer nur für die umschließende Transkription, sonst Eigenzeit ohne verschachtelte Stufen
+        seconds = stage["wall"] if name == "transcribe" else stage["time"]
+        text = f"{name} {seconds * 1000:.0f} ms" if seconds < 10 else f"{name} {seconds:.1f} s"
+        if stage["count"] > 1:
+            text += f" ×{stage['count']}"
+        parts.append(text)
+    total = stages.get("transcribe")
+    audio_seconds = summary.get("audio_seconds")
+    if total and audio_seconds:
+        parts.append(f"RTF {total['wall'] / audio_seconds:.2f}")
+    if audio_seconds:
+        parts.insert(0, f"{audio_seconds:.1f} s audio:")
+    return "  ".join(parts)
+
+
+# Aufnahme-Backend mit memory-mapped WAV-Datei
+class MmapWavRecorder:
+    """Appends captured frames to a memory-mapped 16-bit WAV file
+
+    Only the segment currently being written is mapped, so resident memory stays flat
+    however long the session runs. The header is rewritten every header_interval
+    seconds, which keeps the file a valid WAV of everything recorded so far even if
+    the application crashes.
+    """
+
+    HEADER_BYTES = 44
+
+    def __init__(self, path, rate, channels=1, segment_seconds=MMAP_SEGMENT_SECONDS,
+                 header_interval=MMAP_HEADER_INTERVAL):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        self.segment_frames = int(rate * segment_seconds)
+        self.header_interval = header_interval
+        self.file = open(path, "w+b")
+        self.segment = None
+        self.segment_start = 0
+        self.written = 0
+        self.drained = 0  # Position im Aufnahmepuffer, bis zu der übernommen wurde
+        self.lost_frames = 0
+        self.write_header()
+
+    def write_header(self):
+        data_bytes = self.written * self.frame_bytes
+        self.file.seek(0)
+        self.file.write(struct.pack(
+            "<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, self.channels,
+            self.rate, self.rate * self.frame_bytes, self.frame_bytes, 16, b"data", data_bytes))
+        self.file.flush()
+        self.last_header = time.monotonic()
+
+    def map_segment(self, start):
+        """Extend the file and map the next segment, releasing the previous one"""
+        if self.segment is not None:
+            self.segment.flush()
+            self.segment = None
+        self.file.truncate(self.HEADER_BYTES + (start + self.segment_frames) * self.frame_bytes)
+        self.segment = np.memmap(self.file, dtype="<i2", mode="r+",
+                                 offset=self.HEADER_BYTES + start * self.frame_bytes,
+                                 shape=(self.segment_frames, self.channels))
+        self.segment_start = start
+
+    def append(self, data):
+        offset = 0
+        while offset < len(data):
+            if self.segment is None or self.written >= self.segment_start + self.segment_frames:
+                self.map_segment(self.written)
+            within = self.written - self.segment_start
+            count = min(len(data) - offset, self.segment_frames - within)
+            self.segment[within:within + count] = data[offset:offset + count]
+            offset += count
+            self.written += count
+        
+        if time.monotonic() - self.last_header >= self.header_interval:
+            self.segment.flush()
+            self.write_header()
+
+    def drain(self, buffer):
+        """Move everything the capture buffer received since the last call into the file"""
+        if buffer.oldest() > self.drained:
+            # Der Ringpuffer war schneller als wir: fehlende Frames zählen
+            self.lost_frames += buffer.oldest() - self.drained
+            self.drained = buffer.oldest()
+        end = buffer.written
+        for view in buffer.views(self.drained, end):
+            self.append(view)
+        self.drained = end
+
+    def close(self):
+        """Final header and exact file size"""
+        if self.segment is not None:
+            self.segment.flush()
+            self.segment = None
+        self.file.truncate(self.HEADER_BYTES + self.written * self.frame_bytes)
+        self.write_header()
+        self.file.close()
+
+    def seconds(self):
+        return self.written / self.rate
+
+    def read(self, start=0, end=None):
+        """Zero-copy read-only view of recorded frames, mapped straight from the file"""
+        end = self.written if end is None else min(end, self.written)
+        if end <= start:
+            return np.zeros((0, self.channels), dtype=np.int16)
+        return np.memmap(self.path, dtype="<i2", mode="r", offset=self.HEADER_BYTES + start * self.frame_bytes,
+                         shape=(end - start, self.channels))
+
+
+def iter_recording_chunks(source, rate, chunk_seconds=RECORDING_CHUNK_SECONDS, search_seconds=10.0):
+    """Yield (offset_seconds, 16 kHz audio) pieces of a long recording, cut at quiet points"""
+    position = 0
+    while position < source.written:
+        end = min(source.written, position + int((chunk_seconds + search_seconds) * rate))
+        audio = to_whisper_audio(source.read(position, end), rate)
+        if end < source.written:
+            search = int(2 * search_seconds * WHISPER_SAMPLE_RATE)
+            audio = audio[:find_quiet_point(audio, len(audio) - search, len(audio)) or len(audio)]
+        yield position / rate, audio
+        position += max(1, int(round(len(audio) * rate / WHISPER_SAMPLE_RATE)))
+
+
+def save_wav_async(path, rate, data, on_done=None):
+    """Write a WAV file in a background thread and report the outcome via on_done(error)"""
+    def worker():
+        error = None
+        try:
+            with TRACER.span("save", seconds=len(data) / rate):
+                wav.write(path, rate, data)
+        except Exception as e:
+            error = e
+        if on_done:
+            on_done(error)
+
+    thread = threading.Thread(target=TRACER.bind(worker), daemon=True)
+    thread.start()
+    return thread
+
+
+def transcribe_with_vad(model, audio, **options):
+    """Transcribe only the speech regions of audio, with timestamps on the original timeline"""
+    start_time = time.perf_counter()
+    regions = detect_speech_regions(audio)
+    compact, timeline = compact_speech(audio, regions)
+    vad_time = time.perf_counter() - start_time
+    
+    total_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    speech_seconds = sum(end - start for start, end in regions) / WHISPER_SAMPLE_RATE
+    if len(compact) == 0:
+        language = options.get("language")
+        result = {"text": "", "segments": [], "language": None if language == AUTO_LANGUAGE else language}
+        decode_time = 0.0
+    else:
+        decode_start = time.perf_counter()
+        result = transcribe_detecting_language(model, compact, **options)
+        decode_time = time.perf_counter() - decode_start
+    
+    for segment in result["segments"]:
+        segment["start"] = remap_timestamp(segment["start"], timeline)
+        segment["end"] = remap_timestamp(segment["end"], timeline)
+        for word in segment.get("words", []):
+            word["start"] = remap_timestamp(word["start"], timeline)
+            word["end"] = remap_timestamp(word["end"], timeline)
+    
+    # Gesparte Zeit: Dekodierzeit hochgerechnet auf die volle Länge, abzüglich VAD-Aufwand
+    skipped_fraction = 1.0 - speech_seconds / total_seconds if total_seconds else 0.0
+    if speech_seconds:
+        time_saved = decode_time * total_seconds / (len(compact) / WHISPER_SAMPLE_RATE) - decode_time - vad_time
+    else:
+        time_saved = 0.0
+    result["vad"] = {
+        "regions": len(regions),
+        "total_seconds": total_seconds,
+        "speech_seconds": speech_seconds,
+        "skipped_fraction": max(skipped_fraction, 0.0),
+        "vad_time": vad_time,
+        "time_saved": max(time_saved, 0.0),
+    }
+    return result
+
+
+def normalize_segment_text(text):
+    """Lower-case text without punctuation, used to compare hypotheses of two passes"""
+    return "".join(c for c in text.lower() if c.isalnum() or c.isspace()).split()
+
+
+class ChunkStitcher:
+    """Joins chunk results into one transcript with de-duplicated overlaps and monotonic timestamps
+
+    Chunks are fed in order and their final segments come straight back. Only the last
+    segment is kept for the overlap checks, so long files are written chunk by chunk in
+    constant memory.
+    """
+
+    def __init__(self, rate=WHISPER_SAMPLE_RATE):
+        self.rate = rate
+        self.last = None
+        self.count = 0
+
+    def add(self, chunk, result):
+        """Segments of one chunk's result on the file's timeline (chunk None: a whole file)"""
+        if chunk is None:
+            chunk = {"start": 0, "own_start": 0, "own_end": 0}
+        offset = chunk["start"] / self.rate
+        own_start = chunk["own_start"] / self.rate
+        # Hinter dem letzten Stück kommt keins mehr, das Segmente am Ende beanspruchen könnte
+        own_end = chunk["own_end"] / self.rate if chunk["own_end"] < chunk.get("end", 0) else float("inf")
+        segments = []
+        for seg in result["segments"]:
+            start = seg["start"] + offset
+            end = seg["end"] + offset
+            # Segmente im Überlappungsbereich gehören dem Stück, in dem ihre Mitte liegt
+            if not own_start <= (start + end) / 2 < own_end:
+                continue
+            if self.last is not None:
+                # Gleicher Text direkt an der Grenze: doppelt erkannt
+                if normalize_segment_text(seg["text"]) == normalize_segment_text(self.last["text"]) \
+                        and start - self.last["end"] < 1.0:
+                    continue
+                start = max(start, self.last["end"])
+            end = max(end, start)
+            seg = dict(seg, id=self.count, start=start, end=end)
+            if "words" in seg:
+                seg["words"] = [dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                                for word in seg["words"]]
+            segments.append(seg)
+            self.last = seg
+            self.count += 1
+        return segments
+
+
+# Ausgabedateien, die Segment für Segment wachsen (für Indexierung schon während langer Dateien)
+class SegmentWriter:
+    """Appends segments to one output file as they arrive and flushes after each"""
+    extension = None
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+        self.count = 0
+        self.begin()
+
+    def begin(self):
+        pass
+
+    def write(self, segment):
+        self.count += 1
+        self.file.write(self.format(segment))
+        self.file.flush()
+
+    def format(self, segment):
+        raise NotImplementedError
+
+    def text(self, segment):
+        """Segment text, prefixed with the speaker in merged meeting transcripts"""
+        if "speaker" in segment:
+            return f"{segment['speaker']}: {segment['text'].strip()}"
+        return segment["text"].strip()
+
+    def end(self, summary):
+        pass
+
+    def close(self, summary=None):
+        if summary is not None:
+            self.end(summary)
+        self.file.close()
+
+
+class TxtSegmentWriter(SegmentWriter):
+    extension = "txt"
+
+    def format(self, segment):
+        return self.text(segment) + "\n"
+
+
+class SrtSegmentWriter(SegmentWriter):
+    extension = "srt"
+
+    def format(self, segment):
+        start = whisper.utils.format_timestamp(segment["start"], always_include_hours=True, decimal_marker=",")
+        end = whisper.utils.format_timestamp(segment["end"], always_include_hours=True, decimal_marker=",")
+        return f"{self.count}\n{start} --> {end}\n{self.text(segment)}\n\n"
+
+
+class VttSegmentWriter(SegmentWriter):
+    extension = "vtt"
+
+    def begin(self):
+        self.file.write("WEBVTT\n\n")
+
+    def format(self, segment):
+        start = whisper.utils.format_timestamp(segment["start"], always_include_hours=True)
+        end = whisper.utils.format_timestamp(segment["end"], always_include_hours=True)
+        return f"{start} --> {end}\n{self.text(segment)}\n\n"
+
+
+class JsonlSegmentWriter(SegmentWriter):
+    """One JSON object per segment with confidence and word timings, then an end record"""
+    extension = "jsonl"
+
+    def format(self, segment):
+        record = {
+            "type": "segment",
+            "id": segment["id"],
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "text": segment["text"].strip(),
+            "avg_logprob": segment.get("avg_logprob"),
+            "no_speech_prob": segment.get("no_speech_prob"),
+            "compression_ratio": segment.get("compression_ratio"),
+            "temperature": segment.get("temperature"),
+        }
+        if "speaker" in segment:
+            record["speaker"] = segment["speaker"]
+        if "words" in segment:
+            record["words"] = [{"word": word["word"], "start": round(word["start"], 3), "end": round(word["end"], 3),
+                                "probability": word.get("probability")} for word in segment["words"]]
+        return json.dumps(record, ensure_ascii=False, default=json_default) + "\n"
+
+    def end(self, summary):
+        # Abschluss-Zeile: Leser wissen damit, dass die Datei vollständig ist
+        self.file.write(json.dumps(dict(type="end", segments=self.count, **summary), default=json_default) + "\n")
+
+
+SEGMENT_WRITERS = {writer.extension: writer for writer in
+                   (TxtSegmentWriter, SrtSegmentWriter, VttSegmentWriter, JsonlSegmentWriter)}
+
+
+class TranscriptStream:
+    """Writes a transcript in several formats while its chunks are still being transcribed
+
+    Streaming formats (txt, srt, vtt, jsonl) are written segment by segment. Formats that
+    need the whole result (json, tsv) keep the segments and are written by close().
+    """
+
+    def __init__(self, stem, output_dir, formats, rate=WHISPER_SAMPLE_RATE):
+        os.makedirs(output_dir, exist_ok=True)
+        self.stem = stem
+        self.output_dir = output_dir
+        self.writers = [SEGMENT_WRITERS[fmt](os.path.join(output_dir, f"{stem}.{fmt}"))
+                        for fmt in formats if fmt in SEGMENT_WRITERS]
+        self.whole_formats = [fmt for fmt in formats if fmt not in SEGMENT_WRITERS]
+        self.segments = [] if self.whole_formats else None
+        self.stitcher = ChunkStitcher(rate)
+        self.language = None
+        self.language_detection = None
+        self.texts = []
+
+    def add(self, result, chunk=None):
+        """Write the segments of one result, a chunk of a longer recording if chunk is given"""
+        if self.language is None:
+            self.language = result.get("language")
+            self.language_detection = result.get("language_detection")
+        for segment in self.stitcher.add(chunk, result):
+            for writer in self.writers:
+                writer.write(segment)
+            if self.segments is not None:
+                self.segments.append(segment)
+
+    @property
+    def paths(self):
+        return [writer.path for writer in self.writers] + \
+            [os.path.join(self.output_dir, f"{self.stem}.{fmt}") for fmt in self.whole_formats]
+
+    def close(self, **summary):
+        """Finish every file; summary ends up in the JSON lines end record"""
+        summary = dict(summary, language=self.language)
+        for writer in self.writers:
+            writer.close(summary)
+        if self.whole_formats:
+            result = {"text": "".join(seg["text"] for seg in self.segments), "segments": self.segments,
+                      "language": self.language}
+            write_outputs(result, self.stem, self.output_dir, self.whole_formats)
+        return self.paths
+
+    def discard(self):
+        """Close and delete the partial files, e.g. after a chunk failed"""
+        for writer in self.writers:
+            writer.close()
+            if os.path.exists(writer.path):
+                os.remove(writer.path)
+
+
+# Live-Transkription mit gleitendem Fenster
+class LiveTranscriber:
+    """Incremental transcription of a growing recording with committed and tentative text"""
+
+    def __init__(self, model, language=None, window_seconds=LIVE_WINDOW_SECONDS,
+                 step_seconds=LIVE_STEP_SECONDS, margin_seconds=1.0, vocabulary=None):
+        self.model = model
+        self.language = language
+        self.vocabulary = vocabulary
+        self.window_seconds = window_seconds
+        self.step_seconds = step_seconds
+        self.margin_seconds = margin_seconds
+        self.committed_time = 0.0  # Alles davor ist endgültig
+        self.committed = []
+        self.tentative = []
+        self.processed_until = 0.0
+
+    def ready(self, recorded_seconds):
+        """True if enough new audio has arrived for another pass"""
+        return recorded_seconds - self.processed_until >= self.step_seconds
+
+    def prompt(self):
+        """Tail of the committed text, passed as initial prompt for continuity"""
+        text = " ".join(seg["text"].strip() for seg in self.committed)
+        return text[-200:] if text else None
+
+    def step(self, audio, final=False):
+        """Transcribe audio recorded since committed_time and commit text that is stable"""
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        self.processed_until = self.committed_time + duration
+        if duration < 0.1:
+            return
+        
+        # Nur das unbestätigte Stück transkribieren, höchstens ein Fenster lang
+        window = audio[:int(self.window_seconds * WHISPER_SAMPLE_RATE)]
+        options = dict(language=self.language, fp16=False, initial_prompt=self.prompt(),
+                       condition_on_previous_text=False)
+        if self.vocabulary is not None:
+            options["vocabulary"] = self.vocabulary
+        result = self.model.transcribe(window, **options)
+        if self.language == AUTO_LANGUAGE and "language_detection" in result:
+            # Einmal erkannt, gilt die Sprache für den Rest der Aufnahme
+            self.language = result["language"]
+        window_end = self.committed_time + len(window) / WHISPER_SAMPLE_RATE
+        segments = []
+        for seg in result["segments"]:
+            if not seg["text"].strip():
+                continue
+            segments.append({
+                "start": self.committed_time + seg["start"],
+                "end": min(self.committed_time + seg["end"], window_end),
+                "text": seg["text"],
+            })
+        
+        if final:
+            stable = len(segments)
+        else:
+            # Ein Segment gilt als stabil, wenn der vorige Durchlauf dasselbe erkannt hat
+            # und es nicht am Fensterende liegt, wo noch Audio nachkommen kann
+            stable = 0
+            for seg, previous in zip(segments, self.tentative):
+                if normalize_segment_text(seg["text"]) != normalize_segment_text(previous["text"]):
+                    break
+                if seg["end"] > window_end - self.margin_seconds:
+                    break
+                stable += 1
+            
+            # Läuft das Fenster voll, alles bis auf das letzte Segment festschreiben
+            if duration >= self.window_seconds - self.step_seconds:
+                stable = max(stable, len(segments) - 1)
+        
+        self.committed.extend(segments[:stable])
+        self.tentative = segments[stable:]
+        if final:
+            self.committed_time = window_end
+        elif stable:
+            self.committed_time = segments[stable - 1]["end"]
+        elif duration >= self.window_seconds:
+            # Fenster ohne Sprache: trotzdem weiterrücken
+            self.committed_time = window_end
+
+    def committed_text(self):
+        return "".join(seg["text"] for seg in self.committed).strip()
+
+    def tentative_text(self):
+        return "".join(seg["text"] for seg in self.tentative).strip()
+
+
+# Optionen, die der gebatchte Pfad der Engine selbst umsetzt; alles andere geht an model.transcribe.
+# fp16 und condition_on_previous_text prüft TranscriptionRequest.batchable() nach ihrem Wert
+BATCHABLE_OPTIONS = {"language", "task", "initial_prompt", "temperature", "vocabulary"}
+TEMPERATURE_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+TIME_PRECISION = 0.02  # Sekunden pro Timestamp-Token
+# Sprachwert für "einmal am ersten Fenster erkennen, dann mit dieser Sprache dekodieren"
+AUTO_LANGUAGE = "auto"
+
+
+class FeatureCache:
+    """Bounded LRU of mel windows and encoder outputs, keyed by a hash of their input
+
+    Entries live on the CPU so a large cache does not hold GPU memory. Every entry
+    remembers what it cost to compute, which is reported as time_saved on hits.
+    """
+
+    def __init__(self, max_bytes=ENGINE_FEATURE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (tensor, seconds to compute)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    @staticmethod
+    def make_key(kind, data):
+        """Hash of an audio window (numpy) or mel window (tensor) plus what is derived from it"""
+        if isinstance(data, torch.Tensor):
+            data = data.detach().to("cpu", torch.float32).numpy()
+        digest = hashlib.sha256(f"{kind}:{data.shape}".encode("utf-8"))
+        digest.update(np.ascontiguousarray(data, dtype=np.float32).data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.time_saved += entry[1]
+            return entry[0]
+
+    def put(self, key, tensor, cost):
+        tensor = tensor.detach().to("cpu").clone()
+        size = tensor.numel() * tensor.element_size()
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[0].numel() * old[0].element_size()
+            self.entries[key] = (tensor, cost)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.numel() * evicted.element_size()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                    "bytes": self.total_bytes, "time_saved": self.time_saved}
+
+
+class CachedEncoder:
+    """A model's encoder looked up in a FeatureCache first, so windows seen before skip it
+
+    Owned by a DecodingModel view; the pooled model and its encoder stay untouched.
+    Only batches of mel windows are cached, anything else goes straight to the encoder.
+    """
+
+    def __init__(self, encoder, cache):
+        self.encoder = encoder
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.encoder, name)
+
+    def __call__(self, mel):
+        if mel.ndim != 3:
+            return self.encoder(mel)
+        keys = [self.cache.make_key("encoder", window) for window in mel]
+        outputs = [self.cache.get(key) for key in keys]
+        missing = [index for index, output in enumerate(outputs) if output is None]
+        if missing:
+            start = time.perf_counter()
+            encoded = self.encoder(mel[missing])
+            cost = (time.perf_counter() - start) / len(missing)
+            for index, row in zip(missing, encoded):
+                self.cache.put(keys[index], row, cost)
+                outputs[index] = row
+        return torch.stack([output.to(mel.device) for output in outputs])
+
+
+def first_window_mel(model, audio):
+    """First mel window exactly as transcribe() computes it, so its encoder output gets reused"""
+    mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+    content_frames = mel.shape[-1] - whisper.audio.N_FRAMES
+    return whisper.pad_or_trim(mel[:, :min(whisper.audio.N_FRAMES, content_frames)], whisper.audio.N_FRAMES)
+
+
+def detect_language(model, mel, top=3):
+    """Detect the language of one mel window, returns (language, report)"""
+    start = time.perf_counter()
+    if model.is_multilingual:
+        dtype = next(model.parameters()).dtype
+        with torch.no_grad(), TRACER.span("detect_language"):
+            _, probs = model.detect_language(mel.to(model.device, dtype))
+    else:
+        probs = {"en": 1.0}
+    ranked = sorted(probs.items(), key=lambda item: item[1], reverse=True)
+    return ranked[0][0], {
+        "language": ranked[0][0],
+        "probabilities": dict(ranked[:top]),
+        "time": time.perf_counter() - start,
+    }
+
+
+def transcribe_detecting_language(model, audio, **options):
+    """model.transcribe() that resolves language="auto" once on the first window
+
+    Engines resolve it themselves; for a plain model the encoder output of the first
+    window is only reused if model is a DecodingModel with a FeatureCache.
+    """
+    if isinstance(model, InferenceEngine):
+        return model.transcribe(audio, **options)
+    options = dict(options)
+    vocabulary = options.pop("vocabulary", None)
+    view = model if vocabulary is None else DecodingModel(model, vocabulary)
+    if options.get("language") != AUTO_LANGUAGE:
+        return view.transcribe(audio, **options)
+    language, report = detect_language(model, first_window_mel(model, audio))
+    result = view.transcribe(audio, **dict(options, language=language))
+    result["language_detection"] = report
+    return result
+
+
+# Vokabular-Profile: Fachbegriffe als Prompt und als Bonus/Sperre auf die Logits des Decoders
+def default_vocabulary_path():
+    """Vocabulary profiles next to the models directory"""
+    return os.environ.get("WHISPER_VOCABULARY") or os.path.join(os.path.dirname(default_cache_dir()), VOCABULARY_FILE)
+
+
+class VocabularyProfile:
+    """Domain vocabulary: an initial prompt plus terms to boost or suppress while decoding
+
+    Prompt and terms are tokenized once per tokenizer and kept, decoding a window only
+    looks the prepared token lists up. str() names the profile and its content, which
+    puts it into ResultCache keys.
+    """
+
+    def __init__(self, name, prompt=None, boost=(), suppress=(), boost_value=VOCABULARY_BOOST):
+        self.name = name
+        self.boost = [term.strip() for term in boost if term.strip()]
+        self.suppress = [term.strip() for term in suppress if term.strip()]
+        # Ohne eigenen Prompt dienen die Begriffe selbst als Prompt ("Glossar"-Prompting)
+        self.prompt = (prompt or "").strip() or (", ".join(self.boost) + "." if self.boost else "")
+        self.boost_value = float(boost_value)
+        content = json.dumps([self.prompt, self.boost, self.suppress, self.boost_value], ensure_ascii=False)
+        self.digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        self.prepared = {}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(name, data.get("prompt"), data.get("boost", ()), data.get("suppress", ()),
+                   data.get("boost_value", VOCABULARY_BOOST))
+
+    def __str__(self):
+        return f"vocabulary:{self.name}:{self.digest}"
+
+    def __getstate__(self):
+        # Vorbereitete Token-Tabellen nicht an Worker-Prozesse schicken, dort neu aufbauen
+        return dict(self.__dict__, prepared={})
+
+    def tokens(self, tokenizer):
+        """VocabularyTokens for this tokenizer, built on first use"""
+        key = tokenizer.encoding.name
+        tokens = self.prepared.get(key)
+        if tokens is None:
+            tokens = self.prepared[key] = VocabularyTokens(self, tokenizer)
+        return tokens
+
+
+class VocabularyTokens:
+    """A profile's token ids for one tokenizer, ready to go into every decode() call
+
+    weights maps the tokens generated last (a prefix of a term) to the token ids that
+    continue a term and their logit bonus. Term starts (empty prefix) apply at every
+    step, so they only get VOCABULARY_START_FACTOR of it; the rest of a term gets the
+    full bonus once its beginning was decoded. blocked does the same
+    for the last token of suppressed terms with several tokens; single-token ones go to
+    whisper's own suppress_tokens.
+    """
+
+    def __init__(self, profile, tokenizer):
+        self.name = profile.name
+        self.tokenizer = tokenizer
+        self.prompt = tokenizer.encode(" " + profile.prompt) if profile.prompt else []
+        self.suppress = []
+        weights = {}
+        blocked = {}
+        for term in profile.boost:
+            ids = tokenizer.encode(" " + term)
+            for depth in range(len(ids)):
+                offsets = weights.setdefault(tuple(ids[:depth]), {})
+                value = profile.boost_value if depth else profile.boost_value * VOCABULARY_START_FACTOR
+                offsets[ids[depth]] = max(offsets.get(ids[depth], 0.0), value)
+        for term in profile.suppress:
+            for variant in (" " + term, term):
+                ids = tokenizer.encode(variant)
+                if len(ids) > 1:
+                    blocked.setdefault(tuple(ids[:-1]), {})[ids[-1]] = float("-inf")
+                elif ids and variant.startswith(" "):
+                    self.suppress.append(ids[0])
+        self.weights = {prefix: (list(offsets), list(offsets.values())) for prefix, offsets in weights.items()}
+        self.blocked = {prefix: (list(offsets), list(offsets.values())) for prefix, offsets in blocked.items()}
+        self.depth = max((len(prefix) for prefix in [*weights, *blocked]), default=0)
+        self.tables = {}
+        self.suppress_lists = {}
+
+    def table(self, device):
+        """weights and blocked with tensors on device"""
+        tables = self.tables.get(device)
+        if tables is None:
+            tables = self.tables[device] = tuple(
+                {prefix: (torch.tensor(ids, device=device), torch.tensor(offsets, device=device))
+                 for prefix, (ids, offsets) in table.items()}
+                for table in (self.weights, self.blocked))
+        return tables
+
+    def options(self, options, n_text_ctx):
+        """DecodingOptions with the profile's prompt in front and its suppressed tokens added"""
+        changes = {}
+        if self.prompt:
+            previous = options.prompt
+            if isinstance(previous, str):
+                previous = self.tokenizer.encode(" " + previous.strip())
+            # Profil-Prompt bleibt immer stehen, vom bisherigen Text passt nur das Ende dahinter
+            room = n_text_ctx // 2 - 1 - len(self.prompt)
+            if room <= 0:
+                changes["prompt"] = self.prompt[-(n_text_ctx // 2 - 1):]
+            else:
+                changes["prompt"] = self.prompt + list(previous or [])[-room:]
+        if self.suppress:
+            base = options.suppress_tokens
+            key = base if base is None or isinstance(base, str) else tuple(base)
+            merged = self.suppress_lists.get(key)
+            if merged is None:
+                if isinstance(base, str):
+                    base = [int(token) for token in base.split(",") if token.strip()]
+                merged = self.suppress_lists[key] = list(base or []) + self.suppress
+            changes["suppress_tokens"] = merged
+        return dataclasses.replace(options, **changes) if changes else options
+
+
+class BoostTokens:
+    """LogitFilter boosting the continuation of the longest vocabulary prefix just generated
+
+    Inside a term only its next token is boosted, not the starts of other terms. Runs
+    after whisper's own filters, so tokens they blocked (-inf) stay blocked.
+    """
+
+    def __init__(self, vocabulary, sample_begin, device):
+        self.weights, self.blocked = vocabulary.table(device)
+        self.depth = vocabulary.depth
+        self.sample_begin = sample_begin
+
+    def apply(self, logits, tokens):
+        depth = min(self.depth, tokens.shape[1] - self.sample_begin)
+        tails = tokens[:, tokens.shape[1] - depth:].tolist() if depth > 0 else [[]] * tokens.shape[0]
+        for row, tail in enumerate(tails):
+            boosted = False
+            for start in range(len(tail) + 1):
+                prefix = tuple(tail[start:])
+                entry = None if boosted else self.weights.get(prefix)
+                if entry is not None:
+                    logits[row, entry[0]] += entry[1]
+                    boosted = True
+                entry = self.blocked.get(prefix)
+                if entry is not None:
+                    logits[row, entry[0]] += entry[1]
+
+
+def decode_with_vocabulary(model, mel, options, vocabulary):
+    """whisper's decode() with a profile's prompt, suppressed tokens and boost filter"""
+    from whisper.decoding import DecodingTask
+    
+    single = mel.ndim == 2
+    if single:
+        mel = mel.unsqueeze(0)
+    task = DecodingTask(model, vocabulary.options(options, model.dims.n_text_ctx))
+    if vocabulary.weights or vocabulary.blocked:
+        task.logit_filters.append(BoostTokens(vocabulary, task.sample_begin, mel.device))
+    with TRACER.span("decode", windows=mel.shape[0], temperature=options.temperature, vocabulary=vocabulary.name):
+        result = task.run(mel)
+    return result[0] if single else result
+
+
+def vocabulary_profile(name):
+    """Profile by name for the command line, None (with a message) if there is none"""
+    profile = load_vocabulary_profiles().get(name)
+    if profile is None:
+        print(f"Unknown vocabulary profile {name} in {default_vocabulary_path()}")
+    return profile
+
+
+def load_vocabulary_profiles(path=None):
+    """Profiles from the JSON file: {"name": {"prompt": ..., "boost": [...], "suppress": [...]}}"""
+    path = path or default_vocabulary_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {name: VocabularyProfile.from_dict(name, entry) for name, entry in data.items()}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Could not read vocabulary profiles from {path}: {e}")
+        return {}
+
+
+class TranscriptionRequest:
+    """Audio plus decode options waiting in the engine queue"""
+
+    def __init__(self, audio, options):
+        self.audio = audio
+        self.options = options
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.detection = None
+        self.job = TRACER.current_job()
+
+    def batchable(self, fp16=False):
+        """Whether the batched path decodes these options the way model.transcribe would
+
+        fp16 tells whether the engine's model runs in half precision.
+        """
+        duration = len(self.audio) / WHISPER_SAMPLE_RATE
+        if duration > ENGINE_BATCH_MAX_SECONDS:
+            return False
+        for name, value in self.options.items():
+            if name in BATCHABLE_OPTIONS:
+                continue
+            # Der gebatchte Pfad rechnet immer in der Genauigkeit des Modells
+            if name == "fp16" and bool(value) == fp16:
+                continue
+            if name == "condition_on_previous_text":
+                continue
+            return False
+        # Fenster werden unabhängig dekodiert: ohne ausdrückliches condition_on_previous_text=False
+        # nur, wenn die Aufnahme in ein einziges Fenster passt und es keinen Kontext gäbe
+        return duration <= ENGINE_WINDOW_SECONDS or self.options.get("condition_on_previous_text") is False
+
+
+def is_no_speech(result):
+    """Same silence rule as whisper's transcribe()"""
+    return result.no_speech_prob > 0.6 and result.avg_logprob < -1.0
+
+
+def decode_segments(tokenizer, result, offset, duration, seek):
+    """Split a DecodingResult at its timestamp tokens into transcribe()-style segments"""
+    pieces = []
+    start = 0.0
+    text_tokens = []
+    for token in result.tokens:
+        if token >= tokenizer.timestamp_begin:
+            timestamp = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if text_tokens:
+                pieces.append((start, timestamp, text_tokens))
+                text_tokens = []
+            start = timestamp
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        pieces.append((start, duration, text_tokens))
+    
+    return [{
+        "seek": seek,
+        "start": offset + min(start, duration),
+        "end": offset + min(max(end, start), duration),
+        "text": tokenizer.decode(tokens),
+        "tokens": tokens,
+        "temperature": result.temperature,
+        "avg_logprob": result.avg_logprob,
+        "compression_ratio": result.compression_ratio,
+        "no_speech_prob": result.no_speech_prob,
+    } for start, end, tokens in pieces]
+
+
+def decode_windows(model, mel, options, vocabulary=None):
+    """whisper's decode() for one window or a batch of them, traced as one "decode" span
+
+    vocabulary is a profile's VocabularyTokens for the model's tokenizer, or None.
+    """
+    if vocabulary is not None:
+        return decode_with_vocabulary(model, mel, options, vocabulary)
+    with TRACER.span("decode", windows=mel.shape[0] if mel.ndim == 3 else 1, temperature=options.temperature):
+        return whisper.decode(model, mel, options)
+
+
+class DecodingModel:
+    """A pooled model as transcribe() sees it, with decode() going through decode_windows()
+
+    transcribe() calls model.decode() once per window. Pooled models are shared between
+    threads, so per-call decoding (a vocabulary profile) and the encoder cache (features,
+    a FeatureCache) live in this view instead of on the model. Every encoder call of
+    transcribe(), decode(), language detection and word timestamps goes through
+    self.encoder.
+    """
+
+    def __init__(self, model, profile=None, features=None):
+        self.model = model
+        self.encoder = model.encoder if features is None else CachedEncoder(model.encoder, features)
+        self.vocabulary = None
+        if profile is not None:
+            tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+            self.vocabulary = profile.tokens(tokenizer)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __call__(self, mel, tokens):
+        # Wortzeitstempel rufen das Modell direkt auf, wie Whisper.forward
+        return self.model.decoder(tokens, self.encoder(mel))
+
+    def embed_audio(self, mel):
+        return self.encoder(mel)
+
+    def detect_language(self, mel, tokenizer=None):
+        return whisper.decoding.detect_language(self, mel, tokenizer)
+
+    def decode(self, mel, options=None, **kwargs):
+        options = options if options is not None else whisper.DecodingOptions()
+        if kwargs:
+            options = dataclasses.replace(options, **kwargs)
+        return decode_windows(self, mel, options, self.vocabulary)
+
+    def transcribe(self, audio, **options):
+        return whisper.transcribe(self, audio, **options)
+
+
+# Inferenz-Engine: ein Thread besitzt das Modell, Anfragen kommen über eine Warteschlange
+class InferenceEngine:
+    """Runs queued transcription requests and batches their windows through the encoder"""
+
+    def __init__(self, model_name, device=None, precision="fp32", download_root=None,
+                 max_batch=ENGINE_MAX_BATCH, max_wait_ms=ENGINE_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.device = device
+        self.precision = precision
+        self.download_root = download_root
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.tokenizer = None
+        self.batches = 0
+        self.windows = 0
+        self.feature_cache = FeatureCache()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, audio, callback=None, **options):
+        """Queue audio (16 kHz float32) for transcription and return a Future with the result"""
+        request = TranscriptionRequest(audio, options)
+        if callback:
+            request.future.add_done_callback(callback)
+        self.queue.put(request)
+        return request.future
+
+    def transcribe(self, audio, **options):
+        """Blocking call with the same signature and result format as model.transcribe"""
+        return self.submit(audio, **options).result()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        SCHEDULER.inference_thread()
+        while True:
+            request = self.queue.get()
+            if request is None:
+                break
+            batch = [request]
+            windows = self.count_windows(request)
+            
+            # Weitere Anfragen einsammeln, bis der Batch voll ist oder die Frist der ersten abläuft
+            deadline = request.submitted + self.max_wait
+            while windows < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+                windows += self.count_windows(request)
+            
+            self.process(batch)
+
+    def batchable(self, request):
+        return request.batchable(fp16=self.precision == "fp16")
+
+    def count_windows(self, request):
+        if not self.batchable(request):
+            return 0
+        return max(1, int(np.ceil(len(request.audio) / WHISPER_SAMPLE_RATE / ENGINE_WINDOW_SECONDS)))
+
+    def process(self, requests):
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        try:
+            with TRACER.activate([request.job for request in requests]):
+                model, _ = MODEL_POOL.get(self.model_name, self.device, self.precision, self.download_root)
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        TRACER.attach(model)
+        pooled = model
+        model = DecodingModel(pooled, features=self.feature_cache)
+        SCHEDULER.before_inference()
+        now = time.perf_counter()
+        for request in requests:
+            TRACER.record("queue_wait", request.submitted, now, job=request.job, batch=len(requests))
+        
+        # language="auto": einmal am ersten Fenster erkennen, dessen Encoder-Ausgabe danach wiederverwendet wird
+        for request in requests:
+            if request.options.get("language") == AUTO_LANGUAGE:
+                try:
+                    with TRACER.activate(request.job):
+                        self.detect_request_language(model, request)
+                except Exception as e:
+                    request.future.set_exception(e)
+        requests = [request for request in requests if not request.future.done()]
+        
+        started = time.perf_counter()
+        batched = [request for request in requests if self.batchable(request)]
+        if batched:
+            try:
+                # Gemeinsame Encoder-/Decoder-Läufe gehören allen Jobs im Batch
+                with TRACER.activate([request.job for request in batched]):
+                    self.run_batched(model, batched, started)
+            except Exception as e:
+                for request in batched:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+        
+        # Lange Aufnahmen und Sonderoptionen: sequentiell mit Kontext über alle Fenster
+        for request in requests:
+            if self.batchable(request):
+                continue
+            start = time.perf_counter()
+            cached_before = self.feature_cache.hits
+            options = dict(request.options)
+            vocabulary = options.pop("vocabulary", None)
+            try:
+                with TRACER.activate(request.job):
+                    view = DecodingModel(pooled, vocabulary, self.feature_cache)
+                    result = view.transcribe(request.audio, **options)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+            result["timing"] = {"queue_wait": start - request.submitted,
+                                "inference": time.perf_counter() - start, "batch_windows": 1,
+                                "feature_cache_hits": self.feature_cache.hits - cached_before}
+            if request.detection:
+                result["language_detection"] = request.detection
+            request.future.set_result(result)
+
+    def detect_request_language(self, model, request):
+        """Detect on the window the decoder will see first and pin the request to that language"""
+        if len(request.audio) == 0:
+            request.options["language"] = None
+            return
+        if self.batchable(request):
+            chunk = self.split_windows(request.audio)[0]
+            mel = self.window_mel(model, request.audio[chunk["start"]:chunk["end"]])
+        else:
+            mel = first_window_mel(model, request.audio)
+        request.options["language"], request.detection = detect_language(model, mel)
+
+    def split_windows(self, audio):
+        """Cut audio at quiet points into windows for the batched path
+
+        Cuts land within 5 s of every ENGINE_WINDOW_SECONDS and the last window may be
+        1.5 times as long, so no window exceeds the encoder's 30 s.
+        """
+        return split_audio(audio, ENGINE_WINDOW_SECONDS, overlap_seconds=0.0, search_seconds=5.0)
+
+    def window_mel(self, model, audio):
+        """Log-mel spectrogram of one window, padded to 30 s like transcribe() does"""
+        key = self.feature_cache.make_key(f"mel{model.dims.n_mels}", audio)
+        mel = self.feature_cache.get(key)
+        if mel is not None:
+            return mel
+        start = time.perf_counter()
+        with TRACER.span("mel", seconds=len(audio) / WHISPER_SAMPLE_RATE):
+            mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+            content_frames = mel.shape[-1] - whisper.audio.N_FRAMES
+            mel = whisper.pad_or_trim(mel[:, :content_frames], whisper.audio.N_FRAMES)
+        self.feature_cache.put(key, mel, time.perf_counter() - start)
+        return mel
+
+    def encode(self, model, mels):
+        """Run the encoder over a list of mel windows, max_batch at a time"""
+        dtype = next(model.parameters()).dtype
+        features = []
+        with torch.no_grad():
+            for i in range(0, len(mels), self.max_batch):
+                batch = torch.stack(mels[i:i + self.max_batch]).to(model.device, dtype)
+                features.append(model.embed_audio(batch))
+        self.batches += 1
+        self.windows += len(mels)
+        return torch.cat(features)
+
+    def decode_with_fallback(self, model, features, language, task, prompt, temperatures, vocabulary=None):
+        """Decode a batch of encoder outputs, re-decoding failed windows at higher temperature
+
+        vocabulary is the VocabularyTokens of a profile or None.
+        """
+        results = [None] * len(features)
+        remaining = list(range(len(features)))
+        for temperature in temperatures:
+            options = whisper.DecodingOptions(
+                task=task,
+                language=language,
+                temperature=temperature,
+                best_of=5 if temperature > 0 else None,
+                prompt=prompt,
+                fp16=features.dtype == torch.float16,
+            )
+            with torch.no_grad():
+                if options.best_of and len(remaining) > 1:
+                    # Neuere whisper-Versionen wiederholen die Encoder-Ausgabe für best_of nicht mehr,
+                    # das passt nur bei einem Fenster pro Aufruf (Broadcast)
+                    decoded = [decode_windows(model, features[index], options, vocabulary) for index in remaining]
+                else:
+                    decoded = decode_windows(model, features[remaining], options, vocabulary)
+            retry = []
+            for index, result in zip(remaining, decoded):
+                results[index] = result
+                failed = result.compression_ratio > 2.4 or result.avg_logprob < -1.0
+                if failed and not is_no_speech(result):
+                    retry.append(index)
+            remaining = retry
+            if not remaining:
+                break
+        return results
+
+    def run_batched(self, model, requests, started):
+        """Transcribe short requests together: one encoder batch, one decoder batch per option set"""
+        if self.tokenizer is None:
+            self.tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual,
+                                                            num_languages=model.num_languages)
+        
+        # Jede Anfrage an Stille-Stellen in Fenster zerlegen, die in die 30 s des Encoders passen
+        windows = []
+        for request in requests:
+            for chunk in self.split_windows(request.audio):
+                windows.append((request, chunk))
+        cached_before = self.feature_cache.hits
+        mels = [self.window_mel(model, request.audio[chunk["start"]:chunk["end"]]) for request, chunk in windows]
+        features = self.encode(model, mels)
+        
+        # Fenster mit gleichen Dekodier-Optionen gemeinsam durch den Decoder schicken
+        groups = {}
+        for index, (request, _) in enumerate(windows):
+            temperature = request.options.get("temperature", TEMPERATURE_FALLBACK)
+            temperatures = tuple(temperature) if isinstance(temperature, (list, tuple)) else (temperature,)
+            key = (request.options.get("language"), request.options.get("task", "transcribe"),
+                   request.options.get("initial_prompt"), temperatures, request.options.get("vocabulary"))
+            groups.setdefault(key, []).append(index)
+        decoded = [None] * len(windows)
+        for (language, task, prompt, temperatures, vocabulary), indices in groups.items():
+            results = self.decode_with_fallback(model, features[indices], language, task, prompt, temperatures,
+                                                vocabulary.tokens(self.tokenizer) if vocabulary else None)
+            for index, result in zip(indices, results):
+                decoded[index] = result
+        
+        finished = time.perf_counter()
+        for request in requests:
+            segments = []
+            languages = Counter()
+            for (window_request, chunk), result in zip(windows, decoded):
+                if window_request is not request:
+                    continue
+                languages[result.language] += 1
+                if is_no_speech(result):
+                    continue
+                segments.extend(decode_segments(
+                    self.tokenizer, result,
+                    offset=chunk["start"] / WHISPER_SAMPLE_RATE,
+                    duration=(chunk["end"] - chunk["start"]) / WHISPER_SAMPLE_RATE,
+                    seek=chunk["start"] // whisper.audio.HOP_LENGTH,
+                ))
+            for number, segment in enumerate(segments):
+                segment["id"] = number
+            
+            result = {
+                "text": "".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "language": request.options.get("language") or (languages.most_common(1)[0][0] if languages else None),
+                "timing": {"queue_wait": started - request.submitted, "inference": finished - started,
+                           "batch_windows": len(windows),
+                           "feature_cache_hits": self.feature_cache.hits - cached_before},
+            }
+            if request.detection:
+                result["language_detection"] = request.detection
+            request.future.set_result(result)
+
+
+ENGINES = {}
+ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(model_name, device=None, precision="fp32", download_root=None):
+    """Shared inference engine per model, so all callers serialize on one model instance"""
+    key = MODEL_POOL.make_key(model_name, device, precision)
+    with ENGINES_LOCK:
+        engine = ENGINES.get(key)
+        if engine is None:
+            engine = ENGINES[key] = InferenceEngine(model_name, device, precision, download_root)
+    return engine
+
+
+def write_outputs(result, stem, output_dir, formats):
+    """Write txt/json/srt/... files with whisper's result writers"""
+    from whisper.utils import get_writer
+    
+    writer_options = {"max_line_width": None, "max_line_count": None, "highlight_words": False}
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for fmt in formats:
+        writer = get_writer(fmt, output_dir)
+        writer(result, stem + ".wav", writer_options)
+        outputs.append(os.path.join(output_dir, f"{stem}.{fmt}"))
+    return outputs
@@ -0,0 +1,416 @@
+"""Multichannel meeting capture with one transcriber per speaker"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from whisper_common import (
+    CAPTURE_SAMPLE_RATE, default_cache_dir, find_quiet_point, load_audio_file, sd, to_whisper_audio, wav,
+    whisper, WHISPER_SAMPLE_RATE,
+)
+from whisper_core import (
+    AUTO_LANGUAGE, CAPTURE_BLOCK_SECONDS, CAPTURE_MAX_SECONDS, CaptureBuffer, get_engine,
+    normalize_segment_text, SCHEDULER, SEGMENT_WRITERS, TRACER, transcribe_with_vad, vocabulary_profile,
+)
+
+
+# Mehrkanal-Aufnahme: Stückgröße je Kanal, Suchbereich für den Schnitt an einer leisen Stelle (Sekunden),
+# Anteil zeitlicher Überlappung, ab dem gleicher Text zweier Kanäle als Übersprechen gilt
+MEETING_CHUNK_SECONDS = 30.0
+MEETING_SEARCH_SECONDS = 5.0
+MEETING_BLEED_OVERLAP = 0.5
+
+
+# Mehrkanal-Aufnahme: ein Mikrofon je Teilnehmer, jeder Kanal mit eigener VAD und Transkription
+def parse_device_spec(spec):
+    """'DEVICE[:CHANNELS]' -> (device, channels); DEVICE is a PortAudio index or a name"""
+    device, separator, channels = spec.rpartition(":")
+    if not separator or not channels.isdigit():
+        device, channels = spec, "1"
+    return (int(device) if device.isdigit() else device), int(channels)
+
+
+class MultiCapture:
+    """Records several input devices, all channels each, against one session clock
+
+    Every device gets its own CaptureBuffer and InputStream. The first callback of a
+    stream fixes where the device's first frame lies on the session clock, so channels
+    of different devices line up to within one callback block; the channels of one
+    multichannel interface share its sample clock anyway. Drift between separate
+    devices over long sessions is not corrected.
+    """
+
+    def __init__(self, devices, rate=CAPTURE_SAMPLE_RATE, max_seconds=CAPTURE_MAX_SECONDS):
+        self.devices = devices
+        self.rate = rate
+        self.buffers = [CaptureBuffer(rate, channels=channels, max_seconds=max_seconds) for _, channels in devices]
+        # Sekunden vom Sitzungsstart bis zum ersten Frame jedes Geräts
+        self.offsets = [None] * len(devices)
+        self.streams = []
+        self.started = None
+
+    def callback(self, index):
+        buffer = self.buffers[index]
+        
+        def callback(indata, frames, time_info, status):
+            if self.offsets[index] is None:
+                self.offsets[index] = max(0.0, time.perf_counter() - self.started - frames / self.rate)
+            buffer.write(indata, status)
+        
+        return callback
+
+    def start(self):
+        self.started = time.perf_counter()
+        for index, (device, channels) in enumerate(self.devices):
+            stream = sd.InputStream(device=device, samplerate=self.rate, channels=channels, dtype="int16",
+                                    callback=SCHEDULER.capture_callback(self.callback(index)))
+            stream.start()
+            self.streams.append(stream)
+
+    def reserve(self):
+        for buffer in self.buffers:
+            buffer.reserve()
+
+    def stop(self):
+        for stream in self.streams:
+            stream.stop()
+            stream.close()
+        self.streams = []
+
+    def sources(self):
+        """(buffer, column, offset) for every captured channel, in device order"""
+        return [(buffer, column, lambda index=index: self.offsets[index] or 0.0)
+                for index, buffer in enumerate(self.buffers) for column in range(buffer.channels)]
+
+    def stats(self):
+        return [dict(buffer.stats(), device=device) for (device, _), buffer in zip(self.devices, self.buffers)]
+
+
+class ChannelTranscriber:
+    """VAD and transcription of one meeting channel, piece by piece as its audio arrives
+
+    Pieces of about chunk_seconds are cut at quiet points and handed to the executor;
+    all channels' pieces reach the shared engine concurrently and are batched there.
+    Results are collected in order, so done_until (session seconds) only moves forward.
+    """
+
+    def __init__(self, speaker, buffer, column, offset, engine, executor, options,
+                 chunk_seconds=MEETING_CHUNK_SECONDS, search_seconds=MEETING_SEARCH_SECONDS):
+        self.speaker = speaker
+        self.buffer = buffer
+        self.column = column
+        self.offset = offset
+        self.engine = engine
+        self.executor = executor
+        self.options = dict(options)
+        self.options_lock = threading.Lock()
+        self.chunk_seconds = chunk_seconds
+        self.search_seconds = search_seconds
+        self.position = 0  # Frames des Puffers, die schon an die Transkription gingen
+        self.pending = deque()
+        self.done_until = 0.0
+        self.lost_frames = 0
+        self.pieces = 0
+        self.speech_seconds = 0.0
+        self.busy = 0.0
+        self.lags = []
+
+    def poll(self, final=False):
+        """Hand out every complete piece; with final also the rest of the recording"""
+        rate = self.buffer.rate
+        piece_frames = int((self.chunk_seconds + self.search_seconds) * rate)
+        while True:
+            if self.buffer.oldest() > self.position:
+                # Der Ringpuffer war schneller als die Transkription
+                self.lost_frames += self.buffer.oldest() - self.position
+                self.position = self.buffer.oldest()
+            available = self.buffer.written - self.position
+            if available <= 0 or (available < piece_frames and not final):
+                return
+            end = self.position + min(available, piece_frames)
+            audio = to_whisper_audio(self.buffer.read(self.position, end)[:, self.column], rate)
+            if end < self.buffer.written:
+                search = int(2 * self.search_seconds * WHISPER_SAMPLE_RATE)
+                audio = audio[:find_quiet_point(audio, len(audio) - search, len(audio)) or len(audio)]
+            start = self.offset() + self.position / rate
+            duration = len(audio) / WHISPER_SAMPLE_RATE
+            self.position += max(1, int(round(len(audio) * rate / WHISPER_SAMPLE_RATE)))
+            # Jedes Stück bekommt eine eigene Kopie, die Worker schreiben nur unter dem Lock zurück
+            with self.options_lock:
+                options = dict(self.options)
+            future = self.executor.submit(TRACER.bind(self.transcribe), audio, start, time.perf_counter(), options)
+            self.pending.append((start + duration, future))
+
+    def transcribe(self, audio, start, ready, options):
+        """Worker: VAD plus transcription of one piece, segments on the session timeline"""
+        began = time.perf_counter()
+        result = transcribe_with_vad(self.engine, audio, **options)
+        # Erkannte Sprache für die weiteren Stücke dieses Kanals übernehmen, nur die erste zählt
+        if "language_detection" in result:
+            with self.options_lock:
+                if self.options.get("language") == AUTO_LANGUAGE:
+                    self.options["language"] = result["language"]
+        finished = time.perf_counter()
+        segments = []
+        for segment in result["segments"]:
+            segment = dict(segment, speaker=self.speaker, start=segment["start"] + start,
+                           end=segment["end"] + start)
+            if "words" in segment:
+                segment["words"] = [dict(word, start=word["start"] + start, end=word["end"] + start)
+                                    for word in segment["words"]]
+            segments.append(segment)
+        return segments, result["vad"]["speech_seconds"], finished - began, finished - ready
+
+    def collect(self, wait=False):
+        """Segments of the pieces finished so far, in order; wait blocks for all of them"""
+        segments = []
+        while self.pending and (wait or self.pending[0][1].done()):
+            end, future = self.pending.popleft()
+            piece, speech_seconds, busy, lag = future.result()
+            segments += piece
+            self.pieces += 1
+            self.speech_seconds += speech_seconds
+            self.busy += busy
+            self.lags.append(lag)
+            self.done_until = end
+        return segments
+
+    def stats(self):
+        audio_seconds = self.buffer.written / self.buffer.rate
+        return {
+            "speaker": self.speaker,
+            "audio_seconds": audio_seconds,
+            "speech_seconds": self.speech_seconds,
+            "pieces": self.pieces,
+            "busy": self.busy,
+            # Audio-Sekunden je Sekunde Rechenzeit dieses Kanals
+            "throughput": audio_seconds / self.busy if self.busy else 0.0,
+            "lag_mean": float(np.mean(self.lags)) if self.lags else 0.0,
+            "lag_max": max(self.lags, default=0.0),
+            "behind": max(0.0, self.offset() + audio_seconds - self.done_until),
+            "lost_seconds": self.lost_frames / self.buffer.rate,
+        }
+
+
+class MeetingTranscript:
+    """Merges the channels' segments into one time-ordered, speaker-labelled transcript
+
+    A segment is written once every channel has been transcribed past its start, so the
+    files grow in order during the meeting. The same words picked up by two mics at the
+    same time (cross-talk) are kept only for the channel that decoded them more
+    confidently.
+    """
+
+    def __init__(self, writers, bleed_overlap=MEETING_BLEED_OVERLAP):
+        self.writers = writers
+        self.bleed_overlap = bleed_overlap
+        self.pending = []
+        self.recent = deque(maxlen=32)
+        self.count = 0
+        self.dropped = 0
+        self.lines = []
+
+    def add(self, segments):
+        self.pending += segments
+
+    def is_bleed(self, segment, candidates):
+        text = normalize_segment_text(segment["text"])
+        if not text:
+            return False
+        for other in candidates:
+            if other is segment or other["speaker"] == segment["speaker"] \
+                    or normalize_segment_text(other["text"]) != text:
+                continue
+            overlap = min(segment["end"], other["end"]) - max(segment["start"], other["start"])
+            shorter = min(segment["end"] - segment["start"], other["end"] - other["start"])
+            if overlap < self.bleed_overlap * shorter:
+                continue
+            # Bereits geschriebene Segmente gewinnen immer, sonst das sicherere
+            if other in self.recent or other.get("avg_logprob", 0.0) > segment.get("avg_logprob", 0.0):
+                return True
+        return False
+
+    def flush(self, until=float("inf")):
+        """Write every segment that starts before until; returns the new transcript lines"""
+        ready = sorted((segment for segment in self.pending if segment["start"] < until),
+                       key=lambda segment: (segment["start"], segment["speaker"]))
+        self.pending = [segment for segment in self.pending if segment["start"] >= until]
+        lines = []
+        for segment in ready:
+            if self.is_bleed(segment, ready + list(self.recent)):
+                self.dropped += 1
+                continue
+            segment["id"] = self.count
+            self.count += 1
+            for writer in self.writers:
+                writer.write(segment)
+            self.recent.append(segment)
+            lines.append(f"[{whisper.utils.format_timestamp(segment['start'])}] "
+                         f"{segment['speaker']}: {segment['text'].strip()}")
+        self.lines += lines
+        return lines
+
+    def close(self, summary):
+        self.flush()
+        for writer in self.writers:
+            writer.close(summary)
+
+
+class MeetingSession:
+    """Per-channel transcription of a multichannel recording into one merged transcript"""
+
+    def __init__(self, sources, speakers, engine, options, writers=(), workers=None,
+                 chunk_seconds=MEETING_CHUNK_SECONDS):
+        self.workers = workers or len(sources)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="channel")
+        self.channels = [ChannelTranscriber(speaker, buffer, column, offset, engine, self.executor, options,
+                                            chunk_seconds)
+                         for speaker, (buffer, column, offset) in zip(speakers, sources)]
+        self.transcript = MeetingTranscript(list(writers))
+        self.started = time.perf_counter()
+
+    def step(self, final=False):
+        """Hand out new pieces, merge finished ones; returns the new transcript lines"""
+        for channel in self.channels:
+            channel.poll(final)
+        for channel in self.channels:
+            self.transcript.add(channel.collect(wait=final))
+        if final:
+            return self.transcript.flush()
+        return self.transcript.flush(min(channel.done_until for channel in self.channels))
+
+    def finish(self):
+        lines = self.step(final=True)
+        self.executor.shutdown()
+        self.transcript.close({"channels": self.stats(), "cross_talk_dropped": self.transcript.dropped})
+        return lines
+
+    def stats(self):
+        return [channel.stats() for channel in self.channels]
+
+
+def format_meeting_stats(stats):
+    """Per-channel throughput and lag as a small table"""
+    lines = [f"{'channel':<12} {'audio':>8} {'speech':>8} {'busy':>7} {'x RT':>6} "
+             f"{'lag avg':>8} {'lag max':>8} {'behind':>7}"]
+    for channel in stats:
+        lines.append(f"{channel['speaker'][:12]:<12} {channel['audio_seconds']:7.1f}s {channel['speech_seconds']:7.1f}s "
+                     f"{channel['busy']:6.1f}s {channel['throughput']:6.1f} {channel['lag_mean']:7.2f}s "
+                     f"{channel['lag_max']:7.2f}s {channel['behind']:6.1f}s")
+        if channel["lost_seconds"]:
+            lines[-1] += f"  ({channel['lost_seconds']:.1f} s lost)"
+    return "\n".join(lines)
+
+
+def meeting_file_sources(paths, realtime=False):
+    """Capture buffers played from files instead of devices, plus the thread filling them
+
+    One multichannel WAV gives one channel per speaker, several files one speaker each.
+    With realtime the files are fed at recording pace, so lag figures mean the same as
+    for a live meeting.
+    """
+    inputs = []
+    for path in paths:
+        if path.lower().endswith(".wav"):
+            rate, samples = wav.read(path)
+        else:
+            rate, samples = WHISPER_SAMPLE_RATE, load_audio_file(path)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        buffer = CaptureBuffer(rate, channels=samples.shape[1], dtype=samples.dtype,
+                               max_seconds=len(samples) / rate + 2 * CAPTURE_BLOCK_SECONDS)
+        inputs.append((buffer, samples))
+    
+    def play(block_seconds=0.1):
+        started = time.perf_counter()
+        position = 0.0
+        while any(buffer.written < len(samples) for buffer, samples in inputs):
+            position = position + block_seconds if realtime else float("inf")
+            for buffer, samples in inputs:
+                buffer.write(samples[buffer.written:int(min(position * buffer.rate, len(samples)))])
+                buffer.reserve()
+            if realtime:
+                time.sleep(max(0.0, started + position - time.perf_counter()))
+    
+    player = threading.Thread(target=play, daemon=True)
+    sources = [(buffer, column, lambda: 0.0) for buffer, samples in inputs for column in range(buffer.channels)]
+    return sources, player
+
+
+def run_meeting(args):
+    """Record (or replay) one channel per speaker and write the merged transcript"""
+    if args.list_devices:
+        print(sd.query_devices())
+        return 0
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in SEGMENT_WRITERS]
+    if unknown:
+        print(f"Unknown output format: {', '.join(unknown)} (meetings support {', '.join(SEGMENT_WRITERS)})")
+        return 1
+    
+    options = {"language": args.language, "fp16": False}
+    if args.vocabulary:
+        options["vocabulary"] = vocabulary_profile(args.vocabulary)
+        if options["vocabulary"] is None:
+            return 1
+    
+    capture = player = None
+    if args.inputs:
+        sources, player = meeting_file_sources(args.inputs, args.realtime)
+    else:
+        devices = [parse_device_spec(spec) for spec in args.device] or [(None, args.channels)]
+        capture = MultiCapture(devices, args.rate)
+        sources = capture.sources()
+    speakers = [name.strip() for name in args.speakers.split(",")] if args.speakers else []
+    speakers += [f"Speaker {index + 1}" for index in range(len(speakers), len(sources))]
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    stem = time.strftime("meeting-%Y%m%d-%H%M%S")
+    writers = [SEGMENT_WRITERS[fmt](os.path.join(args.output_dir, f"{stem}.{fmt}")) for fmt in formats]
+    engine = get_engine(args.model, precision=args.precision, download_root=args.model_dir or default_cache_dir())
+    session = MeetingSession(sources, speakers[:len(sources)], engine, options, writers, args.workers,
+                             args.chunk_seconds)
+    print(f"{len(sources)} channels: {', '.join(speakers[:len(sources)])} "
+          f"({session.workers} workers, {args.chunk_seconds:g} s pieces)")
+    
+    started = last_report = time.perf_counter()
+    try:
+        if capture is not None:
+            capture.start()
+            print("Recording, Ctrl+C to stop")
+        else:
+            player.start()
+        while True:
+            if capture is not None:
+                capture.reserve()
+            for line in session.step():
+                print(line)
+            now = time.perf_counter()
+            if player is not None and not player.is_alive():
+                break
+            if args.seconds and now - started >= args.seconds:
+                break
+            if now - last_report >= args.report_seconds:
+                print(format_meeting_stats(session.stats()))
+                last_report = now
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        if capture is not None:
+            capture.stop()
+    
+    for line in session.finish():
+        print(line)
+    if capture is not None:
+        for stats in capture.stats():
+            print(f"Device {stats['device'] if stats['device'] is not None else 'default'}: "
+                  f"{stats['seconds']:.1f} s, {stats['xruns']} xruns")
+    print(format_meeting_stats(session.stats()))
+    if session.transcript.dropped:
+        print(f"{session.transcript.dropped} cross-talk segments dropped")
+    print("Transcript: " + ", ".join(writer.path for writer in writers))
+    return 0
@@ -0,0 +1,478 @@
+"""HTTP/WebSocket transcription server and its test client"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+import numpy as np
+
+from whisper_common import (
+    default_cache_dir, load_audio_file, load_client_audio, to_whisper_audio, wav, WHISPER_SAMPLE_RATE,
+)
+from whisper_core import get_engine, LiveTranscriber, MODEL_POOL, TRACER
+
+
+# Server: gleichzeitige Inferenzen, wartende Anfragen bevor mit 503 abgelehnt wird, Upload-Grenze,
+# größte WebSocket-Nachricht (ein PCM-Block des Clients ist weit kleiner)
+SERVER_MAX_CONCURRENT = 2
+SERVER_MAX_QUEUE = 16
+SERVER_MAX_UPLOAD_MB = 200
+SERVER_MAX_MESSAGE_MB = 16
+SERVER_MAX_STREAM_SECONDS = 3600
+
+
+# Transkriptions-Server (HTTP + WebSocket) und Test-Client
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+HTTP_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 411: "Length Required",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class MessageTooBig(Exception):
+    pass
+
+
+def websocket_accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def websocket_frame(opcode, payload, mask=False):
+    """Encode one WebSocket frame; clients must mask, servers must not"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 65536:
+        header.append(mask_bit | 126)
+        header += length.to_bytes(2, "big")
+    else:
+        header.append(mask_bit | 127)
+        header += length.to_bytes(8, "big")
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = (np.frombuffer(payload, np.uint8) ^ np.resize(np.frombuffer(key, np.uint8), length)).tobytes()
+    return bytes(header) + payload
+
+
+async def read_websocket_message(reader, writer=None, max_size=None):
+    """Read one complete message (opcode, payload), answering pings on the way
+
+    With max_size, a message whose frames announce more bytes than that raises
+    MessageTooBig before the payload is read.
+    """
+    message = bytearray()
+    message_opcode = None
+    while True:
+        first, second = await reader.readexactly(2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), "big")
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), "big")
+        if max_size is not None and len(message) + length > max_size:
+            raise MessageTooBig(f"message larger than {max_size} bytes")
+        key = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if key:
+            payload = (np.frombuffer(payload, np.uint8) ^ np.resize(np.frombuffer(key, np.uint8), length)).tobytes()
+        
+        if opcode == 0x9 and writer is not None:  # Ping
+            writer.write(websocket_frame(0xA, payload))
+            continue
+        if opcode == 0xA:  # Pong
+            continue
+        if opcode == 0x8:  # Close
+            return opcode, payload
+        if opcode != 0x0:
+            message_opcode = opcode
+        message += payload
+        if first & 0x80:  # FIN
+            return message_opcode, bytes(message)
+
+
+def http_response(status, body, content_type="application/json", extra_headers=None):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    headers = [f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}",
+               f"Content-Type: {content_type}",
+               f"Content-Length: {len(body)}",
+               "Connection: close"]
+    headers += extra_headers or []
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def decode_upload(body, params):
+    """Uploaded audio to 16 kHz float32: raw PCM, WAV, or anything FFmpeg can read"""
+    if params.get("format") == "pcm16":
+        samples = np.frombuffer(body, dtype="<i2")
+        return to_whisper_audio(samples, int(params.get("rate", WHISPER_SAMPLE_RATE)))
+    if body[:4] == b"RIFF":
+        import io
+        rate, samples = wav.read(io.BytesIO(body))
+        return to_whisper_audio(samples, rate)
+    
+    # Andere Formate über FFmpeg aus einer temporären Datei
+    fd, path = tempfile.mkstemp(suffix=params.get("ext", ".bin"))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        return load_audio_file(path)
+    finally:
+        os.remove(path)
+
+
+class ServerMetrics:
+    """Per-request latency figures of the transcription server"""
+
+    def __init__(self, history=1000):
+        self.history = deque(maxlen=history)
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.waiting = 0
+
+    def record(self, kind, queue_wait, inference, total, audio_seconds):
+        self.requests += 1
+        self.history.append({"kind": kind, "queue_wait": queue_wait, "inference": inference,
+                             "total": total, "audio_seconds": audio_seconds})
+
+    def summary(self):
+        summary = {"requests": self.requests, "rejected": self.rejected, "errors": self.errors,
+                   "in_flight": self.in_flight, "waiting": self.waiting}
+        if self.history:
+            for field in ("queue_wait", "inference", "total"):
+                values = np.array([entry[field] for entry in self.history])
+                summary[field] = {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+                                  "max": float(values.max())}
+            audio = sum(entry["audio_seconds"] for entry in self.history)
+            inference = sum(entry["inference"] for entry in self.history)
+            summary["rtf"] = inference / audio if audio else 0.0
+        return summary
+
+
+class TranscriptionServer:
+    """asyncio HTTP/WebSocket front end for the shared inference engines"""
+
+    def __init__(self, model_name, download_root, max_concurrent=SERVER_MAX_CONCURRENT,
+                 max_queue=SERVER_MAX_QUEUE, max_upload_mb=SERVER_MAX_UPLOAD_MB,
+                 max_message_mb=SERVER_MAX_MESSAGE_MB, models=()):
+        self.model_name = model_name
+        # Nur vorab geladene Modelle: ?model= darf weder Downloads noch beliebige Dateien auslösen
+        self.models = {model_name, *models}
+        self.download_root = download_root
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_upload = max_upload_mb * 1024 * 1024
+        self.max_message = max_message_mb * 1024 * 1024
+        self.metrics = ServerMetrics()
+        self.semaphore = None
+
+    async def serve(self, host, port):
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port} (model {self.model_name}, "
+              f"{self.max_concurrent} concurrent, queue {self.max_queue})")
+        async with server:
+            await server.serve_forever()
+
+    async def run_inference(self, function, *args):
+        """Run blocking inference in a thread with bounded concurrency; returns (result, queue_wait, inference)"""
+        # Gegendruck: zu viele wartende Anfragen werden sofort abgelehnt statt unbegrenzt zu puffern
+        if self.metrics.waiting >= self.max_queue:
+            self.metrics.rejected += 1
+            raise ServerBusy()
+        loop = asyncio.get_running_loop()
+        queued = loop.time()
+        self.metrics.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.metrics.waiting -= 1
+        started = loop.time()
+        self.metrics.in_flight += 1
+        try:
+            result = await loop.run_in_executor(None, function, *args)
+        finally:
+            self.metrics.in_flight -= 1
+            self.semaphore.release()
+        return result, started - queued, loop.time() - started
+
+    async def handle_connection(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            path, _, query = target.partition("?")
+            params = dict(urllib.parse.parse_qsl(query))
+            
+            if path == "/health":
+                writer.write(http_response(200, {"status": "ok", "models": MODEL_POOL.stats()["models"]}))
+            elif path == "/metrics":
+                writer.write(http_response(200, self.metrics.summary()))
+            elif path == "/transcribe" and method == "POST":
+                await self.handle_upload(reader, writer, headers, params)
+            elif path == "/stream" and headers.get("upgrade", "").lower() == "websocket":
+                await self.handle_stream(reader, writer, headers, params)
+            else:
+                writer.write(http_response(404, {"error": f"unknown endpoint {method} {path}"}))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Server error: {e}")
+        finally:
+            writer.close()
+
+    def request_options(self, params):
+        model_name = params.get("model", self.model_name)
+        if model_name not in self.models:
+            raise BadRequest(f"unknown model {model_name}, available: {', '.join(sorted(self.models))}")
+        options = {"fp16": False}
+        if params.get("language"):
+            options["language"] = params["language"]
+        return model_name, options
+
+    async def handle_upload(self, reader, writer, headers, params):
+        received = time.perf_counter()
+        if "content-length" not in headers:
+            writer.write(http_response(411, {"error": "Content-Length required"}))
+            return
+        length = headers["content-length"]
+        if not length.isdigit():
+            writer.write(http_response(400, {"error": f"invalid Content-Length {length}"}))
+            return
+        length = int(length)
+        if length > self.max_upload:
+            writer.write(http_response(413, {"error": f"upload larger than {self.max_upload} bytes"}))
+            return
+        try:
+            model_name, options = self.request_options(params)
+        except BadRequest as e:
+            writer.write(http_response(400, {"error": str(e)}))
+            return
+        body = await reader.readexactly(length)
+        
+        try:
+            audio = await asyncio.get_running_loop().run_in_executor(None, decode_upload, body, params)
+            engine = get_engine(model_name, download_root=self.download_root)
+            job = TRACER.new_job("upload", model=model_name, audio_seconds=len(audio) / WHISPER_SAMPLE_RATE)
+            result, queue_wait, inference = await self.run_inference(
+                TRACER.bind(lambda: engine.transcribe(audio, **options), job))
+        except ServerBusy:
+            writer.write(http_response(503, {"error": "server busy"}, extra_headers=["Retry-After: 1"]))
+            return
+        except Exception as e:
+            self.metrics.errors += 1
+            writer.write(http_response(500, {"error": f"{type(e).__name__}: {e}"}))
+            return
+        
+        total = time.perf_counter() - received
+        audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+        self.metrics.record("upload", queue_wait, inference, total, audio_seconds)
+        result["metrics"] = {"queue_wait": queue_wait, "inference": inference, "total": total,
+                             "audio_seconds": audio_seconds}
+        writer.write(http_response(200, result))
+
+    async def handle_stream(self, reader, writer, headers, params):
+        """WebSocket: int16 PCM chunks in, partial (live) and final transcripts out"""
+        try:
+            model_name, options = self.request_options(params)
+        except BadRequest as e:
+            writer.write(http_response(400, {"error": str(e)}))
+            return
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {websocket_accept_key(headers.get('sec-websocket-key', ''))}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        
+        received = time.perf_counter()
+        rate = int(params.get("rate", WHISPER_SAMPLE_RATE))
+        live = params.get("live", "1") != "0"
+        engine = get_engine(model_name, download_root=self.download_root)
+        transcriber = LiveTranscriber(engine, language=options.get("language"))
+        # Empfangene PCM-Blöcke ab first_sample; bestätigte Blöcke werden freigegeben
+        blocks = deque()
+        first_sample = 0
+        samples = 0
+        queue_wait = inference = 0.0
+        close = b""
+        
+        async def send(message):
+            writer.write(websocket_frame(0x1, json.dumps(message)))
+            await writer.drain()
+        
+        async def step(final):
+            nonlocal queue_wait, inference, first_sample
+            start = int(transcriber.committed_time * rate)
+            while blocks and first_sample + len(blocks[0]) <= start:
+                first_sample += len(blocks.popleft())
+            # Nur ab dem bestätigten Punkt lesen; beim Abschluss braucht jeder Schritt höchstens ein Fenster
+            end = start + int(transcriber.window_seconds * rate) if final else samples
+            pieces = []
+            position = first_sample
+            for block in blocks:
+                if position >= end:
+                    break
+                pieces.append(block)
+                position += len(block)
+            pcm = np.concatenate(pieces) if pieces else np.zeros(0, np.int16)
+            audio = to_whisper_audio(pcm[start - first_sample:end - first_sample], rate)
+            _, waited, took = await self.run_inference(transcriber.step, audio, final)
+            queue_wait += waited
+            inference += took
+        
+        try:
+            while True:
+                opcode, payload = await read_websocket_message(reader, writer, self.max_message)
+                if opcode == 0x8:
+                    return
+                if opcode == 0x2:
+                    if samples + len(payload) // 2 > SERVER_MAX_STREAM_SECONDS * rate:
+                        await send({"type": "error", "error": "stream too long"})
+                        return
+                    blocks.append(np.frombuffer(payload, dtype="<i2"))
+                    samples += len(payload) // 2
+                    # Die nächste Nachricht wird erst nach dem Live-Schritt gelesen (TCP-Gegendruck)
+                    if live and transcriber.ready(samples / rate):
+                        await step(final=False)
+                        await send({"type": "partial", "committed": transcriber.committed_text(),
+                                    "tentative": transcriber.tentative_text()})
+                elif opcode == 0x1 and json.loads(payload).get("type") == "end":
+                    break
+            
+            while transcriber.committed_time < samples / rate - 0.1:
+                await step(final=True)
+            total = time.perf_counter() - received
+            audio_seconds = samples / rate
+            self.metrics.record("stream", queue_wait, inference, total, audio_seconds)
+            await send({
+                "type": "final",
+                "text": transcriber.committed_text(),
+                "segments": transcriber.committed,
+                "metrics": {"queue_wait": queue_wait, "inference": inference, "total": total,
+                            "audio_seconds": audio_seconds},
+            })
+        except MessageTooBig as e:
+            # 1009: Nachricht zu groß; die Nutzdaten wurden nicht gelesen, die Verbindung ist damit unbrauchbar
+            close = (1009).to_bytes(2, "big") + str(e).encode("utf-8")
+        except ServerBusy:
+            await send({"type": "error", "error": "server busy"})
+        except Exception as e:
+            self.metrics.errors += 1
+            await send({"type": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            writer.write(websocket_frame(0x8, close))
+
+
+def run_server(args):
+    download_root = args.model_dir or default_cache_dir()
+    # Modelle warm halten: beim Start laden, danach hält sie der Pool im Speicher
+    models = {args.model, *(name.strip() for name in args.preload.split(",") if name.strip())}
+    for model_name in models:
+        MODEL_POOL.preload(model_name, download_root=download_root)
+    server = TranscriptionServer(args.model, download_root, args.max_concurrent, args.max_queue, args.max_upload_mb,
+                                 args.max_message_mb, models=models)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+    return 0
+
+
+async def stream_to_server(url, audio, chunk_seconds, realtime, live, language=None):
+    """Send audio as int16 PCM over the WebSocket endpoint and print the replies"""
+    parsed = urllib.parse.urlsplit(url)
+    query = {"rate": str(WHISPER_SAMPLE_RATE), "live": "1" if live else "0"}
+    if language:
+        query["language"] = language
+    reader, writer = await asyncio.open_connection(parsed.hostname, parsed.port or 80)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((
+        f"GET {parsed.path or '/stream'}?{urllib.parse.urlencode(query)} HTTP/1.1\r\n"
+        f"Host: {parsed.netloc}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    ).encode("latin-1"))
+    head = await reader.readuntil(b"\r\n\r\n")
+    if b" 101 " not in head.split(b"\r\n")[0]:
+        raise ConnectionError(head.decode("latin-1"))
+    
+    async def receive():
+        while True:
+            opcode, payload = await read_websocket_message(reader)
+            if opcode == 0x8:
+                return None
+            message = json.loads(payload)
+            if message["type"] == "partial":
+                print(f"[partial] {message['committed']} | {message['tentative']}")
+            else:
+                return message
+    
+    receiver = asyncio.ensure_future(receive())
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    step = int(chunk_seconds * WHISPER_SAMPLE_RATE)
+    for start in range(0, len(pcm), step):
+        writer.write(websocket_frame(0x2, pcm[start:start + step].tobytes(), mask=True))
+        await writer.drain()
+        if realtime:
+            await asyncio.sleep(chunk_seconds)
+    writer.write(websocket_frame(0x1, json.dumps({"type": "end"}), mask=True))
+    await writer.drain()
+    result = await receiver
+    writer.close()
+    return result
+
+
+def run_client(args):
+    """Bundled test client for the server: file upload or WebSocket stream"""
+    audio = load_client_audio(args.file)
+    start = time.perf_counter()
+    if args.stream:
+        result = asyncio.run(stream_to_server(args.url.rstrip("/") + "/stream", audio, args.chunk_seconds,
+                                              args.realtime, not args.no_live, args.language))
+    else:
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        query = {"format": "pcm16", "rate": WHISPER_SAMPLE_RATE}
+        if args.language:
+            query["language"] = args.language
+        request = urllib.request.Request(f"{args.url.rstrip('/')}/transcribe?{urllib.parse.urlencode(query)}",
+                                         data=pcm, method="POST",
+                                         headers={"Content-Type": "application/octet-stream"})
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read())
+    
+    if not result or result.get("type") == "error":
+        print(f"Error: {result}")
+        return 1
+    print(result["text"].strip())
+    print(f"\nRound trip {time.perf_counter() - start:.2f} s, server metrics: {result.get('metrics')}")
+    return 0
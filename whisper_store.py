@@ -0,0 +1,328 @@
+"""Verified local model store: memory-mapped weights with a checksummed manifest"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from whisper_common import default_cache_dir, file_sha256, torch, whisper
+
+
+# Modell-Speicher: Manifest im Modellordner und dessen Formatversion
+MODEL_STORE_MANIFEST = "manifest.json"
+MODEL_STORE_FORMAT = 1
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of all linear layers (weights int8, activations quantized per call)"""
+    # quantize_dynamic erkennt nur exakt nn.Linear, whisper benutzt eine Unterklasse
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_int8_model(name, download_root=None):
+    """Quantized model from cache_dir, quantizing the fp32 checkpoint only the first time"""
+    root = download_root or default_cache_dir()
+    path = os.path.join(root, f"{name}.int8.pt")
+    if os.path.exists(path):
+        try:
+            return torch.load(path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            print(f"Cached int8 model {path} unusable ({e}), quantizing again")
+    
+    start = time.perf_counter()
+    model = quantize_int8(model_store_load(name, "fp32", "cpu", download_root))
+    print(f"Quantized {name} to int8 in {time.perf_counter() - start:.1f} s")
+    try:
+        os.makedirs(root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            torch.save(model, f)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+        # Quantisierte Module lassen sich nicht mappen: als Pickle, aber mit Größe und Prüfsumme im Manifest
+        ModelStore(root).register(name, "int8", path, "pickle")
+    except OSError as e:
+        print(f"Could not cache int8 model: {e}")
+    return model
+
+
+# Modell-Speicher: Gewichte als mmap-fähige Dateien, Manifest mit Größe, Prüfsumme und Genauigkeit
+class ModelStore:
+    """Verified local model store with memory-mapped weights
+
+    Every model/precision is one torch zip file holding the dims and the state dict in the
+    dtype the model runs in. torch.load(mmap=True) maps it instead of unpickling into fresh
+    memory, and load_state_dict(assign=True) keeps the mapped tensors as the parameters. Cold
+    loads only touch the pages that are used, and processes on one host share them through
+    the page cache. The manifest records size, sha256 and precision of each file. Loading
+    checks only the size; `models verify` checks the hashes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MODEL_STORE_MANIFEST)
+
+    def path(self, name, precision):
+        return os.path.join(self.root, f"{name}.{precision}.store.pt")
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") == MODEL_STORE_FORMAT:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"format": MODEL_STORE_FORMAT, "models": {}}
+
+    def update_manifest(self, changes):
+        """Apply {key: entry or None} to the manifest under a file lock, written atomically"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.manifest_path + ".lock", "a") as lock:
+            try:
+                import fcntl
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            except ImportError:
+                pass  # Windows: ohne Sperre, gleichzeitige Importe sind dort nicht vorgesehen
+            manifest = self.read_manifest()
+            for key, entry in changes.items():
+                if entry is None:
+                    manifest["models"].pop(key, None)
+                else:
+                    manifest["models"][key] = entry
+            fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.manifest_path)
+        return manifest
+
+    def entry(self, name, precision):
+        """Manifest entry if its file is present with the recorded size"""
+        entry = self.read_manifest()["models"].get(f"{name}.{precision}")
+        if entry is None:
+            return None
+        try:
+            if os.path.getsize(os.path.join(self.root, entry["file"])) != entry["bytes"]:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def register(self, name, precision, path, layout):
+        """Add an existing file to the manifest (hashes it once)"""
+        entry = {
+            "name": name,
+            "precision": precision,
+            "layout": layout,
+            "file": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "sha256": file_sha256(path),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.update_manifest({f"{name}.{precision}": entry})
+        return entry
+
+    def add(self, name, model, precision):
+        """Write a loaded fp32/fp16 model into the store"""
+        # Nicht-persistente Buffer (Decoder-Maske, Alignment-Heads) gehören nicht zum state_dict
+        state = model.state_dict()
+        buffers = {key: value for key, value in model.named_buffers()
+                   if key not in state and key != "alignment_heads"}
+        checkpoint = {
+            "dims": dict(vars(model.dims)),
+            "state_dict": state,
+            "buffers": buffers,
+            "alignment_heads": model.alignment_heads.to_dense(),
+        }
+        path = self.path(name, precision)
+        os.makedirs(self.root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save(checkpoint, f)
+            # mkstemp legt 0600 an; andere Benutzer bzw. Prozesse sollen die Datei mappen können
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return self.register(name, precision, path, "state_dict")
+
+    def load(self, name, precision, device="cpu"):
+        """Model from the store with memory-mapped weights, or None if it is not in the store"""
+        entry = self.entry(name, precision)
+        if entry is None or entry["layout"] != "state_dict":
+            return None
+        checkpoint = torch.load(os.path.join(self.root, entry["file"]), map_location="cpu",
+                                mmap=True, weights_only=True)
+        # Encoder und Decoder auf dem meta-Gerät anlegen: keine Zufallsinitialisierung, die gleich
+        # überschrieben würde. Whisper.__init__ selbst geht dort nicht (to_sparse hat keinen meta-Kernel).
+        dims = whisper.model.ModelDimensions(**checkpoint["dims"])
+        model = whisper.model.Whisper.__new__(whisper.model.Whisper)
+        torch.nn.Module.__init__(model)
+        model.dims = dims
+        with torch.device("meta"):
+            model.encoder = whisper.model.AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state,
+                                                       dims.n_audio_head, dims.n_audio_layer)
+            model.decoder = whisper.model.TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state,
+                                                      dims.n_text_head, dims.n_text_layer)
+        model.load_state_dict(checkpoint["state_dict"], assign=True)
+        for key, value in checkpoint["buffers"].items():
+            module_name, _, buffer_name = key.rpartition(".")
+            model.get_submodule(module_name).register_buffer(buffer_name, value, persistent=False)
+        model.register_buffer("alignment_heads", checkpoint["alignment_heads"].to_sparse(), persistent=False)
+        return model.to(device)
+
+    def prepare(self, name, precision, download_root=None):
+        """Make sure name/precision is in the store, converting the whisper checkpoint if needed"""
+        if precision == "int8":
+            if self.entry(name, "int8") is None:
+                load_int8_model(name, self.root)
+            return self.entry(name, "int8")
+        layout = "fp16" if precision == "fp16" else "fp32"
+        if self.entry(name, layout) is None:
+            start = time.perf_counter()
+            model = whisper.load_model(name, device="cpu", download_root=download_root or self.root)
+            self.add(name, model.half() if layout == "fp16" else model, layout)
+            print(f"Added {name} ({layout}) to the model store in {time.perf_counter() - start:.1f} s")
+        return self.entry(name, layout)
+
+    def verify(self):
+        """Check every entry's size and sha256; returns a list of (key, problem)"""
+        problems = []
+        manifest = self.read_manifest()
+        for key, entry in sorted(manifest["models"].items()):
+            path = os.path.join(self.root, entry["file"])
+            if not os.path.exists(path):
+                problems.append((key, "file missing"))
+            elif os.path.getsize(path) != entry["bytes"]:
+                problems.append((key, f"size {os.path.getsize(path)} != {entry['bytes']}"))
+            elif file_sha256(path) != entry["sha256"]:
+                problems.append((key, "checksum mismatch"))
+        known = {entry["file"] for entry in manifest["models"].values()}
+        for path in sorted(glob.glob(os.path.join(self.root, "*.store.pt"))):
+            if os.path.basename(path) not in known:
+                problems.append((os.path.basename(path), "not in manifest"))
+        return problems
+
+
+def model_store_load(name, precision, device, download_root=None):
+    """Load through the model store, adding the model to it on first use"""
+    layout = "fp16" if precision == "fp16" else "fp32"
+    # Pfade zu eigenen Checkpoints lädt whisper direkt, der Speicher kennt nur Modellnamen
+    if os.path.isfile(name):
+        model = whisper.load_model(name, device=device, download_root=download_root)
+        return model.half() if layout == "fp16" else model
+    store = ModelStore(download_root or default_cache_dir())
+    try:
+        model = store.load(name, layout, device)
+        if model is not None:
+            return model
+    except Exception as e:
+        print(f"Model store entry {name} ({layout}) unusable ({e}), converting again")
+    try:
+        store.prepare(name, layout, download_root)
+        model = store.load(name, layout, device)
+        if model is not None:
+            return model
+    except OSError as e:
+        print(f"Could not add {name} to the model store: {e}")
+    model = whisper.load_model(name, device=device, download_root=download_root)
+    return model.half() if layout == "fp16" else model
+
+
+def checkpoint_file(name):
+    """File name whisper downloads a model to (turbo -> large-v3-turbo.pt)"""
+    url = whisper._MODELS.get(name)
+    return os.path.basename(url) if url else f"{name}.pt"
+
+
+def run_models(args):
+    """List, import, verify or export the local model store"""
+    root = args.model_dir or default_cache_dir()
+    store = ModelStore(root)
+    precisions = [p.strip() for p in args.precisions.split(",") if p.strip()]
+    
+    if args.action == "list":
+        models = store.read_manifest()["models"]
+        for key, entry in sorted(models.items()):
+            print(f"{key:<24} {entry['layout']:<10} {entry['bytes'] / 1024 / 1024:8.0f} MB  "
+                  f"{entry['sha256'][:12]}  {entry['created']}")
+        print(f"{len(models)} entries in {root}")
+        return 0
+    
+    if args.action == "import":
+        for source in args.names:
+            if os.path.isfile(source):
+                # Checkpoint-Datei (z. B. von einem anderen Rechner): ohne Netzwerk übernehmen
+                name = args.name or os.path.splitext(os.path.basename(source))[0]
+                model = whisper.load_model(source, device="cpu")
+                for precision in precisions:
+                    if precision in ("fp32", "fp16"):
+                        store.add(name, model.half() if precision == "fp16" else model, precision)
+                    else:
+                        store.prepare(name, precision)
+            else:
+                name = source
+                if not os.path.exists(os.path.join(root, checkpoint_file(name))) and store.entry(name, "fp32") is None:
+                    print(f"{name}: {checkpoint_file(name)} is not in {root}; pass the checkpoint file to import offline")
+                    return 1
+                for precision in precisions:
+                    store.prepare(name, precision, root)
+            print(f"Imported {name} ({', '.join(precisions)})")
+    
+    problems = store.verify()
+    for key, problem in problems:
+        print(f"{key}: {problem}")
+    if problems:
+        print(f"Model store {root}: {len(problems)} problems")
+        return 1
+    if args.action != "export":
+        print(f"Model store {root}: {len(store.read_manifest()['models'])} entries verified")
+        return 0
+    
+    # Jede Datei genau einmal übernehmen, gleiche Inhalte nur als Hardlink
+    if not args.dest:
+        print("export needs --dest")
+        return 1
+    os.makedirs(args.dest, exist_ok=True)
+    manifest = store.read_manifest()
+    copied = {}
+    for key, entry in sorted(manifest["models"].items()):
+        source = os.path.join(root, entry["file"])
+        target = os.path.join(args.dest, entry["file"])
+        if os.path.exists(target) and file_sha256(target) == entry["sha256"]:
+            pass
+        elif entry["sha256"] in copied:
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(copied[entry["sha256"]], target)
+            except OSError:
+                shutil.copy2(copied[entry["sha256"]], target)
+        else:
+            print(f"Copying {entry['file']} ({entry['bytes'] / 1024 / 1024:.0f} MB)")
+            shutil.copy2(source, target)
+        copied.setdefault(entry["sha256"], target)
+    # Whisper-Checkpoints nur für Modelle, die (noch) nicht im Speicher sind
+    stored = {checkpoint_file(entry["name"]) for entry in manifest["models"].values()}
+    stored |= {entry["file"] for entry in manifest["models"].values()}
+    for path in sorted(glob.glob(os.path.join(root, "*.pt"))):
+        filename = os.path.basename(path)
+        if filename.endswith(".store.pt") or filename in stored:
+            continue
+        print(f"Copying checkpoint {filename}")
+        shutil.copy2(path, os.path.join(args.dest, filename))
+    with open(os.path.join(args.dest, MODEL_STORE_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Exported {len(manifest['models'])} entries ({len(copied)} distinct files) to {args.dest}")
+    return 0
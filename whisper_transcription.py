@@ -1,42 +1,98 @@
+import time
+# Startzeitpunkt für die Aufschlüsselung der Startzeit (siehe print_startup_timing)
+STARTUP_START = time.perf_counter()
+
+import argparse
+import json
 import os
-import subprocess
 import sys
-import whisper
-import sounddevice as sd
-import numpy as np
-import scipy.io.wavfile as wav
+import threading
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-import threading
 import pyperclip
 
-# Add FFmpeg to PATH at script startup with absolute paths
-ffmpeg_dir = r"C:\Users\lukas\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-7.1-full_build\bin"
-ffmpeg_exe = os.path.join(ffmpeg_dir, "ffmpeg.exe")
-ffprobe_exe = os.path.join(ffmpeg_dir, "ffprobe.exe")
-
-# Verify FFmpeg exists
-if not os.path.exists(ffmpeg_exe):
-    print(f"FFmpeg not found at: {ffmpeg_exe}")
-    sys.exit(1)
-
-# Set environment variables for FFmpeg
-os.environ["FFMPEG_BINARY"] = ffmpeg_exe
-os.environ["FFPROBE_BINARY"] = ffprobe_exe
+from whisper_common import (
+    CAPTURE_SAMPLE_RATE, default_cache_dir, default_result_cache_dir, FFMPEG, FFMPEG_LOOKUP_SECONDS,
+    OUTPUT_FILENAME, scipy_signal, sd, synthetic_audio, to_whisper_audio, torch, whisper, WHISPER_MODELS,
+    WHISPER_SAMPLE_RATE,
+)
+from whisper_store import ModelStore, run_models
+from whisper_core import (
+    AUTO_LANGUAGE, available_precisions, BoostTokens, CaptureBuffer, DecodingModel, default_vocabulary_path,
+    format_latency, get_engine, GUI_HEARTBEAT_MS, iter_recording_chunks, LiveTranscriber,
+    load_vocabulary_profiles, MMAP_CAPTURE_SECONDS, MmapWavRecorder, MODEL_POOL, NO_VOCABULARY, ResultCache,
+    save_wav_async, SCHEDULER, SEGMENT_WRITERS, TRACER, Tracer, transcribe_with_vad, TranscriptStream,
+    VocabularyProfile,
+)
+from whisper_ui import UiDispatcher
+from whisper_server import (
+    run_client, run_server, SERVER_MAX_CONCURRENT, SERVER_MAX_MESSAGE_MB, SERVER_MAX_QUEUE, SERVER_MAX_UPLOAD_MB,
+)
+from whisper_batch import run_batch
+from whisper_meeting import (
+    format_meeting_stats, MEETING_CHUNK_SECONDS, MeetingSession, MultiCapture, run_meeting,
+)
+from whisper_bench import run_bench, run_compare
 
-# Also add to PATH
-if ffmpeg_dir not in os.environ['PATH']:
-    os.environ['PATH'] = os.environ['PATH'] + os.pathsep + ffmpeg_dir
 
-# For whisper specifically
-os.environ["PATH"] = ffmpeg_dir + os.pathsep + os.environ["PATH"]
+# Die FFmpeg-Suche läuft beim Import von whisper_common, sie wird getrennt ausgewiesen
+STARTUP_TIMES = {"imports": time.perf_counter() - STARTUP_START - FFMPEG_LOOKUP_SECONDS,
+                 "ffmpeg lookup": FFMPEG_LOOKUP_SECONDS}
 
 # Globale Variablen
-OUTPUT_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_audio.wav")
 TRANSCRIPTION_TEXT = ""
 is_recording = False
-audio_data = []
-sample_rate = 44100
+audio_buffer = None
+sample_rate = CAPTURE_SAMPLE_RATE
+
+# Transkript der Aufnahme neben der WAV-Datei, Segment für Segment geschrieben
+TRANSCRIPT_FORMATS = ("txt", "srt", "vtt", "jsonl")
+
+# Startmessung für build_linux.py: JSON-Datei für die Zeitpunkte von Fenster und erster Transkription
+STARTUP_PROBE = os.environ.get("WHISPER_STARTUP_PROBE")
+STARTUP_PROBE_SECONDS = 5.0  # Länge des synthetischen Clips für die erste Transkription
+
+
+def import_model_stack(on_done=None):
+    """Import audio and model libraries in a background thread, the recording stack first"""
+    def worker():
+        for name, module in (("sounddevice", sd), ("scipy", scipy_signal), ("whisper/torch", whisper)):
+            start = time.perf_counter()
+            try:
+                module._import()
+            except Exception as e:
+                print(f"Importing {name} failed: {e}")
+            STARTUP_TIMES[f"import {name}"] = time.perf_counter() - start
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
+def print_startup_timing(title):
+    print(title)
+    for name, seconds in STARTUP_TIMES.items():
+        print(f"  {name:<24} {seconds * 1000:8.0f} ms")
+
+
+def write_startup_probe(path, **marks):
+    """Add wall-clock marks to the startup probe file that build_linux.py reads"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            probe = json.load(f)
+    except (OSError, ValueError):
+        probe = {}
+    # Wanduhrzeit, zu der der Interpreter dieses Modul zu laden begann (nach dem Entpacken)
+    probe.setdefault("interpreter_start", time.time() - (time.perf_counter() - STARTUP_START))
+    probe.update(marks)
+    probe["startup_times"] = dict(STARTUP_TIMES)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(probe, f, indent=2)
+    os.replace(temp_path, path)
+
 
 # GUI-Klasse
 class WhisperApp:
@@ -53,14 +109,30 @@ class WhisperApp:
                 "stop_recording": "Stop Aufnahme",
                 "copy_text": "Text kopieren",
                 "recording_started": "Aufnahme gestartet...",
-                "recording_stopped": "Aufnahme gestoppt. Speichere Datei...",
+                "recording_stopped": "Aufnahme gestoppt. Bereite Audio vor...",
                 "audio_saved": "Audio gespeichert als:",
                 "file_not_found": "Warnung: Datei wurde nicht gefunden nach dem Speichern!",
                 "transcription_started": "Transkription gestartet. Dies kann etwas dauern...",
                 "no_text": "Es gibt keinen Text zum Kopieren.",
                 "copied": "\nText wurde in die Zwischenablage kopiert!",
                 "loading_model": "Lade Modell {}...",
-                "model_loaded": "Modell geladen!"
+                "model_loaded": "Modell geladen!",
+                "model_from_pool": "Modell {} bereits geladen: {:.1f} s Ladezeit gespart ({:.0f} MB im Speicher)",
+                "save_audio": "Aufnahme als WAV speichern",
+                "live_mode": "Live-Transkription",
+                "use_vad": "Stille überspringen",
+                "vad_report": "VAD: {:.0%} Stille übersprungen, ca. {:.1f} s gespart",
+                "record_to_disk": "Direkt auf Festplatte aufnehmen",
+                "retranscribe": "Erneut transkribieren",
+                "result_from_cache": "Ergebnis aus dem Cache ({} Treffer, {} Fehlschläge, {:.1f} s gespart)",
+                "recognition_language": "Sprache:",
+                "language_detected": "Erkannte Sprache: {} ({}), Erkennung {:.2f} s",
+                "latency_panel": "Latenz",
+                "save_transcript": "Transkript speichern (SRT/VTT/JSONL)",
+                "transcript_saved": "Transkript gespeichert: {}",
+                "meeting_mode": "Besprechung (ein Kanal je Sprecher)",
+                "vocabulary": "Vokabular:",
+                "speaker": "Sprecher"
             },
             "en": {
                 "welcome": "Welcome! Start recording to begin transcription...",
@@ -68,19 +140,35 @@ class WhisperApp:
                 "stop_recording": "Stop Recording",
                 "copy_text": "Copy Text",
                 "recording_started": "Recording started...",
-                "recording_stopped": "Recording stopped. Saving file...",
+                "recording_stopped": "Recording stopped. Preparing audio...",
                 "audio_saved": "Audio saved as:",
                 "file_not_found": "Warning: File not found after saving!",
                 "transcription_started": "Transcription started. This may take a while...",
                 "no_text": "There is no text to copy.",
                 "copied": "\nText copied to clipboard!",
                 "loading_model": "Loading model {}...",
-                "model_loaded": "Model loaded!"
+                "model_loaded": "Model loaded!",
+                "model_from_pool": "Model {} already loaded: saved {:.1f} s load time ({:.0f} MB resident)",
+                "save_audio": "Save recording as WAV",
+                "live_mode": "Live transcription",
+                "use_vad": "Skip silence",
+                "vad_report": "VAD: skipped {:.0%} silence, saved about {:.1f} s",
+                "record_to_disk": "Record straight to disk",
+                "retranscribe": "Transcribe again",
+                "result_from_cache": "Result from cache ({} hits, {} misses, {:.1f} s saved)",
+                "recognition_language": "Speech:",
+                "language_detected": "Detected language: {} ({}), detection took {:.2f} s",
+                "latency_panel": "Latency",
+                "save_transcript": "Save transcript (SRT/VTT/JSONL)",
+                "transcript_saved": "Transcript saved: {}",
+                "meeting_mode": "Meeting (one channel per speaker)",
+                "vocabulary": "Vocabulary:",
+                "speaker": "Speaker"
             }
         }
 
         # Add model selection variables before creating the dropdown
-        self.whisper_models = ["tiny", "base", "small", "medium", "turbo"]
+        self.whisper_models = list(WHISPER_MODELS)
         self.selected_model = tk.StringVar(value="base")  # Default model
 
         # Add language selection frame at top
@@ -123,11 +211,21 @@ class WhisperApp:
                                    bg=self.default_color)
         self.stop_button.pack(side=tk.LEFT, padx=5)
         
+        # Transcribe the last recording again (e.g. after changing language or model)
+        self.last_source = None
+        self.retranscribe_button = tk.Button(self.control_frame, text=self.get_text("retranscribe"),
+                                             command=self.retranscribe,
+                                             state=tk.DISABLED,
+                                             bg=self.default_color)
+        self.retranscribe_button.pack(side=tk.LEFT, padx=5)
+        
         # Scrollbares Textfeld für Transkription
         self.text_area = scrolledtext.ScrolledText(root, wrap=tk.WORD, height=15)
         self.text_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         self.text_area.insert(tk.END, self.get_text("welcome") + "\n")
         self.text_area.config(state=tk.DISABLED)
+        # Alle Änderungen am Textfeld laufen über den Dispatcher, auch aus Worker-Threads
+        self.ui = UiDispatcher(root, self.text_area)
         
         # Add model selection frame
         self.model_frame = tk.Frame(root)
@@ -138,13 +236,83 @@ class WhisperApp:
         self.model_dropdown = tk.OptionMenu(self.model_frame, self.selected_model, *self.whisper_models)
         self.model_dropdown.pack(side=tk.LEFT, padx=2)
         
+        # Precision/backend: fp32, dynamic int8 quantization, bf16 where the CPU supports it
+        self.precisions = available_precisions()
+        self.selected_precision = tk.StringVar(value="fp32")
+        self.precision_dropdown = tk.OptionMenu(self.model_frame, self.selected_precision, *self.precisions)
+        self.precision_dropdown.pack(side=tk.LEFT, padx=2)
+        
+        # Recognition language, independent of the interface language ("auto" detects it per recording)
+        self.recognition_languages = [AUTO_LANGUAGE, "de", "en", "fr", "es", "it", "nl", "pl", "tr"]
+        self.recognition_lang = tk.StringVar(value=AUTO_LANGUAGE)
+        self.recognition_lang_label = tk.Label(self.model_frame, text=self.get_text("recognition_language"))
+        self.recognition_lang_label.pack(side=tk.LEFT, padx=2)
+        self.recognition_lang_dropdown = tk.OptionMenu(self.model_frame, self.recognition_lang,
+                                                       *self.recognition_languages)
+        self.recognition_lang_dropdown.pack(side=tk.LEFT, padx=2)
+        
+        # Vokabular-Profil (Fachbegriffe als Prompt und Logit-Bonus), Token werden einmal vorbereitet
+        self.vocabulary_profiles = load_vocabulary_profiles()
+        self.selected_vocabulary = tk.StringVar(value=NO_VOCABULARY)
+        self.vocabulary_label = tk.Label(self.model_frame, text=self.get_text("vocabulary"))
+        self.vocabulary_label.pack(side=tk.LEFT, padx=2)
+        self.vocabulary_dropdown = tk.OptionMenu(self.model_frame, self.selected_vocabulary,
+                                                 NO_VOCABULARY, *self.vocabulary_profiles)
+        self.vocabulary_dropdown.pack(side=tk.LEFT, padx=2)
+        
+        # Optional archive the recording as WAV (written in the background)
+        self.save_audio = tk.BooleanVar(value=True)
+        self.save_audio_check = tk.Checkbutton(self.model_frame, text=self.get_text("save_audio"),
+                                               variable=self.save_audio)
+        self.save_audio_check.pack(side=tk.LEFT, padx=10)
+        
+        # Transcribe while recording, committed text is shown normally, tentative text in grey
+        self.live_mode = tk.BooleanVar(value=False)
+        self.live_mode_check = tk.Checkbutton(self.model_frame, text=self.get_text("live_mode"),
+                                              variable=self.live_mode)
+        self.live_mode_check.pack(side=tk.LEFT, padx=2)
+        self.text_area.tag_config("tentative", foreground="grey")
+        
+        # Voice activity detection: only speech regions are sent to the model
+        self.use_vad = tk.BooleanVar(value=True)
+        self.use_vad_check = tk.Checkbutton(self.model_frame, text=self.get_text("use_vad"),
+                                            variable=self.use_vad)
+        self.use_vad_check.pack(side=tk.LEFT, padx=2)
+        
+        # Record into a memory-mapped WAV file instead of RAM (for sessions of many hours)
+        self.record_to_disk = tk.BooleanVar(value=False)
+        self.record_to_disk_check = tk.Checkbutton(self.model_frame, text=self.get_text("record_to_disk"),
+                                                   variable=self.record_to_disk)
+        self.record_to_disk_check.pack(side=tk.LEFT, padx=2)
+        
+        # Untertitel/JSON lines der Aufnahme, bei langen Aufnahmen schon während der Transkription lesbar
+        self.save_transcript = tk.BooleanVar(value=False)
+        self.save_transcript_check = tk.Checkbutton(self.model_frame, text=self.get_text("save_transcript"),
+                                                    variable=self.save_transcript)
+        self.save_transcript_check.pack(side=tk.LEFT, padx=2)
+        
+        # Alle Eingangskanäle des Standardgeräts getrennt transkribieren, ein Mikrofon je Teilnehmer
+        self.meeting_mode = tk.BooleanVar(value=False)
+        self.meeting_mode_check = tk.Checkbutton(self.model_frame, text=self.get_text("meeting_mode"),
+                                                 variable=self.meeting_mode)
+        self.meeting_mode_check.pack(side=tk.LEFT, padx=2)
+        
+        # Latenz je Stufe der letzten Transkription; schaltet das Tracing ein (sonst kostenlos aus)
+        self.show_latency_panel = tk.BooleanVar(value=TRACER.enabled)
+        self.latency_check = tk.Checkbutton(self.model_frame, text=self.get_text("latency_panel"),
+                                            variable=self.show_latency_panel, command=self.toggle_latency_panel)
+        self.latency_check.pack(side=tk.LEFT, padx=2)
+        self.latency_text = tk.StringVar(value="")
+        self.latency_label = tk.Label(root, textvariable=self.latency_text, anchor="w", justify=tk.LEFT,
+                                      font=("TkFixedFont", 8))
+        if TRACER.enabled:
+            self.latency_label.pack(fill=tk.X, padx=10)
+        self.trace_job = None
+        self.capture_started = None
+        
         # Set up cache directory based on whether we're running as exe or script
-        if getattr(sys, 'frozen', False):
-            # Running as executable
-            self.cache_dir = os.path.join(os.path.dirname(sys.executable), "models")
-        else:
-            # Running as script
-            self.cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+        cache_start = time.perf_counter()
+        self.cache_dir = default_cache_dir()
         
         # Ensure cache directory exists and set environment variable
         self.ensure_cache_dir()
@@ -154,6 +322,57 @@ class WhisperApp:
         print(f"Cache directory: {self.cache_dir}")
         print(f"Cache directory exists: {os.path.exists(self.cache_dir)}")
         print(f"Cache directory is writable: {os.access(self.cache_dir, os.W_OK)}")
+        print(f"FFmpeg: {FFMPEG['path'] or 'not found'} ({FFMPEG['version'] or 'version unknown'})")
+        
+        # Fertige Transkriptionen neben dem Modellordner zwischenspeichern
+        try:
+            self.result_cache = ResultCache(default_result_cache_dir())
+        except OSError as e:
+            print(f"Result cache not available next to the models: {e}")
+            self.result_cache = ResultCache(os.path.join(self.cache_dir, "results"))
+        print(f"Result cache: {self.result_cache.directory} ({self.result_cache.stats()['entries']} entries)")
+        STARTUP_TIMES["cache dir checks"] = time.perf_counter() - cache_start
+        
+        # Ausgewähltes Modell bei jedem Wechsel im Hintergrund vorladen; beim Start erst,
+        # wenn das Fenster steht (siehe on_window_shown)
+        self.selected_model.trace_add("write", lambda *args: self.preload_selected_model())
+        self.selected_precision.trace_add("write", lambda *args: self.preload_selected_model())
+    
+    def on_window_shown(self):
+        """Import torch/whisper and preload the model only once the window is on screen"""
+        STARTUP_TIMES["window shown"] = time.perf_counter() - STARTUP_START
+        print_startup_timing("Startup timing:")
+        if STARTUP_PROBE:
+            write_startup_probe(STARTUP_PROBE, window_shown=time.time())
+        self.gui_heartbeat()
+        # Der Import-Thread darf die Tk-Variablen nicht selbst lesen
+        settings = self.transcription_settings()
+        
+        def imported():
+            STARTUP_TIMES["model stack ready"] = time.perf_counter() - STARTUP_START
+            print_startup_timing("Startup timing (background imports):")
+            if STARTUP_PROBE:
+                self.run_startup_probe(settings)
+            else:
+                self.preload_selected_model(settings)
+        
+        import_model_stack(imported)
+    
+    def run_startup_probe(self, settings):
+        """Transcribe a synthetic clip as the first transcription, record when it is done and quit"""
+        audio = to_whisper_audio(synthetic_audio(STARTUP_PROBE_SECONDS))
+        result = self.transcribe_audio(audio, settings, show=False)
+        if result is None:
+            write_startup_probe(STARTUP_PROBE, error="transcription failed, see the application output")
+        else:
+            write_startup_probe(STARTUP_PROBE, first_transcription=time.time(),
+                                model=settings["model"], precision=settings["precision"])
+        self.ui.call(self.root.destroy)
+    
+    def preload_selected_model(self, settings=None):
+        """Start loading the selected model in the background"""
+        settings = settings or self.transcription_settings()
+        MODEL_POOL.preload(settings["model"], precision=settings["precision"], download_root=self.cache_dir)
     
     def ensure_cache_dir(self):
         """Create cache directory if it doesn't exist"""
@@ -179,7 +398,10 @@ class WhisperApp:
             print(f"Using fallback cache directory: {self.cache_dir}")
     
     def get_cached_model_path(self, model_name):
-        """Get path for cached model"""
+        """Get path for cached model (its model store file once it has been converted)"""
+        entry = ModelStore(self.cache_dir).entry(model_name, "fp32")
+        if entry is not None:
+            return os.path.join(self.cache_dir, entry["file"])
         return os.path.join(self.cache_dir, f"{model_name}.pt")
     
     def is_model_cached(self, model_name):
@@ -187,102 +409,397 @@ class WhisperApp:
         model_path = self.get_cached_model_path(model_name)
         return os.path.exists(model_path)
     
+    def transcription_settings(self):
+        """Snapshot of the transcription choices in the GUI (Tk thread only)
+
+        Tk variables must not be read from other threads, so every worker gets this
+        dict when it is started instead of looking at the widgets itself.
+        """
+        return {
+            "model": self.selected_model.get(),
+            "precision": self.selected_precision.get(),
+            "language": self.recognition_lang.get(),
+            "vocabulary": self.vocabulary_profiles.get(self.selected_vocabulary.get()),
+            "save_transcript": self.save_transcript.get(),
+            "use_vad": self.use_vad.get(),
+        }
+    
     def get_text(self, key):
         """Helper method to get translated text"""
         return self.translations[self.selected_lang][key]
     
     def update_text_area(self, text):
-        self.text_area.config(state=tk.NORMAL)
-        self.text_area.insert(tk.END, text + "\n")
-        self.text_area.see(tk.END)  # Scroll nach unten
-        self.text_area.config(state=tk.DISABLED)
+        """Append a line; safe from any thread, shown with the next UI frame"""
+        self.ui.append(text + "\n")
 
     def set_text_area(self, text):
-        self.text_area.config(state=tk.NORMAL)
-        self.text_area.delete(1.0, tk.END)
-        self.text_area.insert(tk.END, text + "\n")
-        self.text_area.see(tk.END)  # Scroll nach unten
-        self.text_area.config(state=tk.DISABLED)
+        self.ui.replace(text + "\n")
+    
+    def set_live_text(self, committed, tentative):
+        self.ui.replace(committed)
+        if tentative:
+            self.ui.append((" " if committed else "") + tentative, "tentative")
     
     def start_recording(self):
-        global is_recording, audio_data
+        global is_recording, audio_buffer
+        self.disk_active = self.record_to_disk.get()
+        self.meeting_active = self.meeting_mode.get()
+        recorder = None
+        if self.meeting_active:
+            self.start_meeting()
+            return
+        if self.disk_active:
+            # Im RAM liegt nur ein kurzer Ring, der Rest landet direkt in der Datei
+            try:
+                recorder = MmapWavRecorder(OUTPUT_FILENAME, sample_rate)
+            except Exception as e:
+                self.update_text_area(f"Fehler beim Anlegen der Audio-Datei: {str(e)}")
+                return
+            audio_buffer = CaptureBuffer(sample_rate, max_seconds=MMAP_CAPTURE_SECONDS)
+        else:
+            audio_buffer = CaptureBuffer(sample_rate)
         is_recording = True
-        audio_data = []
+        settings = self.transcription_settings()
+        self.trace_job = TRACER.new_job("dictation", model=settings["model"], precision=settings["precision"])
         self.set_text_area(self.get_text("recording_started"))
         
         # Update button states and colors
         self.start_button.config(state=tk.DISABLED, bg=self.recording_color)
         self.stop_button.config(state=tk.NORMAL, bg=self.stop_color)
+        self.retranscribe_button.config(state=tk.DISABLED)
+        self.last_source = recorder or audio_buffer
         
         # Start audio recording in thread
-        threading.Thread(target=self.record_audio).start()
+        self.live_active = self.live_mode.get()
+        threading.Thread(target=TRACER.bind(self.record_audio, self.trace_job),
+                         args=(audio_buffer, settings, self.live_active, recorder)).start()
     
-    def record_audio(self):
-        global is_recording, audio_data
-        stream = sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16', callback=self.audio_callback)
-        with stream:
-            while is_recording:
+    def record_audio(self, buffer, settings, live=False, recorder=None):
+        # Mit Festplatten-Backend lesen Live-Transkription und Abschluss aus der Datei
+        source = recorder or buffer
+        # Dieser Thread und der PortAudio-Callback laufen auf den reservierten Kernen
+        SCHEDULER.pin_current_thread(SCHEDULER.capture_cpus)
+        SCHEDULER.recording_started()
+        capture_start = time.perf_counter()
+        live_state = {}
+        live_thread = None
+        try:
+            stream = sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16',
+                                    callback=SCHEDULER.capture_callback(buffer.callback))
+            with stream:
+                if live:
+                    # Die Live-Transkription bekommt einen eigenen Thread, damit reserve() und
+                    # drain() nie hinter einem Inferenzschritt warten müssen
+                    live_thread = threading.Thread(target=TRACER.bind(self.live_loop),
+                                                   args=(buffer, source, live_state, settings), daemon=True)
+                    live_thread.start()
+                # Endet auch, wenn inzwischen schon eine neue Aufnahme mit eigenem Puffer läuft
+                while is_recording and buffer is audio_buffer:
+                    buffer.reserve()
+                    if recorder is not None:
+                        recorder.drain(buffer)
+                    sd.sleep(100)
+        finally:
+            SCHEDULER.recording_finished(buffer.stats()["xruns"])
+            TRACER.record("capture", capture_start, time.perf_counter(), seconds=buffer.seconds(),
+                          xruns=buffer.xruns, live=live, disk=recorder is not None)
+        
+        stats = buffer.stats()
+        print(f"Capture: {stats['seconds']:.1f} s, {stats['xruns']} xruns, "
+              f"{stats['overwritten_frames']} frames overwritten, "
+              f"{stats['emergency_allocations']} allocations in callback, {stats['allocated_mb']:.0f} MB")
+        self.print_scheduler_stats()
+        if recorder is not None:
+            recorder.drain(buffer)
+            recorder.close()
+            print(f"Recorded {recorder.seconds():.1f} s to {recorder.path}, {recorder.lost_frames} frames lost")
+            TRACER.annotate(self.trace_job, recorded_seconds=recorder.seconds())
+            self.on_audio_saved(None)
+        
+        if live_thread is not None:
+            # Ein laufender Schritt wird noch zu Ende gerechnet
+            live_thread.join()
+        transcriber = live_state.get("transcriber")
+        if transcriber is not None:
+            self.finish_live_transcription(source, transcriber)
+        elif live or recorder is not None:
+            # Live-Modus kam nicht zustande oder Festplatten-Backend: jetzt komplett transkribieren
+            self.finish_recording(source, settings)
+    
+    def live_loop(self, buffer, source, state, settings):
+        """Live transcription while recording; runs beside the capture loop until recording stops
+
+        The transcriber is left in state["transcriber"] so the capture thread can finish it.
+        """
+        transcriber = None
+        while is_recording and buffer is audio_buffer:
+            if transcriber is not None and not transcriber.ready(source.seconds()):
                 sd.sleep(100)
+                continue
+            try:
+                if transcriber is None:
+                    engine = get_engine(settings["model"], precision=settings["precision"],
+                                        download_root=self.cache_dir)
+                    transcriber = LiveTranscriber(engine, language=settings["language"],
+                                                  vocabulary=settings["vocabulary"])
+                    state["transcriber"] = transcriber
+                self.live_step(source, transcriber)
+            except Exception as e:
+                print(f"Live transcription step failed: {e}")
+                return
+    
+    def start_meeting(self):
+        """Record every input channel of the default device as its own speaker"""
+        global is_recording, audio_buffer
+        try:
+            channels = max(1, sd.query_devices(kind="input")["max_input_channels"])
+            capture = MultiCapture([(None, channels)], sample_rate)
+        except Exception as e:
+            self.update_text_area(f"Fehler beim Öffnen des Eingangsgeräts: {str(e)}")
+            return
+        audio_buffer = capture.buffers[0]
+        is_recording = True
+        # Erneutes Transkribieren gibt es nur für Einkanal-Aufnahmen
+        self.last_source = None
+        settings = self.transcription_settings()
+        self.trace_job = TRACER.new_job("meeting", model=settings["model"], precision=settings["precision"],
+                                        channels=channels)
+        self.set_text_area(self.get_text("recording_started"))
+        self.start_button.config(state=tk.DISABLED, bg=self.recording_color)
+        self.stop_button.config(state=tk.NORMAL, bg=self.stop_color)
+        self.retranscribe_button.config(state=tk.DISABLED)
+        threading.Thread(target=TRACER.bind(self.record_meeting, self.trace_job), args=(capture, settings)).start()
+    
+    def record_meeting(self, capture, settings):
+        """Capture loop of a meeting: channels are transcribed in parallel while recording"""
+        SCHEDULER.pin_current_thread(SCHEDULER.capture_cpus)
+        SCHEDULER.recording_started()
+        capture_start = time.perf_counter()
+        session = None
+        try:
+            engine = get_engine(settings["model"], precision=settings["precision"], download_root=self.cache_dir)
+            sources = capture.sources()
+            speakers = [f"{self.get_text('speaker')} {index + 1}" for index in range(len(sources))]
+            writers = []
+            if settings["save_transcript"]:
+                stem = os.path.splitext(OUTPUT_FILENAME)[0]
+                writers = [SEGMENT_WRITERS[fmt](f"{stem}.{fmt}") for fmt in TRANSCRIPT_FORMATS]
+            options = {"language": settings["language"], "fp16": False}
+            if settings["vocabulary"] is not None:
+                options["vocabulary"] = settings["vocabulary"]
+            session = MeetingSession(sources, speakers, engine, options, writers)
+            capture.start()
+            while is_recording and capture.buffers[0] is audio_buffer:
+                capture.reserve()
+                if session.step():
+                    self.ui.replace("\n".join(session.transcript.lines) + "\n")
+                sd.sleep(200)
+        except Exception as e:
+            self.update_text_area(f"Fehler bei der Aufnahme: {str(e)}")
+        finally:
+            capture.stop()
+            SCHEDULER.recording_finished(sum(stats["xruns"] for stats in capture.stats()))
+            TRACER.record("capture", capture_start, time.perf_counter(), seconds=capture.buffers[0].seconds(),
+                          channels=capture.buffers[0].channels)
+        
+        try:
+            if session is not None:
+                with TRACER.span("transcribe", audio_seconds=capture.buffers[0].seconds(), meeting=True):
+                    session.finish()
+                self.ui.call(self.show_transcription, "\n".join(session.transcript.lines))
+                stats = format_meeting_stats(session.stats())
+                print(stats)
+                self.update_text_area(stats)
+                if session.transcript.writers:
+                    self.update_text_area(self.get_text("transcript_saved").format(
+                        ", ".join(writer.path for writer in session.transcript.writers)))
+                self.ui.call(self.show_latency, TRACER.current_job())
+        except Exception as e:
+            self.update_text_area(f"Fehler bei der Transkription: {str(e)}")
+        finally:
+            self.ui.call(self.reset_buttons)
+    
+    def print_scheduler_stats(self):
+        stats = SCHEDULER.stats()
+        print(f"Scheduler: {stats['xruns']} xruns in total, {stats['gui_stalls']} GUI stalls "
+              f"({stats['gui_stall_time']:.2f} s, longest {stats['max_gui_stall'] * 1000:.0f} ms), "
+              f"{stats['throttled_requests']} requests throttled while recording")
+    
+    def gui_heartbeat(self, expected=None):
+        """Re-arms itself every GUI_HEARTBEAT_MS; lateness means the mainloop was blocked"""
+        now = time.perf_counter()
+        if expected is not None:
+            SCHEDULER.gui_heartbeat(now - expected)
+        self.root.after(GUI_HEARTBEAT_MS, self.gui_heartbeat, now + GUI_HEARTBEAT_MS / 1000)
+    
+    def live_step(self, buffer, transcriber, final=False):
+        """Run one sliding-window pass over the audio recorded since the committed point"""
+        while True:
+            # Nur das Stück ab dem bestätigten Punkt lesen, nicht die ganze Aufnahme
+            remaining = buffer.read(int(transcriber.committed_time * sample_rate))
+            transcriber.step(to_whisper_audio(remaining, sample_rate), final=final)
+            self.set_live_text(transcriber.committed_text(), transcriber.tentative_text())
+            
+            # Beim Abschluss so lange weiter, bis der Rest in ein Fenster gepasst hat
+            if not final or len(remaining) / sample_rate <= transcriber.window_seconds:
+                break
+    
+    def finish_live_transcription(self, buffer, transcriber):
+        """After Stop only the last, uncommitted window still needs to be transcribed"""
+        try:
+            with TRACER.span("transcribe", audio_seconds=buffer.seconds(), live=True):
+                self.live_step(buffer, transcriber, final=True)
+            self.ui.call(self.show_transcription, transcriber.committed_text())
+            self.ui.call(self.show_latency, TRACER.current_job())
+        except Exception as e:
+            self.update_text_area(f"Fehler bei der Transkription: {str(e)}")
+            print(f"Error details: {str(e)}")
+        finally:
+            self.ui.call(self.reset_buttons)
+    
+    def finish_recording(self, source, settings):
+        """Transcribe a finished recording in pieces, so long disk recordings never sit in RAM at once"""
+        texts = []
+        language = None
+        stream = self.open_transcript(settings)
+        try:
+            for offset, audio in iter_recording_chunks(source, sample_rate):
+                result = self.transcribe_audio(audio, settings, show=False, language=language)
+                if result is None:
+                    return
+                texts.append(result["text"])
+                # Jedes Stück sofort anhängen, die Dateien sind schon während der Transkription lesbar
+                if stream is not None:
+                    start = int(round(offset * WHISPER_SAMPLE_RATE))
+                    end = start + len(audio)
+                    stream.add(result, {"start": start, "end": end, "own_start": start, "own_end": end})
+                # Im ersten Stück erkannte Sprache für die weiteren übernehmen
+                if "language_detection" in result:
+                    language = result["language"]
+            self.ui.call(self.show_transcription, "".join(texts))
+            self.ui.call(self.show_latency, TRACER.current_job())
+            self.close_transcript(stream, source.written / sample_rate)
+            stream = None
+        except Exception as e:
+            self.update_text_area(f"Fehler beim Verarbeiten der Audio-Daten: {str(e)}")
+        finally:
+            if stream is not None:
+                stream.discard()
+            self.ui.call(self.reset_buttons)
     
-    def audio_callback(self, indata, frames, time, status):
-        global audio_data
-        audio_data.append(indata.copy())
+    def open_transcript(self, settings):
+        """TranscriptStream next to the recorded WAV, or None if transcripts are not saved"""
+        if not settings["save_transcript"]:
+            return None
+        stem = os.path.splitext(os.path.basename(OUTPUT_FILENAME))[0]
+        return TranscriptStream(stem, os.path.dirname(OUTPUT_FILENAME), TRANSCRIPT_FORMATS)
+    
+    def close_transcript(self, stream, duration):
+        if stream is None:
+            return
+        paths = stream.close(duration=round(duration, 3))
+        self.update_text_area(self.get_text("transcript_saved").format(", ".join(paths)))
     
     def stop_recording(self):
-        global is_recording, audio_data
+        global is_recording
         is_recording = False
         self.update_text_area(self.get_text("recording_stopped"))
         
+        # Beim Festplatten-Backend und in Besprechungen schließt der Aufnahme-Thread die Transkription ab
+        if self.disk_active or self.meeting_active:
+            return
+        
         try:
-            # Audio speichern
-            full_audio = np.concatenate(audio_data, axis=0)
-            wav.write(OUTPUT_FILENAME, sample_rate, full_audio)
+            full_audio = audio_buffer.read()
             
-            # Verify file exists after saving
-            if os.path.exists(OUTPUT_FILENAME):
-                self.update_text_area(f"{self.get_text('audio_saved')} {OUTPUT_FILENAME} ({os.path.abspath(OUTPUT_FILENAME)})")
-            else:
-                self.update_text_area(self.get_text("file_not_found"))
+            # Audio optional im Hintergrund archivieren, die Transkription wartet nicht darauf
+            if self.save_audio.get():
+                with TRACER.activate(self.trace_job):
+                    save_wav_async(OUTPUT_FILENAME, sample_rate, full_audio, self.on_audio_saved)
+            
+            # Im Live-Modus beendet der Aufnahme-Thread die Transkription selbst
+            if self.live_active:
+                return
+            
+            # Direkt im Speicher auf 16 kHz float32 umrechnen, kein WAV/FFmpeg-Umweg
+            audio = to_whisper_audio(full_audio, sample_rate)
             
         except Exception as e:
-            self.update_text_area(f"Fehler beim Speichern der Audio-Datei: {str(e)}")
+            self.update_text_area(f"Fehler beim Verarbeiten der Audio-Daten: {str(e)}")
+            self.reset_buttons()
             return
         
-        # Starte Transkription in Thread
-        threading.Thread(target=self.transcribe_audio).start()
+        # Starte Transkription in Thread; die Engine serialisiert den Modellzugriff,
+        # daher kann sofort die nächste Aufnahme beginnen
+        threading.Thread(target=TRACER.bind(self.transcribe_and_save, self.trace_job),
+                         args=(audio, self.transcription_settings())).start()
+        self.reset_buttons()
     
-    def transcribe_audio(self):
-        global TRANSCRIPTION_TEXT
+    def transcribe_and_save(self, audio, settings):
+        """transcribe_audio() plus the transcript files if they are wanted"""
+        stream = self.open_transcript(settings)
+        result = self.transcribe_audio(audio, settings)
+        if stream is None:
+            return
+        if result is None:
+            stream.discard()
+            return
+        stream.add(result)
+        self.close_transcript(stream, len(audio) / WHISPER_SAMPLE_RATE)
+    
+    def on_audio_saved(self, error):
+        if error is not None:
+            self.update_text_area(f"Fehler beim Speichern der Audio-Datei: {str(error)}")
+        elif os.path.exists(OUTPUT_FILENAME):
+            self.update_text_area(f"{self.get_text('audio_saved')} {OUTPUT_FILENAME} ({os.path.abspath(OUTPUT_FILENAME)})")
+        else:
+            self.update_text_area(self.get_text("file_not_found"))
+    
+    def transcribe_audio(self, audio, settings, show=True, language=None):
+        """Transcribe audio as one traced job (or as part of the recording's job) and show the latency
+
+        settings is a transcription_settings() snapshot taken on the GUI thread.
+        """
+        job = TRACER.current_job() or TRACER.new_job("transcription", model=settings["model"],
+                                                      precision=settings["precision"])
+        with TRACER.activate(job), TRACER.span("transcribe", audio_seconds=len(audio) / WHISPER_SAMPLE_RATE):
+            result = self.run_transcription(audio, settings, show, language)
+        if show and job is not None:
+            self.ui.call(self.show_latency, job)
+        return result
+    
+    def run_transcription(self, audio, settings, show=True, language=None):
         self.update_text_area(self.get_text("transcription_started"))
         
         try:
-            # Debug FFmpeg installation
-            self.update_text_area("\nDebug FFmpeg:")
-            self.update_text_area(f"FFMPEG_BINARY: {os.environ.get('FFMPEG_BINARY', 'Not set')}")
-            self.update_text_area(f"FFmpeg exists: {os.path.exists(ffmpeg_exe)}")
-            
-            try:
-                ffmpeg_result = subprocess.run([ffmpeg_exe, '-version'], 
-                                             capture_output=True, text=True)
-                self.update_text_area(f"FFmpeg version check: {ffmpeg_result.stdout.splitlines()[0]}")
-            except Exception as e:
-                self.update_text_area(f"FFmpeg check failed: {str(e)}")
-            
-            # Debug audio file
-            abs_path = os.path.abspath(OUTPUT_FILENAME)
-            self.update_text_area(f"\nDebug Audio File:")
-            self.update_text_area(f"File path: {abs_path}")
-            self.update_text_area(f"File exists: {os.path.exists(abs_path)}")
-            self.update_text_area(f"File size: {os.path.getsize(abs_path)} bytes")
-            
             # Load model - updated to use selected model
-            model_name = self.selected_model.get()
+            model_name = settings["model"]
+            precision = settings["precision"]
+            
+            # Gleiches Audio mit gleichem Modell und gleichen Optionen: Ergebnis aus dem Cache
+            options = dict(language=language or settings["language"], fp16=False, verbose=True)
+            if settings["save_transcript"]:
+                options["word_timestamps"] = True
+            if settings["vocabulary"] is not None:
+                options["vocabulary"] = settings["vocabulary"]
+            use_vad = settings["use_vad"]
+            cache_key = ResultCache.make_key(audio, model_name, dict(options, vad=use_vad, precision=precision))
+            with TRACER.span("result_cache") as span:
+                result = self.result_cache.get(cache_key)
+                span.set(hit=result is not None)
+            if result is not None:
+                stats = self.result_cache.stats()
+                if show:
+                    self.ui.call(self.show_transcription, result["text"])
+                self.update_text_area(self.get_text("result_from_cache").format(
+                    stats["hits"], stats["misses"], stats["time_saved"]))
+                return result
             
             # Update text area with cache information
             self.update_text_area(f"\nCache directory: {self.cache_dir}")
             
             # Check if model is cached
-            model_path = os.path.join(self.cache_dir, f"{model_name}.pt")
+            model_path = self.get_cached_model_path(model_name)
             if os.path.exists(model_path):
                 self.update_text_area(f"Using cached model from: {model_path}")
             else:
@@ -291,26 +808,44 @@ class WhisperApp:
             # Set environment variable for whisper
             os.environ["WHISPER_CACHE_DIR"] = self.cache_dir
             
-            # Load model
+            # Load model (from the pool if it is already resident)
             self.update_text_area(self.get_text("loading_model").format(model_name))
-            model = whisper.load_model(model_name)
-            self.update_text_area(self.get_text("model_loaded"))
+            model, pool_info = MODEL_POOL.get(model_name, precision=precision, download_root=self.cache_dir)
+            if pool_info["cached"]:
+                self.update_text_area(self.get_text("model_from_pool").format(
+                    model_name, pool_info["time_saved"], pool_info["resident_bytes"] / 1024 / 1024))
+            else:
+                self.update_text_area(self.get_text("model_loaded"))
             
-            # Try transcription
+            # Try transcription (through the shared engine, which owns the model)
             self.update_text_area("\nStarting transcription...")
-            result = model.transcribe(
-                abs_path,
-                language=self.selected_lang,
-                fp16=False,
-                verbose=True
-            )
+            engine = get_engine(model_name, precision=precision, download_root=self.cache_dir)
+            start = time.perf_counter()
+            if use_vad:
+                result = transcribe_with_vad(engine, audio, **options)
+                vad = result["vad"]
+                print(f"VAD: {vad['regions']} regions, {vad['speech_seconds']:.1f} of "
+                      f"{vad['total_seconds']:.1f} s speech, VAD took {vad['vad_time'] * 1000:.0f} ms")
+            else:
+                result = engine.transcribe(audio, **options)
+            self.result_cache.put(cache_key, result, time.perf_counter() - start)
+            self.print_scheduler_stats()
+            features = engine.feature_cache.stats()
+            print(f"Feature cache: {features['hits']} hits, {features['misses']} misses, "
+                  f"{features['time_saved']:.1f} s saved, {features['bytes'] / 1024 / 1024:.0f} MB")
             
-            TRANSCRIPTION_TEXT = result["text"]
-            self.set_text_area(TRANSCRIPTION_TEXT)
-            
-            # Automatically copy text to clipboard
-            pyperclip.copy(TRANSCRIPTION_TEXT)
-            self.update_text_area(self.get_text("copied"))
+            # Ergebnis im GUI-Thread anzeigen, damit parallele Aufnahmen sich nicht überschreiben
+            if show:
+                self.ui.call(self.show_transcription, result["text"])
+            if "vad" in result:
+                self.update_text_area(self.get_text("vad_report").format(
+                    result["vad"]["skipped_fraction"], result["vad"]["time_saved"]))
+            if "language_detection" in result:
+                detection = result["language_detection"]
+                probabilities = ", ".join(f"{code} {p:.0%}" for code, p in detection["probabilities"].items())
+                self.update_text_area(self.get_text("language_detected").format(
+                    detection["language"], probabilities, detection["time"]))
+            return result
             
         except Exception as e:
             error_msg = f"Fehler bei der Transkription: {str(e)}\n"
@@ -321,9 +856,48 @@ class WhisperApp:
             
             self.update_text_area(error_msg)
             print(f"Error details: {str(e)}")
-        finally:
-            self.start_button.config(state=tk.NORMAL, bg=self.default_color)
-            self.stop_button.config(state=tk.DISABLED, bg=self.default_color)
+    
+    def show_transcription(self, text):
+        global TRANSCRIPTION_TEXT
+        TRANSCRIPTION_TEXT = text
+        self.set_text_area(TRANSCRIPTION_TEXT)
+        
+        # Automatically copy text to clipboard
+        pyperclip.copy(TRANSCRIPTION_TEXT)
+        self.update_text_area(self.get_text("copied"))
+    
+    def toggle_latency_panel(self):
+        if self.show_latency_panel.get():
+            TRACER.enable()
+            self.latency_label.pack(fill=tk.X, padx=10)
+        else:
+            TRACER.disable()
+            self.latency_label.pack_forget()
+    
+    def show_latency(self, job):
+        """Latency breakdown of a finished job in the panel below the text (GUI thread)"""
+        if job is None or not TRACER.enabled:
+            return
+        summary = format_latency(TRACER.job_summary(job))
+        self.latency_text.set(summary)
+        print(f"Latency: {summary}")
+    
+    def reset_buttons(self):
+        self.start_button.config(state=tk.NORMAL, bg=self.default_color)
+        self.stop_button.config(state=tk.DISABLED, bg=self.default_color)
+        if self.last_source is not None:
+            self.retranscribe_button.config(state=tk.NORMAL)
+    
+    def retranscribe(self):
+        """Transcribe the last recording again; unchanged settings are answered from the cache"""
+        if self.last_source is None:
+            return
+        self.start_button.config(state=tk.DISABLED)
+        self.retranscribe_button.config(state=tk.DISABLED)
+        self.set_text_area(self.get_text("transcription_started"))
+        settings = self.transcription_settings()
+        job = TRACER.new_job("retranscribe", model=settings["model"], precision=settings["precision"])
+        threading.Thread(target=TRACER.bind(self.finish_recording, job), args=(self.last_source, settings)).start()
     
     def copy_text(self):
         if TRANSCRIPTION_TEXT:
@@ -339,6 +913,16 @@ class WhisperApp:
         # Update all GUI texts
         self.start_button.config(text=self.get_text("start_recording"))
         self.stop_button.config(text=self.get_text("stop_recording"))
+        self.save_audio_check.config(text=self.get_text("save_audio"))
+        self.live_mode_check.config(text=self.get_text("live_mode"))
+        self.use_vad_check.config(text=self.get_text("use_vad"))
+        self.record_to_disk_check.config(text=self.get_text("record_to_disk"))
+        self.latency_check.config(text=self.get_text("latency_panel"))
+        self.save_transcript_check.config(text=self.get_text("save_transcript"))
+        self.meeting_mode_check.config(text=self.get_text("meeting_mode"))
+        self.retranscribe_button.config(text=self.get_text("retranscribe"))
+        self.recognition_lang_label.config(text=self.get_text("recognition_language"))
+        self.vocabulary_label.config(text=self.get_text("vocabulary"))
         
         # Update welcome message if no transcription is present
         if not TRANSCRIPTION_TEXT:
@@ -355,11 +939,312 @@ class WhisperApp:
         else:
             self.en_btn.config(relief=tk.SOLID)
 
+
+def run_vocabulary(args):
+    """List the vocabulary profiles or measure what a profile costs per decoded window"""
+    path = args.file or default_vocabulary_path()
+    profiles = load_vocabulary_profiles(path)
+    if args.action == "list":
+        if not profiles:
+            print(f"No vocabulary profiles in {path}")
+        for profile in profiles.values():
+            print(f"{profile.name}: {len(profile.boost)} boosted, {len(profile.suppress)} suppressed, "
+                  f"prompt {len(profile.prompt)} chars ({profile.digest})")
+        return 0
+    
+    if args.profile:
+        if args.profile not in profiles:
+            print(f"Unknown vocabulary profile {args.profile} (see 'vocabulary list')")
+            return 1
+        profile = profiles[args.profile]
+    else:
+        # Beispielprofil mit typischen Komposita, damit der Benchmark ohne Profildatei läuft
+        terms = ["Kardiologie", "Sprachaktivitätserkennung", "Quantisierung", "Mel-Spektrogramm",
+                 "Inferenz-Engine", "Fachbegriffsliste", "Kundendienstportal", "Rechnungsprüfung"]
+        profile = VocabularyProfile("bench", boost=terms, suppress=["ähm", "äh"])
+    model, _ = MODEL_POOL.get(args.model, precision=args.precision, download_root=args.model_dir or default_cache_dir())
+    tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+    
+    # Einmalige Vorbereitung gegen den Abruf aus dem Cache (ohne den ersten Start des BPE-Encoders)
+    tokenizer.encode(" warm-up")
+    start = time.perf_counter()
+    vocabulary = profile.tokens(tokenizer)
+    prepare = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        profile.tokens(tokenizer)
+    lookup = (time.perf_counter() - start) / 1000
+    
+    # Dieselben Encoder-Ausgaben mit und ohne Profil dekodieren
+    audio = to_whisper_audio(synthetic_audio(30.0), sample_rate)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    dtype = next(model.parameters()).dtype
+    with torch.no_grad():
+        features = model.embed_audio(mel.unsqueeze(0).to(dtype))[0]
+    options = whisper.DecodingOptions(language=args.language, fp16=dtype == torch.float16,
+                                      sample_len=args.tokens, prompt=tokenizer.encode(" Vorheriger Text."))
+    
+    def median_decode(decode):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            with torch.no_grad():
+                result = decode(features, options)
+            times.append(time.perf_counter() - start)
+        return sorted(times)[len(times) // 2], len(result.tokens)
+    
+    plain, plain_tokens = median_decode(model.decode)
+    boosted, boosted_tokens = median_decode(DecodingModel(model, profile).decode)
+    
+    # Aufwand des Profils selbst: Optionen einmal je Fenster, Filter einmal je Decoder-Schritt
+    start = time.perf_counter()
+    for _ in range(args.repeat * 100):
+        vocabulary.options(options, model.dims.n_text_ctx)
+    options_time = (time.perf_counter() - start) / (args.repeat * 100)
+    sample_begin = len(options.prompt) + 4
+    boost = BoostTokens(vocabulary, sample_begin, model.device)
+    logits = torch.zeros(1, model.dims.n_vocab, device=model.device)
+    tokens = torch.randint(0, tokenizer.eot, (1, sample_begin + args.tokens), device=model.device)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for step in range(sample_begin, tokens.shape[1]):
+            boost.apply(logits, tokens[:, :step])
+    filter_time = (time.perf_counter() - start) / args.repeat
+    overhead = options_time + filter_time
+    
+    report = {
+        "model": args.model,
+        "precision": args.precision,
+        "profile": profile.name,
+        "boost_terms": len(profile.boost),
+        "suppress_terms": len(profile.suppress),
+        "prompt_tokens": len(vocabulary.prompt),
+        "prefixes": len(vocabulary.weights) + len(vocabulary.blocked),
+        "prepare_ms": prepare * 1000,
+        "cached_lookup_us": lookup * 1e6,
+        "decode_ms": plain * 1000,
+        "decode_tokens": plain_tokens,
+        "decode_with_profile_ms": boosted * 1000,
+        "decode_with_profile_tokens": boosted_tokens,
+        "options_us": options_time * 1e6,
+        "filter_ms_per_window": filter_time * 1000,
+        "overhead_ms_per_window": overhead * 1000,
+        "overhead_fraction": overhead / plain if plain else 0.0,
+    }
+    print(f"Profile {profile.name}: {len(profile.boost)} boosted / {len(profile.suppress)} suppressed terms, "
+          f"{len(vocabulary.prompt)} prompt tokens, {len(vocabulary.weights) + len(vocabulary.blocked)} prefixes")
+    print(f"  tokenize once       {prepare * 1000:8.2f} ms   (cached lookup {lookup * 1e6:.1f} us)")
+    print(f"  decode without      {plain * 1000:8.1f} ms   ({plain_tokens} tokens)")
+    print(f"  decode with profile {boosted * 1000:8.1f} ms   ({boosted_tokens} tokens, longer prompt)")
+    print(f"  profile overhead    {overhead * 1000:8.3f} ms per window "
+          f"(options {options_time * 1e6:.0f} us, filter {filter_time * 1000:.3f} ms for {args.tokens} steps), "
+          f"{report['overhead_fraction']:.2%} of a decode")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+    return 0
+
+
+def run_trace(args):
+    """Summarise a JSONL trace per job and optionally convert it to Chrome trace format"""
+    tracer = Tracer(max_events=None, max_jobs=None)
+    with open(args.input, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("type") == "job":
+                tracer.jobs.setdefault(record["job"], {}).update(
+                    {key: value for key, value in record.items() if key not in ("type", "job")})
+            else:
+                tracer.events.append(record)
+    
+    for job, meta in tracer.jobs.items():
+        print(f"job {job} ({meta.get('kind', '?')}): {format_latency(tracer.job_summary(job))}")
+    print(f"{len(tracer.events)} spans in {len(tracer.jobs)} jobs")
+    if args.chrome:
+        tracer.export_chrome(args.chrome)
+        print(f"Wrote {args.chrome}")
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Whisper Transkriptions-Tool")
+    parser.add_argument("--trace", default=os.environ.get("WHISPER_TRACE"),
+                        help="Trace every job to this JSON lines file (Chrome trace written next to it on exit)")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch = subparsers.add_parser("batch", help="Transcribe files, globs or directories without GUI")
+    batch.add_argument("inputs", nargs="+", help="Audio files, glob patterns or directories")
+    batch.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    batch.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    batch.add_argument("--precision", default="fp32", choices=["fp32", "fp16", "int8", "bf16"],
+                       help="fp32, fp16 (GPU), int8 (dynamic quantization, CPU) or bf16 (CPU)")
+    batch.add_argument("--language", default=AUTO_LANGUAGE,
+                       help="Language code, or 'auto' to detect it once per file on the first window (default)")
+    batch.add_argument("--group-by-language", action="store_true",
+                       help="Write the outputs into one subdirectory per detected language")
+    batch.add_argument("--output-dir", default="transcripts", help="Directory for the output files")
+    batch.add_argument("--no-cache", action="store_true",
+                       help="Do not read or write the result cache next to the models directory")
+    batch.add_argument("--formats", default="txt,json,srt",
+                       help="Comma separated: txt,srt,vtt,jsonl (written segment by segment), json,tsv")
+    batch.add_argument("--vocabulary", default=None, help="Vocabulary profile to decode with (see 'vocabulary list')")
+    batch.add_argument("--word-timestamps", action="store_true",
+                       help="Add word timings to the JSON/JSON lines output (slower)")
+    batch.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    batch.add_argument("--threads", type=int, default=None,
+                       help="Torch threads per worker (default: CPUs / workers)")
+    batch.add_argument("--vad", action="store_true", help="Skip silence before transcription")
+    batch.add_argument("--chunk-seconds", type=float, default=None,
+                       help="Split long files at silence into chunks of about this length "
+                            "and transcribe the chunks in parallel")
+    
+    meeting = subparsers.add_parser("meeting", help="Record one mic per speaker and transcribe every channel")
+    meeting.add_argument("inputs", nargs="*",
+                         help="Transcribe files instead of recording: one multichannel WAV or one file per speaker")
+    meeting.add_argument("--device", action="append", default=[],
+                         help="Input device as INDEX[:CHANNELS] or NAME[:CHANNELS], repeat for several devices")
+    meeting.add_argument("--channels", type=int, default=2, help="Channels of the default device (without --device)")
+    meeting.add_argument("--rate", type=int, default=sample_rate, help="Sample rate of all devices")
+    meeting.add_argument("--speakers", default=None, help="Comma separated speaker names in channel order")
+    meeting.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    meeting.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    meeting.add_argument("--precision", default="fp32", choices=["fp32", "fp16", "int8", "bf16"])
+    meeting.add_argument("--language", default=AUTO_LANGUAGE,
+                         help="Language code, or 'auto' to detect it per channel on its first piece")
+    meeting.add_argument("--vocabulary", default=None, help="Vocabulary profile to decode with")
+    meeting.add_argument("--output-dir", default="meetings", help="Directory for the merged transcript")
+    meeting.add_argument("--formats", default="txt,srt,jsonl", help="Comma separated: txt,srt,vtt,jsonl")
+    meeting.add_argument("--workers", type=int, default=None, help="Transcription threads (default: one per channel)")
+    meeting.add_argument("--chunk-seconds", type=float, default=MEETING_CHUNK_SECONDS,
+                         help="Length of the pieces each channel is transcribed in")
+    meeting.add_argument("--seconds", type=float, default=None, help="Stop recording after this many seconds")
+    meeting.add_argument("--realtime", action="store_true", help="Feed input files at recording pace")
+    meeting.add_argument("--report-seconds", type=float, default=30.0,
+                         help="Print per-channel throughput and lag this often")
+    meeting.add_argument("--list-devices", action="store_true", help="List the audio devices and exit")
+    
+    serve = subparsers.add_parser("serve", help="Run the HTTP/WebSocket transcription server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--model", default="base", help="Default model for requests without ?model=")
+    serve.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    serve.add_argument("--preload", default="",
+                       help="Comma separated models to keep warm; only these and --model can be requested")
+    serve.add_argument("--max-concurrent", type=int, default=SERVER_MAX_CONCURRENT)
+    serve.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE)
+    serve.add_argument("--max-upload-mb", type=int, default=SERVER_MAX_UPLOAD_MB,
+                       help="Largest POST /transcribe body; larger ones get HTTP 413")
+    serve.add_argument("--max-message-mb", type=int, default=SERVER_MAX_MESSAGE_MB,
+                       help="Largest WebSocket message on /stream; larger ones close the stream with 1009")
+    
+    client = subparsers.add_parser("client", help="Test client for the transcription server")
+    client.add_argument("file", help="Audio file to send")
+    client.add_argument("--url", default="http://127.0.0.1:8765")
+    client.add_argument("--language", default=None)
+    client.add_argument("--stream", action="store_true", help="Stream PCM over WebSocket instead of uploading")
+    client.add_argument("--chunk-seconds", type=float, default=0.5, help="PCM chunk size when streaming")
+    client.add_argument("--realtime", action="store_true", help="Pace the stream like a live microphone")
+    client.add_argument("--no-live", action="store_true", help="Only request the final transcript")
+    
+    compare = subparsers.add_parser("compare", help="Compare speed and accuracy of the precision modes")
+    compare.add_argument("file", nargs="?", default=None,
+                         help="Reference clip (default: the last recording)")
+    compare.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    compare.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    compare.add_argument("--precisions", default=",".join(available_precisions()),
+                         help="Comma separated precisions, the first one is the accuracy baseline")
+    compare.add_argument("--language", default=AUTO_LANGUAGE)
+    compare.add_argument("--reference-text", default=None,
+                         help="Text file with the correct transcript, used instead of the baseline")
+    compare.add_argument("--json", default=None, help="Also write the measurements to this JSON file")
+    
+    bench = subparsers.add_parser("bench", help="Benchmark the recording -> transcription pipeline")
+    bench.add_argument("files", nargs="*", help="Reference audio files in addition to the synthetic clips")
+    bench.add_argument("--models", default=",".join(WHISPER_MODELS), help="Comma separated models")
+    bench.add_argument("--lengths", default="10,60,300", help="Synthetic clip lengths in seconds")
+    bench.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    bench.add_argument("--precision", default="fp32", choices=["fp32", "fp16", "int8", "bf16"])
+    bench.add_argument("--language", default="en")
+    bench.add_argument("--repeat", type=int, default=3, help="Runs per clip, the median is reported")
+    bench.add_argument("--no-vad", action="store_true", help="Transcribe without skipping silence")
+    bench.add_argument("--json", default=None, help="Write the report to this JSON file")
+    bench.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+    bench.add_argument("--max-regression", type=float, default=0.15,
+                       help="Allowed slowdown per stage/RTF/peak RSS as a fraction (default 0.15)")
+    bench.add_argument("--min-delta", type=float, default=0.05,
+                       help="Ignore stage slowdowns smaller than this many seconds (default 0.05)")
+    
+    models = subparsers.add_parser("models", help="List, import, verify or export the local model store")
+    models.add_argument("action", choices=["list", "import", "verify", "export"])
+    models.add_argument("names", nargs="*", help="import: model names (from the models directory) or checkpoint files")
+    models.add_argument("--model-dir", default=None, help="Model store directory (default: ./models)")
+    models.add_argument("--precisions", default="fp32", help="import: comma separated fp32,fp16,int8")
+    models.add_argument("--name", default=None, help="import: store name for a checkpoint file")
+    models.add_argument("--dest", default=None, help="export: directory to copy the verified store to")
+    
+    vocabulary = subparsers.add_parser("vocabulary", help="List vocabulary profiles or benchmark their overhead")
+    vocabulary.add_argument("action", choices=["list", "bench"])
+    vocabulary.add_argument("profile", nargs="?", default=None,
+                            help="bench: profile to measure (default: a built-in example)")
+    vocabulary.add_argument("--file", default=None,
+                            help="Profile file (default: vocabulary.json next to the models, or WHISPER_VOCABULARY)")
+    vocabulary.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    vocabulary.add_argument("--model-dir", default=None, help="Model cache directory (default: ./models)")
+    vocabulary.add_argument("--precision", default="fp32", choices=["fp32", "fp16", "int8", "bf16"])
+    vocabulary.add_argument("--language", default="de")
+    vocabulary.add_argument("--tokens", type=int, default=96, help="Decoder steps per window")
+    vocabulary.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the median is reported")
+    vocabulary.add_argument("--json", default=None, help="Write the measurements to this JSON file")
+    
+    trace = subparsers.add_parser("trace", help="Summarise a JSONL trace per job")
+    trace.add_argument("input", help="JSON lines file written with --trace")
+    trace.add_argument("--chrome", default=None, help="Convert it to Chrome trace format in this file")
+    return parser
+
+
 # Hauptprogramm
-def main():  
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command == "trace":
+        return run_trace(args)
+    if args.trace:
+        TRACER.enable(args.trace)
+    try:
+        return run_command(args)
+    finally:
+        TRACER.close()
+
+
+def run_command(args):
+    if args.command == "batch":
+        return run_batch(args)
+    if args.command == "meeting":
+        return run_meeting(args)
+    if args.command == "serve":
+        return run_server(args)
+    if args.command == "client":
+        return run_client(args)
+    if args.command == "compare":
+        return run_compare(args)
+    if args.command == "bench":
+        return run_bench(args)
+    if args.command == "models":
+        return run_models(args)
+    if args.command == "vocabulary":
+        return run_vocabulary(args)
+    
+    start = time.perf_counter()
+    SCHEDULER.enable()
     root = tk.Tk()
     app = WhisperApp(root)
+    STARTUP_TIMES["gui build"] = time.perf_counter() - start - STARTUP_TIMES.get("cache dir checks", 0)
+    root.after(0, app.on_window_shown)
     root.mainloop()
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Thread-safe, frame-coalesced updates of the text area in the GUI"""
+
+import queue
+import threading
+from collections import deque
+import tkinter as tk
+
+
+# Textfeld: Bildrate der Aktualisierung (ms), sichtbare Zeilen, Zeilen im Verlauf dahinter,
+# wie viele davon beim Hochscrollen auf einmal zurückgeholt werden
+UI_FRAME_MS = 50
+UI_MAX_LINES = 2000
+UI_SCROLLBACK_LINES = 200000
+UI_SCROLLBACK_PAGE = 500
+
+
+# Thread-sichere Aktualisierung der Oberfläche
+class UiDispatcher:
+    """Applies GUI work from any thread on the Tk thread, once per frame
+
+    Consecutive text appends are coalesced into a single insert. The text widget keeps
+    at most max_lines lines while it follows the end; older lines move to a scrollback
+    list and come back a page at a time when the view is scrolled to the top.
+    """
+
+    def __init__(self, root, text_area, frame_ms=UI_FRAME_MS, max_lines=UI_MAX_LINES):
+        self.root = root
+        self.text_area = text_area
+        self.frame_ms = frame_ms
+        self.max_lines = max_lines
+        self.queue = queue.SimpleQueue()
+        self.scrollback = deque(maxlen=UI_SCROLLBACK_LINES)
+        self.draining = False
+        self.inline = []
+        self.restore_pending = False
+        self.operations = 0
+        self.inserts = 0
+        text_area.config(yscrollcommand=self.on_scroll)
+        self.root.after(self.frame_ms, self.drain)
+
+    def append(self, text, tag=None):
+        self.submit(("append", text, tag))
+
+    def replace(self, text, tag=None):
+        self.submit(("replace", text, tag))
+
+    def call(self, function, *args):
+        self.submit(("call", function, args))
+
+    def submit(self, operation):
+        # Aus einem Callback während des Abarbeitens: direkt danach ausführen, nicht erst im nächsten Frame
+        if self.draining and threading.current_thread() is threading.main_thread():
+            self.inline.append(operation)
+        else:
+            self.queue.put(operation)
+
+    def drain(self):
+        work = deque()
+        while True:
+            try:
+                work.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        self.draining = True
+        clear = False
+        chunks = []
+        try:
+            while work:
+                kind, value, extra = work.popleft()
+                self.operations += 1
+                if kind == "append":
+                    chunks.append((value, extra))
+                elif kind == "replace":
+                    clear = True
+                    chunks = [(value, extra)]
+                else:
+                    self.write(clear, chunks)
+                    clear = False
+                    chunks = []
+                    self.inline = []
+                    try:
+                        value(*extra)
+                    except Exception as e:
+                        print(f"GUI update failed: {e}")
+                    work.extendleft(reversed(self.inline))
+            self.write(clear, chunks)
+        finally:
+            self.draining = False
+            self.root.after(self.frame_ms, self.drain)
+
+    def write(self, clear, chunks):
+        """One widget update: optional clear, one insert of all chunks, trimming, scrolling"""
+        if not clear and not chunks:
+            return
+        widget = self.text_area
+        following = clear or widget.yview()[1] >= 1.0
+        widget.config(state=tk.NORMAL)
+        if clear:
+            widget.delete("1.0", tk.END)
+            self.scrollback.clear()
+        
+        # Aufeinanderfolgende Stücke mit gleichem Tag zusammenfassen: ein insert mit Text/Tag-Paaren
+        merged = []
+        for text, tag in chunks:
+            if merged and merged[-1][1] == tag:
+                merged[-1][0] += text
+            else:
+                merged.append([text, tag])
+        if merged:
+            arguments = []
+            for text, tag in merged:
+                arguments += [text, tag or ()]
+            widget.insert(tk.END, *arguments)
+            self.inserts += 1
+        
+        if following:
+            lines = int(widget.index("end-1c").split(".")[0])
+            if lines > self.max_lines:
+                cut = f"{lines - self.max_lines + 1}.0"
+                self.scrollback.extend(widget.get("1.0", cut).splitlines(keepends=True))
+                widget.delete("1.0", cut)
+            widget.see(tk.END)
+        widget.config(state=tk.DISABLED)
+
+    def on_scroll(self, first, last):
+        self.text_area.vbar.set(first, last)
+        # Oben angekommen: eine Seite aus dem Verlauf zurückholen
+        if float(first) <= 0.0 and float(last) < 1.0 and self.scrollback and not self.restore_pending:
+            self.restore_pending = True
+            self.root.after_idle(self.restore_page)
+
+    def restore_page(self):
+        self.restore_pending = False
+        lines = [self.scrollback.pop() for _ in range(min(UI_SCROLLBACK_PAGE, len(self.scrollback)))]
+        if not lines:
+            return
+        widget = self.text_area
+        widget.config(state=tk.NORMAL)
+        widget.insert("1.0", "".join(reversed(lines)))
+        widget.config(state=tk.DISABLED)
+        # Ansicht auf der bisher obersten Zeile halten
+        widget.see(f"{len(lines) + 1}.0")